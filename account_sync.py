@@ -31,7 +31,6 @@ from dropdown_ui import QDialog
 
 from config import (
     ACCENT_COLOR,
-    AUDIO_EXTENSIONS,
     BG_COLOR,
     BUTTON_BG,
     BUTTON_BORDER,
@@ -49,6 +48,7 @@ from config import (
     TURNSTILE_SITE_KEY,
     TURNSTILE_VERIFY_URL,
 )
+from library_catalog import library_catalog
 
 
 class SupabaseError(RuntimeError):
@@ -1100,42 +1100,22 @@ def collect_playlist_tracks(playlist_name):
     without_url = 0
     if not songs_path.is_dir():
         return tracks, without_url
-    for audio_path in sorted(
-        songs_path.iterdir(), key=lambda path: path.name.casefold()
+    catalog = library_catalog()
+    catalog.sync_playlist(playlist_name)
+    for row in sorted(
+        catalog.tracks(playlist_name),
+        key=lambda row: row["filename"].casefold(),
     ):
-        if (
-            not audio_path.is_file()
-            or audio_path.suffix.lower() not in AUDIO_EXTENSIONS
-        ):
-            continue
-        sidecar = {}
-        try:
-            metadata_path = audio_path.with_suffix(".json")
-            if metadata_path.is_file():
-                payload = json.loads(metadata_path.read_text(encoding="utf-8"))
-                if isinstance(payload, dict):
-                    sidecar = payload
-        except (OSError, ValueError):
-            pass
-        url = str(
-            sidecar.get("source_url") or sidecar.get("download_url") or ""
-        ).strip()
+        url = row["source_url"]
         if not url.startswith(("http://", "https://")):
             without_url += 1
             continue
-        fallback_artist = "Unknown Artist"
-        fallback_title = audio_path.stem
-        if " - " in audio_path.stem:
-            fallback_artist, fallback_title = audio_path.stem.split(" - ", 1)
         tracks.append(
             {
                 "url": url,
-                "artist": sidecar.get("artist") or fallback_artist,
-                "song_title": sidecar.get("title") or fallback_title,
-                "duration": duration_seconds(
-                    sidecar.get("duration_seconds")
-                    or sidecar.get("duration")
-                ),
+                "artist": row["artist"],
+                "song_title": row["title"],
+                "duration": duration_seconds(row["duration"]),
                 "playlist_name": str(playlist_name),
             }
         )
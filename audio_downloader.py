@@ -13,17 +13,16 @@ from pathlib import Path
 from PySide6.QtCore import QThread, Signal
 
 from config import FFMPEG_PATH
+from download_scheduler import download_paused, wait_while_paused
 from lyrics_service import _download_bytes
+from preview_cache import preview_cache
 from utils import extract_sc_meta
 from worker_http import (
-    HTTP_POOL_SIZE, HTTP_SESSION, NETWORK_BUFFER_SIZE,
+    HOST_CONNECTION_LIMIT, HTTP_POOL_SIZE, HTTP_SESSION, NETWORK_BUFFER_SIZE,
     PARALLEL_DOWNLOAD_CONNECTIONS, PARALLEL_RANGE_RETRIES,
-    ParallelDownloadError,
+    ParallelDownloadError, host_connection,
 )
 
-_DOWNLOAD_LOCK = threading.Lock()
-
-
 
 def _detect_source(info, requested):
     extractor = str(
@@ -96,7 +95,7 @@ def _audio_request_headers(info, audio_format):
 def _probe_range_size(url, headers):
     probe_headers = dict(headers)
     probe_headers["Range"] = "bytes=0-0"
-    with HTTP_SESSION.get(
+    with host_connection(url), HTTP_SESSION.get(
         url,
         headers=probe_headers,
         timeout=(10, 20),
@@ -124,13 +123,18 @@ def _download_byte_range(
     url, path, headers, start, end, total, progress_callback=None
 ):
     expected = end - start + 1
+    received = 0
+    attempts = 0
     last_error = None
-    for _attempt in range(PARALLEL_RANGE_RETRIES):
-        received = 0
+    while attempts < PARALLEL_RANGE_RETRIES:
+        # A paused download gives its host connection back and continues
+        # from where it stopped once resumed.
+        wait_while_paused()
+        position = start + received
         try:
             range_headers = dict(headers)
-            range_headers["Range"] = f"bytes={start}-{end}"
-            with HTTP_SESSION.get(
+            range_headers["Range"] = f"bytes={position}-{end}"
+            with host_connection(url), HTTP_SESSION.get(
                 url,
                 headers=range_headers,
                 timeout=(10, 45),
@@ -139,7 +143,7 @@ def _download_byte_range(
             ) as response:
                 if response.status_code != 206:
                     raise ParallelDownloadError(
-                        f"Range {start}-{end}: HTTP {response.status_code}"
+                        f"Range {position}-{end}: HTTP {response.status_code}"
                     )
                 content_range = str(
                     response.headers.get("Content-Range") or ""
@@ -149,15 +153,15 @@ def _download_byte_range(
                 )
                 if (
                     not match
-                    or int(match.group(1)) != start
+                    or int(match.group(1)) != position
                     or int(match.group(2)) != end
                     or int(match.group(3)) != total
                 ):
                     raise ParallelDownloadError(
-                        f"Range {start}-{end}: invalid Content-Range"
+                        f"Range {position}-{end}: invalid Content-Range"
                     )
                 with path.open("r+b", buffering=0) as output:
-                    output.seek(start)
+                    output.seek(position)
                     for chunk in response.iter_content(NETWORK_BUFFER_SIZE):
                         if not chunk:
                             continue
@@ -169,20 +173,26 @@ def _download_byte_range(
                         received += len(chunk)
                         if progress_callback is not None:
                             progress_callback(len(chunk))
-            if received != expected:
+                        if download_paused():
+                            break
+            if received == expected:
+                return received
+            if not download_paused():
                 raise ParallelDownloadError(
                     f"Range {start}-{end}: got {received} of {expected} bytes"
                 )
-            return received
         except Exception as exc:
             last_error = exc
+            attempts += 1
     raise ParallelDownloadError(str(last_error or "Range download failed"))
 
 
 def _parallel_http_download(url, path, headers, progress_callback=None):
     total = _probe_range_size(url, headers)
     connections = 8 if total >= 4 * 1024 * 1024 else 4
-    connections = max(1, min(PARALLEL_DOWNLOAD_CONNECTIONS, connections, total))
+    connections = max(1, min(
+        PARALLEL_DOWNLOAD_CONNECTIONS, HOST_CONNECTION_LIMIT, connections, total
+    ))
     part_size = (total + connections - 1) // connections
     ranges = [
         (start, min(total - 1, start + part_size - 1))
@@ -228,6 +238,15 @@ def _parallel_http_download(url, path, headers, progress_callback=None):
         raise
 
 
+def _save_cover(info, final_path):
+    cover = _download_bytes(info.get("thumbnail") or "")
+    if cover:
+        try:
+            final_path.with_suffix(".jpg").write_bytes(cover)
+        except OSError as exc:
+            print(f"[Music Cover] {exc}")
+
+
 def _convert_parallel_audio(raw_path, final_path):
     final_path.unlink(missing_ok=True)
     if raw_path.suffixes[-2:-1] == [".mp3"] or raw_path.name.casefold().endswith(
@@ -279,12 +298,12 @@ class BackgroundDownloader(QThread):
         self.download_mib_per_second = 0.0
 
     def run(self):
-        self.progress_signal.emit(0, "Waiting for the download queue...")
-        with _DOWNLOAD_LOCK:
-            self.progress_signal.emit(0, "Preparing download...")
-            self._download()
+        wait_while_paused()
+        self.progress_signal.emit(0, "Preparing download...")
+        self._download()
 
     def _progress_hook(self, data):
+        wait_while_paused()
         status = str(data.get("status") or "")
         if status == "downloading":
             downloaded = int(data.get("downloaded_bytes") or 0)
@@ -364,7 +383,36 @@ class BackgroundDownloader(QThread):
                     info = next(
                         (entry for entry in info["entries"] if entry), info
                     )
-                audio_format = _direct_http_audio_format(info or {})
+                preview = preview_cache().complete_file(requested) or (
+                    preview_cache().complete_file(
+                        (info or {}).get("webpage_url") or ""
+                    )
+                )
+                if preview is not None:
+                    raw_path = Path(ydl.prepare_filename(
+                        {**(info or {}), "ext": preview.suffix[1:]}
+                    ))
+                    final_path = raw_path.with_suffix(".mp3")
+                    temporary = raw_path.with_suffix(
+                        raw_path.suffix + ".parallel.part"
+                    )
+                    try:
+                        self.progress_signal.emit(92, "Using cached preview...")
+                        shutil.copyfile(preview, temporary)
+                        _convert_parallel_audio(temporary, final_path)
+                        self.last_downloaded_path = final_path
+                        self.download_mode = "preview-cache"
+                        self.parallel_connections = 0
+                        _save_cover(info or {}, final_path)
+                    except Exception as exc:
+                        temporary.unlink(missing_ok=True)
+                        print(f"[Music Download] Cached preview unusable: {exc}")
+
+                audio_format = (
+                    None
+                    if self.last_downloaded_path is not None
+                    else _direct_http_audio_format(info or {})
+                )
                 if audio_format:
                     selected_info = {**(info or {}), **audio_format}
                     raw_path = Path(ydl.prepare_filename(selected_info))
@@ -397,16 +445,7 @@ class BackgroundDownloader(QThread):
                             f"{total / (1024 * 1024):.1f} MiB at "
                             f"{self.download_mib_per_second:.1f} MiB/s"
                         )
-                        cover = _download_bytes(
-                            (info or {}).get("thumbnail") or ""
-                        )
-                        if cover:
-                            try:
-                                final_path.with_suffix(".jpg").write_bytes(
-                                    cover
-                                )
-                            except OSError as exc:
-                                print(f"[Music Cover] {exc}")
+                        _save_cover(info or {}, final_path)
                     except Exception as exc:
                         temporary.unlink(missing_ok=True)
                         print(
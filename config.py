@@ -33,8 +33,36 @@ DOWNLOADS_PATH = DOCS_PATH / "downloads"
 PLAYLISTS_PATH = DOCS_PATH / "playlists"
 TEMP_PATH = DOCS_PATH / "temp"
 LYRICS_CACHE_PATH = TEMP_PATH / "lyrics"
+THUMBNAIL_CACHE_PATH = TEMP_PATH / "thumbnails"
+ROOM_BUFFER_PATH = TEMP_PATH / "room"
+PREVIEW_BUFFER_PATH = TEMP_PATH / "preview"
+PREVIEW_CACHE_PATH = TEMP_PATH / "previews"
+LIBRARY_CATALOG_PATH = DOCS_PATH / "library.sqlite3"
+PLAYLIST_SUMMARY_CACHE_PATH = DOCS_PATH / "playlist_summaries.json"
 FFMPEG_PATH = Path(os.getenv("CLOUDPLAYER_FFMPEG", SCRIPT_DIR / "ffmpeg.exe"))
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".opus", ".webm"}
+try:
+    ROOM_SPILL_THRESHOLD = max(
+        0, int(os.getenv("CLOUDPLAYER_ROOM_SPILL_MB", "64"))
+    ) * 1024 * 1024
+except ValueError:
+    ROOM_SPILL_THRESHOLD = 64 * 1024 * 1024
+try:
+    PREVIEW_CACHE_LIMIT = max(
+        0, int(os.getenv("CLOUDPLAYER_PREVIEW_CACHE_MB", "256"))
+    ) * 1024 * 1024
+except ValueError:
+    PREVIEW_CACHE_LIMIT = 256 * 1024 * 1024
+try:
+    THUMBNAIL_CACHE_LIMIT = max(
+        0, int(os.getenv("CLOUDPLAYER_THUMBNAIL_CACHE_MB", "64"))
+    ) * 1024 * 1024
+except ValueError:
+    THUMBNAIL_CACHE_LIMIT = 64 * 1024 * 1024
+try:
+    ROOM_PEER_PORT = int(os.getenv("CLOUDPLAYER_ROOM_PEER_PORT", "0"))
+except ValueError:
+    ROOM_PEER_PORT = 0
 
 BG_COLOR = "#121212"
 PANEL_BG = "#1A1A1A"
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QPainter, QPixmap
+
+from config import THUMBNAIL_CACHE_LIMIT, THUMBNAIL_CACHE_PATH
+from library_catalog import COVER_EXTENSIONS
+
+_NO_COVER = object()
+THUMBNAIL_TOUCH_INTERVAL = 24 * 60 * 60
+
+
+def find_cover_path(file):
+    for extension in COVER_EXTENSIONS:
+        path = Path(file).with_suffix(extension)
+        if path.is_file():
+            return path
+    return None
+
+
+def _thumbnail_cache_file(cover_path, size, cache_path):
+    stat = os.stat(cover_path)
+    digest = hashlib.sha1(
+        f"{cover_path}|{stat.st_mtime_ns}|{stat.st_size}|{size}".encode(
+            "utf-8", "surrogatepass"
+        )
+    ).hexdigest()
+    return Path(cache_path) / digest[:2] / digest
+
+
+def _read_scaled(path, size):
+    reader = QImageReader(str(path))
+    source_size = reader.size()
+    if source_size.isValid() and (
+        source_size.width() > size or source_size.height() > size
+    ):
+        reader.setScaledSize(source_size.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(
+            size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation
+        )
+    return image
+
+
+def _store_thumbnail(image, base):
+    path = base.with_suffix(".png" if image.hasAlphaChannel() else ".jpg")
+    temporary = path.with_name(f"{path.name}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if image.save(str(temporary), path.suffix[1:].upper(), 90):
+            temporary.replace(path)
+    except OSError:
+        pass
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def trim_thumbnail_cache(
+    cache_path=THUMBNAIL_CACHE_PATH, limit=THUMBNAIL_CACHE_LIMIT
+):
+    """Delete the least recently used thumbnails until ``limit`` bytes remain."""
+    files = []
+    try:
+        for path in Path(cache_path).glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    except OSError:
+        return
+    used = sum(size for _mtime, size, _path in files)
+    for _mtime, size, path in sorted(files, key=lambda item: item[0]):
+        if used <= limit:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        used -= size
+
+
+def decode_cover_thumbnail(file, size, cache_path=THUMBNAIL_CACHE_PATH):
+    """Return a ``size`` x ``size`` QImage for the cover next to ``file``.
+
+    Covers are pre-scaled once and kept on disk keyed by cover path and
+    mtime, so later decodes read a few kilobytes instead of the original.
+    Hits refresh the file's mtime at most once a day, which is the recency
+    ``trim_thumbnail_cache`` evicts by.
+    """
+    cover_path = find_cover_path(file)
+    if cover_path is None:
+        return None
+    try:
+        base = _thumbnail_cache_file(cover_path, size, cache_path)
+    except OSError:
+        return None
+    image = QImage()
+    for extension in (".jpg", ".png"):
+        path = base.with_suffix(extension)
+        try:
+            modified = path.stat().st_mtime
+        except OSError:
+            continue
+        image = QImageReader(str(path)).read()
+        if not image.isNull():
+            if time.time() - modified > THUMBNAIL_TOUCH_INTERVAL:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+            break
+    if image.isNull():
+        image = _read_scaled(cover_path, size)
+        if image.isNull():
+            return None
+        _store_thumbnail(image, base)
+    output = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    output.fill(Qt.transparent)
+    painter = QPainter(output)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.drawImage(
+        (size - image.width()) // 2, (size - image.height()) // 2, image
+    )
+    painter.end()
+    return output
+
+
+class CoverThumbnailCache(QObject):
+    """Decode row cover thumbnails in a worker pool behind an LRU of pixmaps.
+
+    ``thumbnail`` never touches the disk on the calling thread: a miss queues
+    a decode and returns None, and ``thumbnail_ready`` fires with the track
+    path once the pixmap is available.
+    """
+
+    thumbnail_ready = Signal(str)
+    _decoded = Signal(str, int, object)
+
+    CACHE_SIZE = 512
+    TRIM_INTERVAL = 256
+
+    def __init__(self, size, parent=None, cache_path=THUMBNAIL_CACHE_PATH):
+        super().__init__(parent)
+        self.size = int(size)
+        self.cache_path = Path(cache_path)
+        self._pixmaps = OrderedDict()
+        self.cache_size = self.CACHE_SIZE
+        self._pending = {}
+        self._tokens = {}
+        self._next_token = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(2, min(4, (os.cpu_count() or 2) // 2)),
+            thread_name_prefix="cover-thumbnail",
+        )
+        self._closed = False
+        self._decoded_count = 0
+        self._decoded.connect(self._thumbnail_decoded)
+        self._executor.submit(trim_thumbnail_cache, self.cache_path)
+
+    def thumbnail(self, file):
+        key = str(file)
+        cached = self._pixmaps.get(key)
+        if cached is not None:
+            self._pixmaps.move_to_end(key)
+            return None if cached is _NO_COVER else cached
+        self.request(key)
+        return None
+
+    def request(self, file):
+        key = str(file)
+        if self._closed or key in self._pixmaps or key in self._pending:
+            return
+        self._next_token += 1
+        token = self._next_token
+        self._tokens[key] = token
+        self._pending[key] = self._executor.submit(self._decode, key, token)
+
+    def resize(self, cache_size):
+        self.cache_size = max(self.CACHE_SIZE, int(cache_size))
+        self._trim()
+
+    def invalidate(self, file):
+        key = str(file)
+        self._pixmaps.pop(key, None)
+        self._tokens.pop(key, None)
+        future = self._pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel_pending(self):
+        for key, future in tuple(self._pending.items()):
+            if future.cancel():
+                self._pending.pop(key, None)
+                self._tokens.pop(key, None)
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+        self._tokens.clear()
+
+    def _decode(self, key, token):
+        try:
+            image = decode_cover_thumbnail(key, self.size, self.cache_path)
+        except Exception as exc:
+            print(f"[Cover thumbnails] Failed to decode {key}: {exc}")
+            image = None
+        if not self._closed:
+            self._decoded.emit(key, token, image)
+
+    def _thumbnail_decoded(self, key, token, image):
+        if self._tokens.get(key) != token:
+            return
+        self._tokens.pop(key, None)
+        self._pending.pop(key, None)
+        if image is None or image.isNull():
+            self._pixmaps[key] = _NO_COVER
+        else:
+            self._pixmaps[key] = QPixmap.fromImage(image)
+        self._pixmaps.move_to_end(key)
+        self._trim()
+        self._decoded_count += 1
+        if self._decoded_count % self.TRIM_INTERVAL == 0 and not self._closed:
+            self._executor.submit(trim_thumbnail_cache, self.cache_path)
+        self.thumbnail_ready.emit(key)
+
+    def _trim(self):
+        while len(self._pixmaps) > self.cache_size:
+            self._pixmaps.popitem(last=False)
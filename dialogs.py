@@ -34,10 +34,13 @@ from config import (
     read_ui_settings,
     save_search_sources,
 )
+from download_scheduler import PRIORITY_USER, download_scheduler
 from dropdown_ui import QDialog, QFileDialog, QInputDialog, QMessageBox
 from hotkeys import handle_list_multi_selection, matches_widget_binding
 from room_tcp_patch import install as install_room_tcp_patch
-from threads import BackgroundDownloader, DemoStreamResolver, SearchWorker
+from threads import (
+    BackgroundDownloader, DemoStreamResolver, PreviewPrefetcher, SearchWorker,
+)
 from utils import colored_icon
 
 install_room_tcp_patch()
@@ -153,9 +156,8 @@ class AddSongDialog(QDialog):
         self.playlist_path = PLAYLISTS_PATH / playlist_name / "songs"
         self.playlist_path.mkdir(parents=True, exist_ok=True)
         self.worker = None
-        self.active_download = None
+        self.active_downloads = {}
         self.download_queue = []
-        self.download_index = 0
         self.download_successes = 0
         self.download_failures = []
         self.downloaded_paths = []
@@ -175,6 +177,7 @@ class AddSongDialog(QDialog):
         self.preview_row = None
         self.preview_worker = None
         self.preview_buffer = None
+        self.preview_prefetcher = PreviewPrefetcher()
         self.host_player = None
         self.host_audio_output = None
         self.host_player_was_playing = False
@@ -310,10 +313,16 @@ class AddSongDialog(QDialog):
             f"border-radius: 5px;"
             f"}}"
         )
+        self.pause_button = QPushButton()
+        self.pause_button.setFixedHeight(34)
+        self.pause_button.clicked.connect(download_scheduler().toggle_paused)
+        download_scheduler().paused_changed.connect(self._download_paused_changed)
+        self._download_paused_changed(download_scheduler().paused)
         progress_layout.addStretch()
         progress_layout.addWidget(self.progress_title)
         progress_layout.addWidget(self.progress_status)
         progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.pause_button, 0, Qt.AlignRight)
         progress_layout.addStretch()
         self.progress_panel.hide()
         layout.addWidget(self.selection_panel)
@@ -422,6 +431,7 @@ class AddSongDialog(QDialog):
         if not query:
             return
         self._stop_preview()
+        self.preview_prefetcher.cancel()
         self.results_list.clear()
         self.source_status.hide()
         selected_names = []
@@ -481,6 +491,9 @@ class AddSongDialog(QDialog):
         if not results:
             self.results_list.addItem("No results found in the selected sources.")
             return
+        self.preview_prefetcher.prefetch(
+            result.get("url") for result in results
+        )
 
         # Keyboard-first flow: once search results arrive, select and focus
         # the first real track. The user can immediately press Enter to start
@@ -708,7 +721,7 @@ class AddSongDialog(QDialog):
         self._start_download_queue(self._selected_downloads())
 
     def _download_item(self, item):
-        if self.active_download is not None:
+        if self.active_downloads:
             return
         if QApplication.keyboardModifiers() & Qt.ControlModifier:
             item.setSelected(True)
@@ -760,69 +773,98 @@ class AddSongDialog(QDialog):
         self._start_download_queue([{"url": url, "label": title}])
 
     def _start_download_queue(self, downloads):
-        if self.active_download is not None or not downloads:
+        if self.active_downloads or not downloads:
             return
         self._stop_preview()
         self.download_queue = list(downloads)
-        self.download_index = 0
         self.download_successes = 0
         self.download_failures = []
         self.selection_panel.hide()
         self.progress_panel.show()
-        self._start_next_download()
-
-    def _start_next_download(self):
-        total = len(self.download_queue)
-        if self.download_index >= total:
-            self._finish_download_queue()
-            return
-
-        current = self.download_queue[self.download_index]
-        self.progress_title.setText(
-            f"Downloading {self.download_index + 1} of {total}: "
-            f"{current['label']}"
-        )
         self.progress_status.setText("Preparing download...")
         self.progress_bar.setRange(0, 0)
-        worker = BackgroundDownloader(current["url"], self.playlist_path, self)
-        self.active_download = worker
-        worker.progress_signal.connect(self._download_progress)
-        worker.finished_signal.connect(
-            lambda ok, message, current=worker: self._download_done(ok, message, current)
-        )
-        worker.start()
+        scheduler = download_scheduler()
+        for current in self.download_queue:
+            worker = BackgroundDownloader(current["url"], self.playlist_path, self)
+            self.active_downloads[worker] = current["label"]
+            worker.progress_signal.connect(
+                lambda _percent, status, current=worker: self._download_progress(
+                    current, status
+                )
+            )
+            worker.finished_signal.connect(
+                lambda ok, message, current=worker: self._download_done(
+                    ok, message, current
+                )
+            )
+            scheduler.submit(worker, PRIORITY_USER)
+        self._update_download_title()
 
-    def _download_progress(self, percent, status):
-        self.progress_status.setText(status)
-        if percent <= 0:
+    def _update_download_title(self):
+        total = len(self.download_queue)
+        completed = total - len(self.active_downloads)
+        _finished, _active, percent = download_scheduler().progress(
+            self.active_downloads
+        )
+        running = [
+            label
+            for worker, label in self.active_downloads.items()
+            if worker.isRunning()
+        ]
+        if total == 1:
+            self.progress_title.setText(
+                f"Downloading: {self.download_queue[0]['label']}"
+            )
+        else:
+            self.progress_title.setText(
+                f"Downloading {min(total, completed + 1)} of {total}"
+                + (f": {running[0]}" if len(running) == 1 else "")
+            )
+        if completed == 0 and percent <= 0:
             self.progress_bar.setRange(0, 0)
             return
         if self.progress_bar.maximum() == 0:
             self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(percent)
+        self.progress_bar.setValue(
+            round(
+                (completed * 100 + percent * len(self.active_downloads))
+                / max(1, total)
+            )
+        )
+
+    def _download_paused_changed(self, paused):
+        self.pause_button.setText("Resume" if paused else "Pause")
+        if paused and self.active_downloads:
+            self.progress_status.setText("Downloads paused")
+
+    def _download_progress(self, worker, status):
+        if worker not in self.active_downloads:
+            return
+        self.progress_status.setText(status)
+        self._update_download_title()
 
     def _download_done(self, ok, message, worker):
-        if self.active_download is not worker:
+        label = self.active_downloads.pop(worker, None)
+        if label is None:
             return
         if worker.isRunning():
             worker.wait(1000)
-        self.active_download = None
         if ok:
             self.download_successes += 1
             if worker.last_downloaded_path:
                 self.downloaded_paths.append(worker.last_downloaded_path)
         else:
-            label = self.download_queue[self.download_index]["label"]
             self.download_failures.append((label, message))
-        self.download_index += 1
         worker.deleteLater()
-        QTimer.singleShot(0, self._start_next_download)
+        if self.active_downloads:
+            self._update_download_title()
+        else:
+            QTimer.singleShot(0, self._finish_download_queue)
 
     def _finish_download_queue(self):
         downloaded = self.download_successes
         failures = list(self.download_failures)
         self.download_queue = []
-        self.download_index = 0
         self.download_successes = 0
         self.download_failures = []
 
@@ -847,14 +889,14 @@ class AddSongDialog(QDialog):
 
     def accept(self):
         self._stop_preview()
+        self.preview_prefetcher.close()
         super().accept()
 
     def reject(self):
-        if self.download_queue or (
-            self.active_download is not None and self.active_download.isRunning()
-        ):
+        if self.download_queue or self.active_downloads:
             return
         self._stop_preview()
+        self.preview_prefetcher.close()
         super().reject()
 
     def add_from_file(self):
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import os
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+PRIORITY_USER = 0
+PRIORITY_BULK = 10
+
+try:
+    MAX_CONCURRENT_DOWNLOADS = max(
+        1, int(os.getenv("CLOUDPLAYER_DOWNLOADS", "3"))
+    )
+except ValueError:
+    MAX_CONCURRENT_DOWNLOADS = 3
+
+_RESUMED = threading.Event()
+_RESUMED.set()
+
+
+def download_paused():
+    return not _RESUMED.is_set()
+
+
+def wait_while_paused():
+    """Block a download thread while the scheduler is paused."""
+    _RESUMED.wait()
+
+
+class DownloadScheduler(QObject):
+    """Run BackgroundDownloader workers a few at a time, by priority.
+
+    Submitted workers wait in a priority queue and are started as slots
+    free up. Bulk work never takes the last slot, so a download the user
+    asked for starts promptly even during a playlist restore. The scheduler
+    also keeps each worker's latest progress, which callers combine into one
+    figure for a batch with ``progress``.
+    """
+
+    paused_changed = Signal(bool)
+
+    def __init__(self, parent=None, max_running=MAX_CONCURRENT_DOWNLOADS):
+        super().__init__(parent)
+        self.max_running = max(1, int(max_running))
+        self._queue = []
+        self._order = itertools.count()
+        self._running = set()
+        self._bulk_running = set()
+        self._states = {}
+        self._paused = False
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def submit(self, worker, priority=PRIORITY_USER):
+        if worker in self._states:
+            return
+        self._states[worker] = 0
+        worker.progress_signal.connect(
+            lambda percent, status, current=worker: self._progress(
+                current, percent, status
+            )
+        )
+        worker.finished_signal.connect(
+            lambda _ok, _message, current=worker: self._worker_finished(current)
+        )
+        heapq.heappush(self._queue, (int(priority), next(self._order), worker))
+        worker.progress_signal.emit(0, "Waiting for the download queue...")
+        self._start_ready()
+
+    def cancel(self, worker):
+        """Drop ``worker`` if it has not started; return whether it was."""
+        for index, entry in enumerate(self._queue):
+            if entry[2] is worker:
+                self._queue.pop(index)
+                heapq.heapify(self._queue)
+                self._states.pop(worker, None)
+                return True
+        return False
+
+    def pause(self):
+        """Stop starting queued work and hold running downloads in place."""
+        if self._paused:
+            return
+        self._paused = True
+        _RESUMED.clear()
+        self.paused_changed.emit(True)
+
+    def resume(self):
+        if not self._paused:
+            return
+        self._paused = False
+        _RESUMED.set()
+        self.paused_changed.emit(False)
+        self._start_ready()
+
+    def toggle_paused(self):
+        if self._paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def progress(self, workers):
+        """Return ``(finished, total, percent)`` across ``workers``."""
+        workers = list(workers)
+        if not workers:
+            return 0, 0, 0
+        finished = 0
+        percent = 0
+        for worker in workers:
+            state = self._states.get(worker)
+            if state is None:
+                finished += 1
+                percent += 100
+            else:
+                percent += max(0, min(100, int(state or 0)))
+        return finished, len(workers), round(percent / len(workers))
+
+    def _start_ready(self):
+        while (
+            self._queue
+            and not self._paused
+            and len(self._running) < self.max_running
+        ):
+            priority, _order, worker = self._queue[0]
+            bulk = priority >= PRIORITY_BULK
+            if bulk and len(self._bulk_running) >= max(1, self.max_running - 1):
+                return
+            heapq.heappop(self._queue)
+            self._running.add(worker)
+            if bulk:
+                self._bulk_running.add(worker)
+            worker.start()
+
+    def _progress(self, worker, percent, status):
+        if worker in self._states:
+            self._states[worker] = percent
+
+    def _worker_finished(self, worker):
+        self._running.discard(worker)
+        self._bulk_running.discard(worker)
+        self._states.pop(worker, None)
+        self._start_ready()
+
+
+_SCHEDULER = None
+
+
+def download_scheduler():
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = DownloadScheduler()
+    return _SCHEDULER
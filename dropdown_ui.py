@@ -14,6 +14,7 @@ from PySide6.QtWidgets import (
     QMainWindow,
     QMessageBox as QtMessageBox,
     QProgressDialog as QtProgressDialog,
+    QPushButton,
     QToolButton,
     QWidget,
 )
@@ -570,11 +571,41 @@ class DropdownProgressDialog(_DropdownMixin, QtProgressDialog):
     def __init__(self, *args, **kwargs):
         self._dropdown_cancel_allowed = bool(args[1]) if len(args) > 1 else True
         super().__init__(*args, **kwargs)
+        self._extra_buttons = []
 
     def setCancelButton(self, button):
         self._dropdown_cancel_allowed = button is not None
         super().setCancelButton(button)
 
+    def add_button(self, button):
+        """Show ``button`` to the left of the cancel button."""
+        button.setParent(self)
+        self._extra_buttons.append(button)
+        button.show()
+        self._place_extra_buttons()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._place_extra_buttons()
+
+    def _place_extra_buttons(self):
+        extra = getattr(self, "_extra_buttons", ())
+        cancel = next(
+            (
+                button
+                for button in self.findChildren(QPushButton)
+                if button not in extra and not button.isHidden()
+            ),
+            None,
+        )
+        if not extra or cancel is None:
+            return
+        right = cancel.geometry().left()
+        for button in extra:
+            width = max(button.sizeHint().width(), cancel.width())
+            right -= width + 8
+            button.setGeometry(right, cancel.y(), width, cancel.height())
+
 
 QDialog = DropdownDialog
 QMessageBox = DropdownMessageBox
@@ -21,7 +21,7 @@ from PySide6.QtWidgets import (
     QFocusFrame,
     QLabel,
     QLineEdit,
-    QListWidget,
+    QListView,
     QMenu,
     QPlainTextEdit,
     QPushButton,
@@ -421,7 +421,7 @@ def _bindings_for_widget(widget):
     return _FALLBACK_LIST_BINDINGS
 
 
-def handle_list_multi_selection(widget: QListWidget, event: QKeyEvent) -> bool:
+def handle_list_multi_selection(widget: QListView, event: QKeyEvent) -> bool:
     """Select every item traversed with the configured up/down shortcuts."""
     bindings = _bindings_for_widget(widget)
     sequence = event_sequence(event)
@@ -429,24 +429,25 @@ def handle_list_multi_selection(widget: QListWidget, event: QKeyEvent) -> bool:
     down_sequence = bindings.get("playlist", "multi_select_down")
     if sequence not in {up_sequence, down_sequence}:
         return False
-    if widget.count() <= 0:
+    model = widget.model()
+    count = model.rowCount() if model is not None else 0
+    if count <= 0:
         event.accept()
         return True
 
-    row = widget.currentRow()
-    if row < 0:
-        row = 0
-    current = widget.item(row)
-    if current is not None:
-        current.setSelected(True)
+    selection = widget.selectionModel()
+    row = max(0, widget.currentIndex().row())
+    current = model.index(row, 0)
+    if current.isValid():
+        selection.select(current, QItemSelectionModel.Select)
 
     step = -1 if sequence == up_sequence else 1
-    target_row = max(0, min(widget.count() - 1, row + step))
-    target = widget.item(target_row)
-    if target is not None:
-        widget.setCurrentItem(target, QItemSelectionModel.NoUpdate)
-        target.setSelected(True)
-        widget.scrollToItem(target)
+    target_row = max(0, min(count - 1, row + step))
+    target = model.index(target_row, 0)
+    if target.isValid():
+        selection.setCurrentIndex(target, QItemSelectionModel.NoUpdate)
+        selection.select(target, QItemSelectionModel.Select)
+        widget.scrollTo(target)
     event.accept()
     return True
 
@@ -922,9 +923,9 @@ class KeyboardNavigationController(QObject):
                 return True
         songs = getattr(self.window.playlist_view, "songs_list", None)
         if focus is songs:
-            item = songs.currentItem()
-            if item is not None:
-                self.window.playlist_view.play_song(item)
+            index = songs.currentIndex()
+            if index.isValid():
+                self.window.playlist_view.play_song(index)
                 return True
         if isinstance(focus, QAbstractButton) and focus.isEnabled():
             focus.click()
@@ -935,10 +936,10 @@ class KeyboardNavigationController(QObject):
         songs = getattr(self.window.playlist_view, "songs_list", None)
         if songs is None or not self._playlist_page_active():
             return False
-        item = songs.currentItem()
-        if item is None:
+        index = songs.currentIndex()
+        if not index.isValid():
             return False
-        self.window.playlist_view.play_song(item)
+        self.window.playlist_view.play_song(index)
         return True
 
     def _delete_selected(self, focus) -> bool:
@@ -951,17 +952,18 @@ class KeyboardNavigationController(QObject):
         return False
 
     @staticmethod
-    def _list_context_position(widget: QListWidget) -> QPoint | None:
-        item = widget.currentItem()
-        if item is None and widget.count():
-            widget.setCurrentRow(0)
-            item = widget.currentItem()
-        if item is None:
+    def _list_context_position(widget: QListView) -> QPoint | None:
+        index = widget.currentIndex()
+        model = widget.model()
+        if not index.isValid() and model is not None and model.rowCount():
+            index = model.index(0, 0)
+            widget.setCurrentIndex(index)
+        if not index.isValid():
             return None
-        if not item.isSelected():
-            widget.clearSelection()
-            item.setSelected(True)
-        rectangle = widget.visualItemRect(item)
+        selection = widget.selectionModel()
+        if not selection.isSelected(index):
+            selection.select(index, QItemSelectionModel.ClearAndSelect)
+        rectangle = widget.visualRect(index)
         return rectangle.center() if rectangle.isValid() else widget.rect().center()
 
     def _default_context_target(self):
@@ -980,7 +982,7 @@ class KeyboardNavigationController(QObject):
         if target is None:
             return False
 
-        if isinstance(target, QListWidget):
+        if isinstance(target, QListView):
             position = self._list_context_position(target)
             if position is None:
                 return False
@@ -0,0 +1,618 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from config import AUDIO_EXTENSIONS, LIBRARY_CATALOG_PATH, PLAYLISTS_PATH
+
+COVER_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+SCHEMA_VERSION = 2
+CONTENT_HASH_SAMPLE = 256 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    playlist TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    source_url TEXT NOT NULL DEFAULT '',
+    duration TEXT NOT NULL DEFAULT '',
+    cover_path TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime REAL NOT NULL DEFAULT 0,
+    sidecar_mtime REAL NOT NULL DEFAULT 0,
+    content_hash TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS tracks_playlist ON tracks (playlist);
+CREATE INDEX IF NOT EXISTS tracks_filename ON tracks (filename);
+CREATE INDEX IF NOT EXISTS tracks_source_url ON tracks (source_url);
+CREATE INDEX IF NOT EXISTS tracks_artist ON tracks (artist COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS tracks_content_hash ON tracks (content_hash);
+"""
+
+
+def _read_sidecar(path):
+    try:
+        value = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError, TypeError):
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def track_content_hash(path, size=None):
+    """Return a sampled content hash that identifies the same audio file.
+
+    The size plus the first, middle and last samples are hashed, so identical
+    files match across machines without reading whole tracks.
+    """
+    try:
+        size = os.path.getsize(path) if size is None else int(size)
+        digest = hashlib.sha256(str(size).encode("ascii"))
+        with open(path, "rb") as handle:
+            if size <= 3 * CONTENT_HASH_SAMPLE:
+                digest.update(handle.read())
+            else:
+                for offset in (
+                    0,
+                    (size - CONTENT_HASH_SAMPLE) // 2,
+                    size - CONTENT_HASH_SAMPLE,
+                ):
+                    handle.seek(offset)
+                    digest.update(handle.read(CONTENT_HASH_SAMPLE))
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+def _track_row(
+    playlist, audio_path, size, mtime, sidecar_mtime, cover_path,
+    content_hash="",
+):
+    audio_path = Path(audio_path)
+    sidecar = (
+        _read_sidecar(audio_path.with_suffix(".json")) if sidecar_mtime else {}
+    )
+    title = str(sidecar.get("title") or "").strip()
+    artist = str(sidecar.get("artist") or "").strip()
+    if (not title or not artist) and " - " in audio_path.stem:
+        parsed_artist, parsed_title = audio_path.stem.split(" - ", 1)
+        title = title or parsed_title.strip()
+        artist = artist or parsed_artist.strip()
+    source_url = str(
+        sidecar.get("source_url") or sidecar.get("download_url") or ""
+    ).strip()
+    duration = sidecar.get("duration_seconds") or sidecar.get("duration")
+    return (
+        str(audio_path),
+        str(playlist),
+        audio_path.name,
+        title or audio_path.stem,
+        artist or "Unknown Artist",
+        source_url,
+        "" if duration is None else str(duration),
+        str(cover_path or ""),
+        int(size),
+        float(mtime),
+        float(sidecar_mtime),
+        str(content_hash or ""),
+    )
+
+
+def scan_songs_folder(songs_path, should_stop=None):
+    audio = {}
+    sidecars = {}
+    covers = {}
+    with os.scandir(songs_path) as entries:
+        for index, entry in enumerate(entries):
+            if index % 256 == 0 and should_stop and should_stop():
+                return None
+            try:
+                if not entry.is_file():
+                    continue
+                stem, extension = os.path.splitext(entry.name)
+                extension = extension.lower()
+                if extension in AUDIO_EXTENSIONS:
+                    stat = entry.stat()
+                    audio[entry.name] = (
+                        entry.path, stat.st_size, stat.st_mtime
+                    )
+                elif extension == ".json":
+                    sidecars[stem] = entry.stat().st_mtime
+                elif extension in COVER_EXTENSIONS:
+                    current = covers.get(stem)
+                    if current is None or COVER_EXTENSIONS.index(
+                        extension
+                    ) < COVER_EXTENSIONS.index(current[1]):
+                        covers[stem] = (entry.path, extension)
+            except OSError:
+                continue
+    return audio, sidecars, covers
+
+
+class _TrackIndex:
+    """In-memory filename, source URL and content hash lookups over tracks."""
+
+    KEYS = ("filename", "source_url", "content_hash")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lookups = {key: {} for key in self.KEYS}
+
+    def replace(self, rows):
+        with self._lock:
+            self._entries.clear()
+            for lookup in self._lookups.values():
+                lookup.clear()
+            for row in rows:
+                self._put(*row)
+
+    def update(self, rows, removed=()):
+        with self._lock:
+            for path in removed:
+                self._discard(path)
+            for row in rows:
+                self._put(*row)
+
+    def remove_playlist(self, playlist):
+        with self._lock:
+            for path in [
+                path
+                for path, entry in self._entries.items()
+                if entry[0] == playlist
+            ]:
+                self._discard(path)
+
+    def find(self, key, value):
+        with self._lock:
+            return list(self._lookups[key].get(value, ()))
+
+    def playlist(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry[0] if entry is not None else None
+
+    def _put(self, path, playlist, filename, source_url, content_hash):
+        self._discard(path)
+        self._entries[path] = (playlist, filename, source_url, content_hash)
+        for key, value in zip(self.KEYS, (filename, source_url, content_hash)):
+            if value:
+                self._lookups[key].setdefault(value, {})[path] = None
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return
+        for key, value in zip(self.KEYS, entry[1:]):
+            paths = self._lookups[key].get(value)
+            if paths is None:
+                continue
+            paths.pop(path, None)
+            if not paths:
+                del self._lookups[key][value]
+
+
+def _index_row(row):
+    return row[0], row[1], row[2], row[5], row[11]
+
+
+class LibraryCatalog:
+    """SQLite index of every track's sidecar metadata across playlists.
+
+    Rows are refreshed per playlist folder by comparing file size and mtimes,
+    so only tracks whose audio, sidecar or cover changed are re-read.
+    """
+
+    def __init__(self, database_path, playlists_path):
+        self.database_path = Path(database_path)
+        self.playlists_path = Path(playlists_path)
+        self._lock = threading.RLock()
+        self._connection = None
+        self._ready = threading.Event()
+        self._scan_thread = None
+        self._index = _TrackIndex()
+        self._indexed = threading.Event()
+        self._hashing = False
+        self._hash_pending = False
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            str(self.database_path), check_same_thread=False, timeout=10
+        )
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version == 1:
+                connection.execute(
+                    "ALTER TABLE tracks ADD COLUMN "
+                    "content_hash TEXT NOT NULL DEFAULT ''"
+                )
+                connection.executescript(_SCHEMA)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                connection.commit()
+            elif version != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS tracks")
+                connection.executescript(_SCHEMA)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                connection.commit()
+        except sqlite3.Error:
+            connection.close()
+            raise
+        self._connection = connection
+        return connection
+
+    def _execute(self, query, parameters=()):
+        with self._lock:
+            try:
+                return self._connect().execute(query, parameters).fetchall()
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Query failed: {exc}")
+                return []
+
+    def owns(self, playlists_path):
+        try:
+            return Path(playlists_path).resolve() == (
+                self.playlists_path.resolve()
+            )
+        except OSError:
+            return Path(playlists_path) == self.playlists_path
+
+    def sync_playlist(self, name, should_stop=None):
+        name = str(name)
+        songs_path = self.playlists_path / name / "songs"
+        try:
+            scanned = scan_songs_folder(songs_path, should_stop)
+        except OSError:
+            scanned = ({}, {}, {})
+        if scanned is None:
+            return False
+        audio, sidecars, covers = scanned
+        with self._lock:
+            try:
+                connection = self._connect()
+                known = {
+                    row[0]: row[1:]
+                    for row in connection.execute(
+                        "SELECT path, size, mtime, sidecar_mtime, cover_path, "
+                        "content_hash FROM tracks WHERE playlist = ?",
+                        (name,),
+                    )
+                }
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Failed to read {name}: {exc}")
+                return False
+        changed = []
+        present = set()
+        for path, size, mtime in audio.values():
+            stem = os.path.splitext(os.path.basename(path))[0]
+            sidecar_mtime = sidecars.get(stem, 0.0)
+            cover_path = covers.get(stem, ("", ""))[0]
+            present.add(path)
+            stored = known.get(path)
+            if stored is not None and stored[:4] == (
+                size, mtime, sidecar_mtime, cover_path
+            ):
+                continue
+            if should_stop and len(changed) % 256 == 0 and should_stop():
+                return False
+            content_hash = (
+                stored[4] if stored is not None and stored[:2] == (size, mtime)
+                else ""
+            )
+            changed.append(_track_row(
+                name, path, size, mtime, sidecar_mtime, cover_path,
+                content_hash,
+            ))
+        removed = [(path,) for path in known if path not in present]
+        if not changed and not removed:
+            return True
+        return self._store(name, changed, removed)
+
+    def _store(self, name, rows, removed):
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.executemany(
+                        "DELETE FROM tracks WHERE path = ?", removed
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO tracks VALUES "
+                        "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Failed to update {name}: {exc}")
+                return False
+            self._index.update(
+                [_index_row(row) for row in rows],
+                [path for path, in removed],
+            )
+        return True
+
+    def sync_all(self, should_stop=None):
+        try:
+            names = sorted(
+                entry.name
+                for entry in os.scandir(self.playlists_path)
+                if entry.is_dir() and (Path(entry.path) / "songs").is_dir()
+            )
+        except OSError:
+            names = []
+        known_names = set(names)
+        for name in names:
+            if should_stop and should_stop():
+                return False
+            if not self.sync_playlist(name, should_stop):
+                return False
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    stale = [
+                        row
+                        for row in connection.execute(
+                            "SELECT DISTINCT playlist FROM tracks"
+                        )
+                        if row[0] not in known_names
+                    ]
+                    connection.executemany(
+                        "DELETE FROM tracks WHERE playlist = ?", stale
+                    )
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Failed to prune playlists: {exc}")
+                return False
+            for playlist, in stale:
+                self._index.remove_playlist(playlist)
+        return True
+
+    def update_tracks(self, name, paths):
+        rows = []
+        removed = []
+        paths = [str(value) for value in paths or []]
+        known = {
+            row[0]: row[1:]
+            for row in self._execute(
+                "SELECT path, size, mtime, content_hash FROM tracks "
+                f"WHERE path IN ({', '.join('?' * len(paths))})",
+                paths,
+            )
+        } if paths else {}
+        for value in paths:
+            path = Path(value)
+            if path.suffix.lower() not in AUDIO_EXTENSIONS:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                removed.append((str(path),))
+                continue
+            try:
+                sidecar_mtime = path.with_suffix(".json").stat().st_mtime
+            except OSError:
+                sidecar_mtime = 0.0
+            cover_path = next(
+                (
+                    str(path.with_suffix(extension))
+                    for extension in COVER_EXTENSIONS
+                    if path.with_suffix(extension).is_file()
+                ),
+                "",
+            )
+            stored = known.get(str(path))
+            rows.append(_track_row(
+                name, path, stat.st_size, stat.st_mtime,
+                sidecar_mtime, cover_path,
+                stored[2]
+                if stored is not None
+                and stored[:2] == (stat.st_size, stat.st_mtime)
+                else "",
+            ))
+        if rows or removed:
+            self._store(name, rows, removed)
+        if any(not row[11] for row in rows):
+            self.start_hashing()
+
+    def remove_playlist(self, name):
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        "DELETE FROM tracks WHERE playlist = ?", (str(name),)
+                    )
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Failed to remove {name}: {exc}")
+                return
+            self._index.remove_playlist(str(name))
+
+    def start_scan(self):
+        if self._scan_thread is not None and self._scan_thread.is_alive():
+            return
+        self._ready.clear()
+
+        def scan():
+            try:
+                self._load_index()
+                self.sync_all()
+            finally:
+                self._indexed.set()
+                self._ready.set()
+            self.hash_missing()
+
+        self._scan_thread = threading.Thread(
+            target=scan, name="library-catalog-scan", daemon=True
+        )
+        self._scan_thread.start()
+
+    def start_hashing(self):
+        """Hash tracks without a content hash on a background thread."""
+        with self._lock:
+            self._hash_pending = True
+            if self._hashing:
+                return
+            self._hashing = True
+        threading.Thread(
+            target=self._hash_loop, name="library-catalog-hash", daemon=True
+        ).start()
+
+    def hash_missing(self, should_stop=None):
+        with self._lock:
+            self._hash_pending = True
+            if self._hashing:
+                return
+            self._hashing = True
+        self._hash_loop(should_stop)
+
+    def _hash_loop(self, should_stop=None):
+        """Fill in content hashes that sync left empty.
+
+        Rows that changed on disk while being hashed keep an empty hash and
+        are picked up by a later pass.
+        """
+        finished = False
+        try:
+            while True:
+                with self._lock:
+                    if not self._hash_pending:
+                        self._hashing = False
+                        finished = True
+                        return
+                    self._hash_pending = False
+                rows = self._execute(
+                    "SELECT path, size, mtime FROM tracks "
+                    "WHERE content_hash = ''"
+                )
+                for path, size, mtime in rows:
+                    if should_stop and should_stop():
+                        return
+                    content_hash = track_content_hash(path, size)
+                    if content_hash:
+                        self._store_hash(path, size, mtime, content_hash)
+        finally:
+            if not finished:
+                with self._lock:
+                    self._hashing = False
+
+    def _store_hash(self, path, size, mtime, content_hash):
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        "UPDATE tracks SET content_hash = ? "
+                        "WHERE path = ? AND size = ? AND mtime = ?",
+                        (content_hash, path, size, mtime),
+                    )
+                rows = connection.execute(
+                    "SELECT path, playlist, filename, source_url, content_hash "
+                    "FROM tracks WHERE path = ?",
+                    (path,),
+                ).fetchall()
+            except sqlite3.Error as exc:
+                print(f"[Library catalog] Failed to store hash: {exc}")
+                return
+            self._index.update(rows)
+
+    def _load_index(self):
+        with self._lock:
+            self._index.replace(self._execute(
+                "SELECT path, playlist, filename, source_url, content_hash "
+                "FROM tracks"
+            ))
+        self._indexed.set()
+
+    def wait_ready(self, timeout=None):
+        if self._scan_thread is None:
+            self.start_scan()
+        return self._ready.wait(timeout)
+
+    def tracks(self, playlist=None, with_url=False):
+        query = (
+            "SELECT path, playlist, filename, title, artist, source_url, "
+            "duration, cover_path, size, mtime FROM tracks"
+        )
+        clauses = []
+        parameters = []
+        if playlist is not None:
+            clauses.append("playlist = ?")
+            parameters.append(str(playlist))
+        if with_url:
+            clauses.append(
+                "(source_url LIKE 'http://%' OR source_url LIKE 'https://%')"
+            )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        keys = (
+            "path", "playlist", "filename", "title", "artist",
+            "source_url", "duration", "cover_path", "size", "mtime",
+        )
+        return [dict(zip(keys, row)) for row in self._execute(query, parameters)]
+
+    def artists(self):
+        return [
+            row[0]
+            for row in self._execute(
+                "SELECT artist FROM tracks "
+                "WHERE artist != '' AND LOWER(artist) != 'unknown artist' "
+                "GROUP BY artist COLLATE NOCASE ORDER BY MIN(rowid)"
+            )
+        ]
+
+    def identities(self):
+        return self._execute("SELECT DISTINCT artist, title FROM tracks")
+
+    def _find(self, key, value, playlist=None):
+        if not value:
+            return []
+        if not self._indexed.is_set():
+            rows = self._execute(
+                f"SELECT path FROM tracks WHERE {key} = ? "
+                "ORDER BY playlist = ? DESC",
+                (str(value), str(playlist or "")),
+            )
+            return [Path(row[0]) for row in rows]
+        paths = self._index.find(key, str(value))
+        if playlist and len(paths) > 1:
+            paths.sort(key=lambda path: self._index.playlist(path) != playlist)
+        return [Path(path) for path in paths]
+
+    def find_filename(self, filename, playlist=None):
+        return self._find("filename", filename, playlist)
+
+    def find_source_url(self, source_url, playlist=None):
+        return self._find("source_url", source_url, playlist)
+
+    def find_content_hash(self, content_hash, playlist=None):
+        return self._find("content_hash", content_hash, playlist)
+
+
+_CATALOG = LibraryCatalog(LIBRARY_CATALOG_PATH, PLAYLISTS_PATH)
+
+
+def library_catalog():
+    return _CATALOG
+
+
+def start_catalog_scan():
+    _CATALOG.start_scan()
+
+
+def sync_catalog_playlist(name, playlists_path=None):
+    if playlists_path is None or _CATALOG.owns(playlists_path):
+        _CATALOG.sync_playlist(name)
+
+
+def update_catalog_tracks(name, paths):
+    _CATALOG.update_tracks(name, paths)
+
+
+def remove_catalog_playlist(name):
+    _CATALOG.remove_playlist(name)
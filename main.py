@@ -53,6 +53,8 @@ from hotkeys import (
 )
 from network_sync_manager import NetworkSyncManager
 from player_widgets import PlaylistView
+from library_catalog import start_catalog_scan
+from media_server import media_server
 from playlist_index import flush_playlist_writes
 from recommendation_widgets import FlowLayout
 from smooth_scroll import SmoothScrollArea
@@ -122,7 +124,7 @@ class MusicPlayer(
         self._account_stats_refresh_pending = False
         self._cloud_worker = None
         self._cloud_progress = None
-        self._cloud_download_worker = None
+        self._cloud_download_workers = {}
         self._cloud_load_queue = []
         self._cloud_load_index = 0
         self._cloud_load_failures = []
@@ -136,6 +138,7 @@ class MusicPlayer(
         self._playlist_summary_loaders = set()
         self._playlist_list_generation = 0
         self._prepare_paths()
+        start_catalog_scan()
         self._build()
         self.thumbnail_toolbar = ThumbnailToolbar(self, self.playlist_view)
         self._restore_account()
@@ -332,10 +335,10 @@ class MusicPlayer(
         QPushButton:hover{{background:{BUTTON_HOVER};border-color:#444444}}
         QPushButton:pressed{{background:{ACCENT_COLOR}}}
         QLineEdit{{background:{PANEL_BG};border:1px solid {BUTTON_BORDER};border-radius:4px;padding:12px;color:{TEXT_COLOR}}}
-        QListWidget{{background:{PANEL_BG};border:1px solid {BUTTON_BORDER};border-radius:4px;outline:0}}
-        QListWidget::item{{background:transparent;border-radius:4px;padding:6px}}
-        QListWidget::item:hover{{background:{BUTTON_HOVER}}}
-        QListWidget::item:selected{{background:{ACCENT_COLOR};color:#ffffff}}
+        QListWidget,BoundedSongList{{background:{PANEL_BG};border:1px solid {BUTTON_BORDER};border-radius:4px;outline:0}}
+        QListWidget::item,BoundedSongList::item{{background:transparent;border-radius:4px;padding:6px}}
+        QListWidget::item:hover,BoundedSongList::item:hover{{background:{BUTTON_HOVER}}}
+        QListWidget::item:selected,BoundedSongList::item:selected{{background:{ACCENT_COLOR};color:#ffffff}}
         QTextEdit{{background:{PANEL_BG};color:#cccccc;border:1px solid {BUTTON_BORDER};border-radius:4px;font-size:14px}}
         QSlider::groove:horizontal{{height:4px;background:{BUTTON_BORDER};border-radius:2px}}
         QSlider::handle:horizontal{{background:{ACCENT_COLOR};border-radius:6px;width:12px;margin:-4px 0}}
@@ -428,10 +431,7 @@ class MusicPlayer(
         cloud_request_running = (
             self._cloud_worker and self._cloud_worker.isRunning()
         )
-        cloud_download_running = (
-            self._cloud_download_worker
-            and self._cloud_download_worker.isRunning()
-        )
+        cloud_download_running = self._cloud_download_running()
         stats_request_running = (
             self._account_stats_worker
             and self._account_stats_worker.isRunning()
@@ -442,7 +442,7 @@ class MusicPlayer(
             or stats_request_running
         ):
             if cloud_download_running:
-                self._cloud_load_cancelled = True
+                self._cancel_cloud_load()
             QMessageBox.information(
                 self,
                 "Cloud Sync",
@@ -453,6 +453,8 @@ class MusicPlayer(
             return
         self.playlist_view.persist_volume()
         self.playlist_view.cancel_playlist_loading()
+        self.playlist_view.stop_playlist_watcher()
+        self.playlist_view.stop_row_loaders()
         for loader in tuple(self.playlist_view._playlist_loaders):
             loader.requestInterruption()
             loader.wait(1000)
@@ -488,6 +490,7 @@ def run():
     setup_application_fonts(app)
     loop = QEventLoop(app)
     asyncio.set_event_loop(loop)
+    media_server().attach(loop)
     window = MusicPlayer()
     polish_tree(window)
     window.show()
@@ -60,10 +60,7 @@ class AccountMixin:
             return
         if (
             (self._cloud_worker and self._cloud_worker.isRunning())
-            or (
-                self._cloud_download_worker
-                and self._cloud_download_worker.isRunning()
-            )
+            or self._cloud_download_running()
         ):
             QMessageBox.information(
                 self,
@@ -243,7 +240,7 @@ class AccountMixin:
                 "Wait for the current cloud operation to finish.",
             )
             return
-        if self._cloud_download_worker and self._cloud_download_worker.isRunning():
+        if self._cloud_download_running():
             QMessageBox.information(
                 self,
                 "Cloud Sync",
@@ -1,4 +1,5 @@
 from PySide6.QtCore import QTimer, Qt
+from PySide6.QtWidgets import QPushButton
 
 from account_sync import (
     CloudRequestWorker,
@@ -6,6 +7,7 @@ from account_sync import (
     local_playlist_urls,
 )
 from config import PLAYLISTS_PATH
+from download_scheduler import PRIORITY_BULK, download_scheduler
 from dropdown_ui import QInputDialog, QMessageBox, QProgressDialog
 from threads import BackgroundDownloader
 from ui_polish import polish_tree
@@ -32,10 +34,7 @@ class CloudSyncMixin:
     def _start_cloud_request(self, operation, arguments, label, callback):
         if (
             (self._cloud_worker and self._cloud_worker.isRunning())
-            or (
-                self._cloud_download_worker
-                and self._cloud_download_worker.isRunning()
-            )
+            or self._cloud_download_running()
         ):
             return
         self.account_panel.set_busy(True)
@@ -216,10 +215,7 @@ class CloudSyncMixin:
             return
         if (
             (self._cloud_worker and self._cloud_worker.isRunning())
-            or (
-                self._cloud_download_worker
-                and self._cloud_download_worker.isRunning()
-            )
+            or self._cloud_download_running()
         ):
             return
         playlists = sorted(self._pending_deleted_playlists)
@@ -322,73 +318,97 @@ class CloudSyncMixin:
         progress.setAutoClose(False)
         progress.setAutoReset(False)
         progress.canceled.connect(self._cancel_cloud_load)
+        scheduler = download_scheduler()
+        pause_button = QPushButton("Pause")
+        pause_button.setCheckable(True)
+        pause_button.toggled.connect(
+            lambda paused, button=pause_button: button.setText(
+                "Resume" if paused else "Pause"
+            )
+        )
+        pause_button.setChecked(scheduler.paused)
+        pause_button.clicked.connect(
+            lambda paused: scheduler.pause() if paused else scheduler.resume()
+        )
+        scheduler.paused_changed.connect(pause_button.setChecked)
+        progress.add_button(pause_button)
         self._cloud_progress = progress
         polish_tree(progress)
         progress.show()
-        self._start_next_cloud_track()
+        self._start_cloud_tracks()
 
     def _cancel_cloud_load(self):
         self._cloud_load_cancelled = True
-        if self._cloud_progress:
+        scheduler = download_scheduler()
+        scheduler.resume()
+        for worker in list(self._cloud_download_workers):
+            if scheduler.cancel(worker):
+                self._cloud_download_workers.pop(worker, None)
+                if worker in self.workers:
+                    self.workers.remove(worker)
+                worker.deleteLater()
+        if not self._cloud_download_workers:
+            QTimer.singleShot(0, self._finish_cloud_load_if_idle)
+        elif self._cloud_progress:
             self._cloud_progress.setLabelText(
-                "Cancelling after the current track..."
+                "Cancelling after the current tracks..."
             )
 
-    def _start_next_cloud_track(self):
-        if self._cloud_load_cancelled:
-            self._finish_cloud_load(cancelled=True)
-            return
-        if self._cloud_load_index >= len(self._cloud_load_queue):
-            self._finish_cloud_load()
-            return
-        row = self._cloud_load_queue[self._cloud_load_index]
-        worker = BackgroundDownloader(
-            row["url"],
-            PLAYLISTS_PATH / self._cloud_load_playlist / "songs",
-            self,
-        )
-        self._cloud_download_worker = worker
-        self.workers.append(worker)
-        worker.progress_signal.connect(
-            lambda percent, status, current=worker: self._cloud_track_progress(
-                current, percent, status
+    def _cloud_download_running(self):
+        return bool(self._cloud_download_workers)
+
+    def _start_cloud_tracks(self):
+        scheduler = download_scheduler()
+        destination = PLAYLISTS_PATH / self._cloud_load_playlist / "songs"
+        for row in self._cloud_load_queue:
+            worker = BackgroundDownloader(row["url"], destination, self)
+            self._cloud_download_workers[worker] = row
+            self.workers.append(worker)
+            worker.progress_signal.connect(
+                lambda _percent, status, current=worker: (
+                    self._cloud_track_progress(current, status)
+                )
             )
-        )
-        worker.finished_signal.connect(
-            lambda ok, message, current=worker: self._cloud_track_done(
-                current, ok, message
+            worker.finished_signal.connect(
+                lambda ok, message, current=worker: self._cloud_track_done(
+                    current, ok, message
+                )
             )
-        )
-        worker.start()
+            scheduler.submit(worker, PRIORITY_BULK)
 
-    def _cloud_track_progress(self, worker, percent, status):
-        if worker is not self._cloud_download_worker or not self._cloud_progress:
+    def _cloud_track_progress(self, worker, status):
+        row = self._cloud_download_workers.get(worker)
+        if row is None or not self._cloud_progress:
             return
         total = max(1, len(self._cloud_load_queue))
-        track_number = self._cloud_load_index + 1
-        row = self._cloud_load_queue[self._cloud_load_index]
+        _finished, _active, percent = download_scheduler().progress(
+            self._cloud_download_workers
+        )
         title = str(row.get("song_title") or "Track")
         self._cloud_progress.setLabelText(
-            f"{track_number}/{total} — {title}\n{status}"
+            f"{min(total, self._cloud_load_index + 1)}/{total} — {title}\n"
+            f"{status}"
         )
-        track_percent = max(0, min(100, int(percent or 0)))
         overall = round(
-            (self._cloud_load_index + track_percent / 100) * 100 / total
+            (
+                self._cloud_load_index * 100
+                + percent * len(self._cloud_download_workers)
+            )
+            / total
         )
-        self._cloud_progress.setValue(overall)
+        self._cloud_progress.setValue(max(0, min(100, overall)))
 
     def _cloud_track_done(self, worker, ok, message):
         if worker in self.workers:
             self.workers.remove(worker)
-        if worker is not self._cloud_download_worker:
+        row = self._cloud_download_workers.pop(worker, None)
+        if row is None:
             return
-        self._cloud_download_worker = None
         if ok and worker.last_downloaded_path:
             self.playlist_view.register_added_tracks(
                 self._cloud_load_playlist, [worker.last_downloaded_path]
             )
         if not ok:
-            row = self._cloud_load_queue[self._cloud_load_index]
             self._cloud_load_failures.append(
                 (str(row.get("song_title") or row.get("url")), str(message))
             )
@@ -401,7 +421,12 @@ class CloudSyncMixin:
                     / max(1, len(self._cloud_load_queue))
                 )
             )
-        QTimer.singleShot(0, self._start_next_cloud_track)
+        QTimer.singleShot(0, self._finish_cloud_load_if_idle)
+
+    def _finish_cloud_load_if_idle(self):
+        if self._cloud_download_workers or not self._cloud_load_queue:
+            return
+        self._finish_cloud_load(cancelled=self._cloud_load_cancelled)
 
     def _finish_cloud_load(self, cancelled=False):
         downloaded = self._cloud_load_index - len(self._cloud_load_failures)
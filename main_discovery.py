@@ -1,10 +1,10 @@
-import json
-
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QLabel
 
 from config import PLAYLISTS_PATH, TEXT_MUTED
+from download_scheduler import PRIORITY_USER, download_scheduler
 from dropdown_ui import QInputDialog, QMessageBox, QProgressDialog
+from library_catalog import library_catalog
 from main_common import make_menu
 from recommendation_widgets import RecommendationCard
 from threads import BackgroundDownloader, RecommendationFetcher, SearchWorker
@@ -17,16 +17,10 @@ class DiscoveryMixin:
             self.p2p.send(action, position)
 
     def _track_catalog(self):
-        rows = []
-        for sidecar in PLAYLISTS_PATH.glob("*/songs/*.json"):
-            try:
-                data = json.loads(sidecar.read_text(encoding="utf-8"))
-            except Exception:
-                continue
-            url = data.get("source_url") or data.get("download_url")
-            if url and str(url).startswith(("http://", "https://")):
-                rows.append({"playlist": sidecar.parent.parent.name, "title": data.get("title") or sidecar.stem, "artist": data.get("artist") or "Unknown Artist", "source_url": url})
-        return rows
+        return [
+            {"playlist": track["playlist"], "title": track["title"], "artist": track["artist"], "source_url": track["source_url"]}
+            for track in library_catalog().tracks(with_url=True)
+        ]
 
     def _download_missing_tracks(self, catalog):
 
@@ -143,7 +137,7 @@ class DiscoveryMixin:
         )
         polish_tree(progress)
         progress.show()
-        worker.start()
+        download_scheduler().submit(worker, PRIORITY_USER)
 
     def _remove_recommendation_card(self, card):
         for index in range(self.rec_flow.count()):
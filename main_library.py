@@ -10,6 +10,7 @@ from PySide6.QtWidgets import QApplication, QListWidgetItem
 
 from config import PANEL_BG, PLAYLISTS_PATH, TEXT_MUTED
 from dropdown_ui import QFileDialog, QInputDialog, QMessageBox
+from library_catalog import remove_catalog_playlist
 from main_common import make_menu
 from playlist_index import PlaylistSummaryLoader
 from utils import rounded_cover_pixmap
@@ -252,6 +253,7 @@ class LibraryMixin:
             except OSError as exc:
                 failures.append(f"{name}: {exc}")
                 continue
+            remove_catalog_playlist(name)
             self.playlist_list.takeItem(self.playlist_list.row(item))
             self._playlist_items.pop(name, None)
             self._playlist_summaries.pop(name, None)
@@ -166,11 +166,10 @@ class UpdateMixin:
         write_update_state(self.update_state)
 
     def _install_downloaded_update(self, release):
-        busy = any(
+        busy = self._cloud_download_running() or any(
             worker is not None and worker.isRunning()
             for worker in (
                 self._cloud_worker,
-                self._cloud_download_worker,
                 self._account_stats_worker,
             )
         )
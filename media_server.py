@@ -0,0 +1,367 @@
+import asyncio
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+
+from network_protocol import (
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_STREAM_CHUNK_SIZE, _parse_http_range,
+)
+
+
+class MediaSource:
+    """A byte stream the media server can serve while it is still growing.
+
+    Subclasses report how much is ``available`` and hand out ``view`` slices
+    of it, or None once the bytes are gone. Producers call ``notify`` from
+    any thread after adding bytes or finishing, which wakes requests waiting
+    for data.
+    """
+
+    content_type = "application/octet-stream"
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self._event = None
+        self._loop = None
+
+    @property
+    def size(self) -> int | None:
+        return None
+
+    @property
+    def available(self) -> int:
+        return 0
+
+    @property
+    def finished(self) -> bool:
+        return False
+
+    @property
+    def failed(self) -> bool:
+        return False
+
+    def view(self, start: int, stop: int):
+        raise NotImplementedError
+
+    def notify(self):
+        loop, event = self._loop, self._event
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, offset: int):
+        if self._event is None:
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+        self._event.clear()
+        if offset < self.available or self.finished or self.failed:
+            return
+        await self._event.wait()
+
+
+class MediaServer:
+    """One local HTTP/1.1 server for every progressively received stream.
+
+    Sources are looked up by token, either registered directly or through a
+    resolver for a path prefix. Connections stay open across range requests,
+    pipelined requests are answered in order, and bodies are written from
+    the sources' buffers, waiting for bytes that have not arrived yet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._socket = None
+        self._server = None
+        self._serving = False
+        self._loop = None
+        self.port = 0
+        self._sources: dict[str, MediaSource] = {}
+        self._resolvers = {}
+        self._connections: dict[int, dict] = {}
+        self._totals = {"connections": 0, "requests": 0, "bytes_sent": 0}
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def start(self) -> int:
+        """Bind the listening socket and return its port; safe from any thread.
+
+        Connections wait in the backlog until the event loop starts serving,
+        so a URL can be handed out before the loop picks the socket up.
+        """
+        with self._lock:
+            if self._socket is None:
+                listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                listener.bind(("127.0.0.1", 0))
+                listener.listen(64)
+                listener.setblocking(False)
+                self._socket = listener
+                self.port = int(listener.getsockname()[1])
+            if not self._serving:
+                loop = self._loop
+                try:
+                    running = asyncio.get_running_loop()
+                except RuntimeError:
+                    running = None
+                if running is not None:
+                    self._loop = loop = running
+                if loop is None:
+                    raise RuntimeError("Media server has no event loop")
+                self._serving = True
+                if running is loop:
+                    asyncio.ensure_future(self._serve())
+                else:
+                    loop.call_soon_threadsafe(
+                        lambda: asyncio.ensure_future(self._serve())
+                    )
+        return self.port
+
+    async def _serve(self):
+        try:
+            self._server = await asyncio.start_server(
+                self._handle_connection, sock=self._socket, limit=64 * 1024
+            )
+        except OSError as exc:
+            print(f"[Media server] Could not start: {exc}")
+            with self._lock:
+                self._serving = False
+
+    def close(self):
+        with self._lock:
+            server, self._server = self._server, None
+            listener, self._socket = self._socket, None
+            self._serving = False
+            self.port = 0
+        if server is not None:
+            server.close()
+        elif listener is not None:
+            listener.close()
+
+    def register(self, source: MediaSource, name: str = "") -> str:
+        port = self.start()
+        with self._lock:
+            self._sources[source.token] = source
+        name = urllib.parse.quote(name) if name else ""
+        suffix = f"/{name}" if name else ""
+        return f"http://127.0.0.1:{port}/media/{source.token}{suffix}"
+
+    def unregister(self, source: MediaSource):
+        with self._lock:
+            if self._sources.get(source.token) is source:
+                del self._sources[source.token]
+
+    def add_resolver(self, prefix: str, resolve):
+        with self._lock:
+            self._resolvers[str(prefix)] = resolve
+
+    def remove_resolver(self, prefix: str, resolve=None):
+        with self._lock:
+            if resolve is None or self._resolvers.get(prefix) == resolve:
+                self._resolvers.pop(prefix, None)
+
+    def url(self, prefix: str, token: str, name: str = "") -> str:
+        port = self.start()
+        suffix = f"/{urllib.parse.quote(name)}" if name else ""
+        return f"http://127.0.0.1:{port}/{prefix}/{token}{suffix}"
+
+    def stats(self) -> dict:
+        return {
+            **self._totals,
+            "open": [dict(stats) for stats in self._connections.values()],
+        }
+
+    def _lookup(self, path: str) -> MediaSource | None:
+        parts = path.split("/")
+        if len(parts) < 3:
+            return None
+        prefix, token = parts[1], parts[2]
+        with self._lock:
+            if prefix == "media":
+                return self._sources.get(token)
+            resolve = self._resolvers.get(prefix)
+        return resolve(token) if resolve is not None else None
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        stats = {
+            "peer": f"{peer[0]}:{peer[1]}" if isinstance(peer, tuple) else "",
+            "opened": time.time(),
+            "requests": 0,
+            "bytes_sent": 0,
+            "waits": 0,
+            "last_range": None,
+        }
+        self._connections[id(writer)] = stats
+        self._totals["connections"] += 1
+        try:
+            while True:
+                try:
+                    request = await self._read_request(
+                        reader,
+                        HTTP_KEEPALIVE_TIMEOUT if stats["requests"] else 10,
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if request is None:
+                    break
+                stats["requests"] += 1
+                self._totals["requests"] += 1
+                if not await self._serve_request(writer, request, stats):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, BrokenPipeError):
+            pass
+        except Exception as exc:
+            print(f"[Media server] Request failed: {exc}")
+            try:
+                await self._write_error(writer, 500, "Stream Error")
+            except Exception:
+                pass
+        finally:
+            self._connections.pop(id(writer), None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    @staticmethod
+    async def _read_request(reader, timeout: float):
+        try:
+            raw = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), timeout=timeout
+            )
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial.strip():
+                raise
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("HTTP header is too large")
+        lines = raw.decode("iso-8859-1").split("\r\n")
+        request = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().casefold()] = value.strip()
+        return request, headers
+
+    async def _serve_request(self, writer, request, stats) -> bool:
+        """Answer one request; return whether the connection can be reused."""
+        line, headers = request
+        if len(line) != 3 or line[0] not in {"GET", "HEAD"}:
+            await self._write_error(writer, 405, "Method Not Allowed")
+            return False
+        connection = headers.get("connection", "").casefold()
+        keep_alive = (
+            connection == "keep-alive"
+            if line[2] == "HTTP/1.0"
+            else connection != "close"
+        )
+        source = self._lookup(urllib.parse.urlsplit(line[1]).path)
+        if source is None:
+            await self._write_error(writer, 404, "Not Found")
+            return False
+        while (
+            source.available == 0
+            and source.size is None
+            and not source.finished
+            and not source.failed
+        ):
+            await source.wait(0)
+        if source.failed and source.available == 0:
+            await self._write_error(writer, 502, "Bad Gateway")
+            return False
+
+        total = source.size
+        if total is None:
+            partial, start, end = False, 0, None
+            keep_alive = False
+        else:
+            byte_range = _parse_http_range(headers.get("range", ""), total)
+            if byte_range is False:
+                await self._write_error(
+                    writer, 416, "Range Not Satisfiable", total
+                )
+                return False
+            partial = byte_range is not None
+            start, end = byte_range if partial else (0, total - 1)
+        stats["last_range"] = (start, end)
+
+        status = "206 Partial Content" if partial else "200 OK"
+        response_headers = [
+            f"HTTP/1.1 {status}",
+            f"Content-Type: {source.content_type}",
+            "Accept-Ranges: bytes",
+            "Cache-Control: no-store",
+            "Connection: keep-alive" if keep_alive else "Connection: close",
+        ]
+        if end is not None:
+            response_headers.append(f"Content-Length: {end - start + 1}")
+        if keep_alive:
+            response_headers.append(
+                f"Keep-Alive: timeout={int(HTTP_KEEPALIVE_TIMEOUT)}"
+            )
+        if partial:
+            response_headers.append(
+                f"Content-Range: bytes {start}-{end}/{total}"
+            )
+        writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode())
+        if line[0] == "HEAD":
+            await writer.drain()
+            return keep_alive
+
+        offset = start
+        while end is None or offset <= end:
+            available = source.available
+            if offset < available:
+                stop = min(available, offset + HTTP_STREAM_CHUNK_SIZE)
+                if end is not None:
+                    stop = min(stop, end + 1)
+                data = source.view(offset, stop)
+                if data is None or len(data) < stop - offset:
+                    return False
+                writer.write(data)
+                await writer.drain()
+                stats["bytes_sent"] += stop - offset
+                self._totals["bytes_sent"] += stop - offset
+                offset = stop
+                continue
+            if source.finished or source.failed:
+                return False
+            stats["waits"] += 1
+            await source.wait(offset)
+        return keep_alive
+
+    @staticmethod
+    async def _write_error(writer, status: int, reason: str, total=None):
+        body = f"{status} {reason}\n".encode("utf-8")
+        content_range = (
+            f"Content-Range: bytes */{total}\r\n" if total is not None else ""
+        )
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"{content_range}"
+                "Connection: close\r\n\r\n"
+            ).encode("ascii")
+            + body
+        )
+        await writer.drain()
+
+
+_MEDIA_SERVER = MediaServer()
+
+
+def media_server():
+    return _MEDIA_SERVER
@@ -6,7 +6,8 @@ import asyncio
 import time
 
 from network_protocol import (
-    RECONNECT_INITIAL_DELAY, RECONNECT_MAX_DELAY, SOCKET_BUFFER_SIZE,
+    BINARY_FRAMES_FEATURE, PROTOCOL_FEATURES, RECONNECT_INITIAL_DELAY,
+    RECONNECT_MAX_DELAY, SOCKET_BUFFER_SIZE, SWARM_FEATURE,
     STREAM_BUFFER_AHEAD_SECONDS, STREAM_MAX_BUFFER_SECONDS,
     STREAM_MIN_BUFFER_SECONDS, _normalize_room_host, _read_frame, _tune_socket,
 )
@@ -67,6 +68,9 @@ class NetworkConnectionMixin:
         connection_serial = self._connection_serial
         self._writer = writer
         self._write_lock = asyncio.Lock()
+        self._binary_frames = False
+        self._client_roster = {}
+        self._client_roster_version = -1
         try:
             await self._send_frame_locked(
                 {
@@ -76,6 +80,12 @@ class NetworkConnectionMixin:
                     "country": self.local_country,
                     "public_ip": self.local_public_ip,
                     "resume_streams": self._resume_stream_descriptors(),
+                    "features": [
+                        feature
+                        for feature in PROTOCOL_FEATURES
+                        if feature != SWARM_FEATURE or self._peer_port
+                    ],
+                    "peer_port": self._peer_port,
                 }
             )
         except Exception as exc:
@@ -208,6 +218,24 @@ class NetworkConnectionMixin:
                 return
             delay = min(RECONNECT_MAX_DELAY, delay * 2)
 
+    def _apply_roster_delta(self, packet: dict):
+        if int(packet.get("base") or 0) != self._client_roster_version:
+            self._send_packet({"type": "roster_sync"})
+            return
+        for member_id in packet.get("removed") or ():
+            self._client_roster.pop(str(member_id), None)
+        for member in packet.get("members") or ():
+            if isinstance(member, dict):
+                self._client_roster[str(member.get("id"))] = member
+        self._client_roster_version = int(packet.get("version") or 0)
+        self._emit_roster()
+
+    def _emit_roster(self):
+        members = [dict(member) for member in self._client_roster.values()]
+        for member in members:
+            member["is_self"] = member.get("id") == self.local_id
+        self.roster_updated.emit(members)
+
     def _handle_incoming(
         self, packet, payload, generation, connection_serial
     ):
@@ -217,45 +245,57 @@ class NetworkConnectionMixin:
         ):
             return
         kind = packet.get("type")
-        if kind == "ping":
+        if kind == "hello":
+            features = packet.get("features")
+            self._binary_frames = (
+                isinstance(features, list)
+                and BINARY_FRAMES_FEATURE in features
+            )
+        elif kind == "ping":
+            received = time.time()
             self._send_packet({
                 "type": "pong",
                 "ts": packet.get("ts"),
+                "client_received": received,
                 "client_time": time.time(),
             })
         elif kind == "clock_hint":
             try:
-                sample = (
-                    time.time() - float(packet["server_time"])
-                )
-                if self._clock_synced:
-                    self._server_clock_offset = (
-                        self._server_clock_offset * 0.9 + sample * 0.1
+                if not self._clock.synced:
+                    self._clock.add_hint(
+                        time.time() - float(packet["server_time"])
                     )
-                else:
-                    self._server_clock_offset = sample
-                self._clock_synced = True
             except (KeyError, TypeError, ValueError):
                 pass
         elif kind == "clock_sync":
             try:
-                sample = float(packet["offset"])
-                if self._clock_synced:
-                    self._server_clock_offset = (
-                        self._server_clock_offset * 0.25 + sample * 0.75
+                if packet.get("client_received") is not None:
+                    self._clock.add_exchange(
+                        float(packet["ts"]),
+                        float(packet["client_received"]),
+                        float(packet["client_time"]),
+                        float(packet["server_received"]),
                     )
                 else:
-                    self._server_clock_offset = sample
-                self._clock_synced = True
+                    self._clock.add_sample(
+                        time.time(),
+                        float(packet["offset"]),
+                        float(packet.get("rtt_ms") or 0) / 1000,
+                    )
             except (KeyError, TypeError, ValueError):
                 pass
         elif kind == "roster" and isinstance(
             packet.get("members"), list
         ):
-            members = packet["members"]
-            for member in members:
-                member["is_self"] = member.get("id") == self.local_id
-            self.roster_updated.emit(members)
+            self._client_roster = {
+                str(member.get("id")): member
+                for member in packet["members"]
+                if isinstance(member, dict)
+            }
+            self._client_roster_version = int(packet.get("version") or 0)
+            self._emit_roster()
+        elif kind == "roster_delta":
+            self._apply_roster_delta(packet)
         elif (
             kind == "catalog"
             and self.role == "guest"
@@ -278,6 +318,9 @@ class NetworkConnectionMixin:
                         float(packet.get("target_seconds") or STREAM_BUFFER_AHEAD_SECONDS),
                     ),
                 )
+            throughput = float(packet.get("throughput_bps") or 0.0)
+            if throughput > 0:
+                self._room_throughput_bps = throughput
         elif kind == "snapshot_wait":
             self._client_preparing_request = "snapshot"
             self._play_token += 1
@@ -293,6 +336,10 @@ class NetworkConnectionMixin:
             self._receive_file_cover(packet, payload)
         elif kind == "file_chunk":
             self._receive_file_chunk(packet, payload)
+        elif kind == "swarm_grant":
+            self._swarm_grant(packet)
+        elif kind == "swarm_fetch":
+            self._swarm_fetch(packet)
         elif kind == "file_end":
             self._receive_file_end(packet)
         elif kind == "file_abort":
@@ -306,6 +353,13 @@ class NetworkConnectionMixin:
             for stale_id in list(self._incoming_files):
                 if stale_id != keep_stream:
                     self._abort_incoming_file(stale_id)
+            if keep_stream in self._prefetch_ids:
+                self._prefetch_ids.discard(keep_stream)
+                state = self._streams.get(keep_stream)
+                if state is not None:
+                    self.stream_buffer_progress_changed.emit(
+                        int(state["received"]), int(state["size"])
+                    )
             self._client_preparing_request = str(
                 packet.get("request_id") or ""
             )
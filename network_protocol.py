@@ -5,21 +5,27 @@ from __future__ import annotations
 import asyncio
 import ipaddress
 import json
+import mmap
 import os
 import re
 import socket
 import struct
 import subprocess
+import tempfile
 import threading
 import urllib.request
+from collections import deque
 from urllib.parse import urlsplit
 from pathlib import Path
 from typing import Final
 
-from config import FFMPEG_PATH
+from config import FFMPEG_PATH, ROOM_BUFFER_PATH, ROOM_SPILL_THRESHOLD
 
 PING_INTERVAL: Final[float] = 2.5
 STATE_INTERVAL: Final[float] = 1.0
+STATE_KEEPALIVE_INTERVAL: Final[float] = 5.0
+STATE_POSITION_TOLERANCE_MS: Final[int] = 50
+ROSTER_PING_THRESHOLD_MS: Final[int] = 10
 COUNTRY_LOOKUP_TIMEOUT: Final[float] = 4.0
 COUNTRY_RESPONSE_LIMIT: Final[int] = 64 * 1024
 COUNTRY_LOOKUP_USER_AGENT: Final[str] = "CloudPlayer/1.1"
@@ -33,9 +39,20 @@ COUNTRY_IP_LOOKUP_URLS: Final[tuple[str, ...]] = (
 )
 START_DELAY: Final[float] = 0.35
 DRIFT_LIMIT_MS: Final[int] = 220
+SYNC_TOLERANCE_MS: Final[int] = 20
+SYNC_SETTLE_MS: Final[int] = 5
+SYNC_CHECK_INTERVAL_MS: Final[int] = 500
+SYNC_NUDGE_SECONDS: Final[float] = 4.0
+SYNC_MAX_RATE_NUDGE: Final[float] = 0.02
+CLOCK_SAMPLE_WINDOW: Final[int] = 16
+CLOCK_BURST_SAMPLES: Final[int] = 8
+CLOCK_MAX_DELAY: Final[float] = 2.0
+CLOCK_MAX_SKEW: Final[float] = 500e-6
+CLOCK_SKEW_MIN_SPAN: Final[float] = 10.0
 FILE_CHUNK_SIZE: Final[int] = 2 * 1024 * 1024
 SOCKET_BUFFER_SIZE: Final[int] = 2 * 1024 * 1024
 HTTP_STREAM_CHUNK_SIZE: Final[int] = 1024 * 1024
+HTTP_KEEPALIVE_TIMEOUT: Final[float] = 15.0
 DEFAULT_SEGMENT_SIZE: Final[int] = 256 * 1024
 TARGET_SEGMENT_SECONDS: Final[float] = 8.0
 MIN_SEGMENT_SECONDS: Final[float] = 5.0
@@ -49,13 +66,40 @@ STREAM_MAX_BUFFER_SECONDS: Final[float] = 48.0
 STREAM_REPORT_INTERVAL: Final[float] = 0.5
 STREAM_POSITION_POLL_INTERVAL: Final[float] = 0.2
 STREAM_PREPARE_TIMEOUT: Final[float] = 60.0
+TRANSCODE_HEADROOM: Final[float] = 2.5
+TRANSCODE_BITRATES: Final[tuple[int, ...]] = (96, 128, 160, 192)
+TRANSCODE_TIMEOUT: Final[float] = 180.0
+SWARM_MIN_RANGE: Final[int] = FILE_CHUNK_SIZE
+SWARM_MAX_SERVES: Final[int] = 2
+SWARM_CONNECT_TIMEOUT: Final[float] = 4.0
+SWARM_IDLE_TIMEOUT: Final[float] = 15.0
+SWARM_FETCH_TIMEOUT: Final[float] = 180.0
+SWARM_GRANT_TTL: Final[float] = 30.0
 RECONNECT_INITIAL_DELAY: Final[float] = 0.5
 RECONNECT_MAX_DELAY: Final[float] = 15.0
 REPLAY_DRAIN_BYTES: Final[int] = 4 * 1024 * 1024
 MAX_PEER_WRITE_BUFFER: Final[int] = 4 * SOCKET_BUFFER_SIZE
+OUTBOX_LOW_WATER: Final[int] = SOCKET_BUFFER_SIZE
 MAX_TRACK_SIZE: Final[int] = 500 * 1024 * 1024
 MAX_HEADER_SIZE: Final[int] = 1024 * 1024
 FRAME_PREFIX_SIZE: Final[int] = 4
+BINARY_FRAME_FLAG: Final[int] = 0x80000000
+BINARY_FRAMES_FEATURE: Final[str] = "binary_frames"
+QUEUE_PREFETCH_FEATURE: Final[str] = "queue_prefetch"
+SWARM_FEATURE: Final[str] = "swarm"
+ROSTER_DELTAS_FEATURE: Final[str] = "roster_deltas"
+PROTOCOL_FEATURES: Final[tuple[str, ...]] = (
+    BINARY_FRAMES_FEATURE, QUEUE_PREFETCH_FEATURE, SWARM_FEATURE,
+    ROSTER_DELTAS_FEATURE,
+)
+_BINARY_FRAME_TYPES: Final[tuple[str, ...]] = ("upload_chunk", "file_chunk")
+_BINARY_FRAME_FIELDS: Final[frozenset[str]] = frozenset({
+    "type", "transfer_id", "offset", "segment_index", "segment_seconds",
+})
+_BINARY_HEADER = struct.Struct("!B16sQIdI")
+_BULK_FRAME_TYPES: Final[frozenset[str]] = frozenset({
+    "file_chunk", "file_cover", "file_end",
+})
 _PLAYLIST_CACHE_LOCK = threading.Lock()
 
 
@@ -146,7 +190,83 @@ def _probe_duration(path: Path) -> float | None:
     return None
 
 
-def _tune_socket(writer) -> None:
+def _parse_http_range(value: str, total: int):
+    """Return ``(start, end)`` for a Range header, None without one.
+
+    False means the range cannot be satisfied for ``total`` bytes.
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", value or "", re.I)
+    if not match:
+        return None
+    first, last = match.groups()
+    start, end = 0, total - 1
+    if not first and last:
+        start = max(0, total - int(last))
+    elif first:
+        start = int(first)
+        if last:
+            end = min(end, int(last))
+    elif not last:
+        return False
+    if start >= total or end < start:
+        return False
+    return start, end
+
+
+def _transcode_bitrate(size: int, duration, throughput_bps: float) -> int | None:
+    """Return an MP3 bitrate in kbit/s for a link, or None to send as is.
+
+    ``throughput_bps`` must cover the stream with ``TRANSCODE_HEADROOM`` to
+    spare; tracks that already fit are left alone.
+    """
+    seconds = _duration_seconds(duration)
+    if not seconds or throughput_bps <= 0:
+        return None
+    source_kbps = size * 8 / seconds / 1000
+    budget_kbps = throughput_bps * 8 / 1000 / TRANSCODE_HEADROOM
+    if source_kbps <= budget_kbps:
+        return None
+    bitrate = max(
+        (rate for rate in TRANSCODE_BITRATES if rate <= budget_kbps),
+        default=TRANSCODE_BITRATES[0],
+    )
+    return bitrate if source_kbps > bitrate * 1.25 else None
+
+
+def _transcode_track(path: Path, output: Path, bitrate_kbps: int) -> bool:
+    if not FFMPEG_PATH.is_file():
+        return False
+    creation_flags = 0x08000000 if os.name == "nt" else 0
+    try:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        result = subprocess.run(
+            [
+                str(FFMPEG_PATH), "-hide_banner", "-loglevel", "error",
+                "-y", "-i", str(path), "-map", "0:a:0", "-vn",
+                "-c:a", "libmp3lame", "-b:a", f"{int(bitrate_kbps)}k",
+                str(output),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=TRANSCODE_TIMEOUT,
+            check=False,
+            creationflags=creation_flags,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        print(f"[Room] Transcode failed: {exc}")
+        output.unlink(missing_ok=True)
+        return False
+    if result.returncode != 0 or not output.is_file():
+        message = result.stderr.decode("utf-8", "replace").strip()
+        print(f"[Room] Transcode failed: {message[-300:]}")
+        output.unlink(missing_ok=True)
+        return False
+    return output.stat().st_size > 0
+
+
+def _tune_socket(
+    writer, write_buffer_limit: int = 4 * SOCKET_BUFFER_SIZE
+) -> None:
     sock = writer.get_extra_info("socket")
     if sock is not None:
         for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
@@ -166,7 +286,7 @@ def _tune_socket(writer) -> None:
     if transport is not None:
         try:
             transport.set_write_buffer_limits(
-                high=4 * SOCKET_BUFFER_SIZE, low=SOCKET_BUFFER_SIZE
+                high=write_buffer_limit, low=write_buffer_limit // 4
             )
         except (AttributeError, NotImplementedError):
             pass
@@ -205,6 +325,22 @@ def _normalize_public_ip(value) -> str:
     return address.compressed if address.is_global else ""
 
 
+def _peer_address(value) -> str:
+    """Return the address other members should dial to reach ``value``.
+
+    Loopback peers run on the host machine, so they are reported as an empty
+    address and members dial the room host they are already connected to.
+    """
+    try:
+        address = ipaddress.ip_address(str(value or "").split("%", 1)[0])
+    except ValueError:
+        return ""
+    mapped = getattr(address, "ipv4_mapped", None)
+    if mapped is not None:
+        address = mapped
+    return "" if address.is_loopback else address.compressed
+
+
 def _detect_public_location(ip="") -> tuple[str, str]:
 
     expected_ip = _normalize_public_ip(ip)
@@ -261,42 +397,327 @@ def _safe_name(value: str, fallback: str) -> str:
     return value[:160] or fallback
 
 
-def _encode_frame(packet: dict, payload: bytes = b"") -> bytes:
+def _encode_binary_header(packet: dict, payload_size: int) -> bytes | None:
+    try:
+        code = _BINARY_FRAME_TYPES.index(packet.get("type")) + 1
+        transfer_id = bytes.fromhex(str(packet.get("transfer_id") or ""))
+        offset = int(packet.get("offset") or 0)
+        segment_index = int(packet.get("segment_index") or 0)
+        segment_seconds = float(packet.get("segment_seconds") or 0)
+    except (ValueError, TypeError):
+        return None
+    if (
+        len(transfer_id) != 16
+        or not _BINARY_FRAME_FIELDS.issuperset(packet)
+        or offset < 0
+        or not 0 <= segment_index <= 0xFFFFFFFF
+    ):
+        return None
+    return struct.pack(
+        "!I", BINARY_FRAME_FLAG | _BINARY_HEADER.size
+    ) + _BINARY_HEADER.pack(
+        code, transfer_id, offset, segment_index, segment_seconds,
+        payload_size,
+    )
+
+
+def _decode_binary_header(raw_header: bytes) -> tuple[dict, int]:
+    (
+        code, transfer_id, offset, segment_index, segment_seconds,
+        payload_size,
+    ) = _BINARY_HEADER.unpack(raw_header)
+    if not 1 <= code <= len(_BINARY_FRAME_TYPES):
+        raise ValueError("Unknown binary frame type")
+    packet = {
+        "type": _BINARY_FRAME_TYPES[code - 1],
+        "transfer_id": transfer_id.hex(),
+        "offset": offset,
+        "segment_index": segment_index,
+    }
+    if segment_seconds:
+        packet["segment_seconds"] = segment_seconds
+    return packet, payload_size
+
+
+def _encode_frame_header(
+    packet: dict, payload_size: int, binary: bool = False
+) -> bytes:
+    if binary and packet.get("type") in _BINARY_FRAME_TYPES:
+        header = _encode_binary_header(packet, payload_size)
+        if header is not None:
+            return header
     header = dict(packet)
-    header["payload_size"] = len(payload)
+    header["payload_size"] = payload_size
     encoded = json.dumps(
         header, ensure_ascii=False, separators=(",", ":")
     ).encode("utf-8")
     if not encoded or len(encoded) > MAX_HEADER_SIZE:
         raise ValueError("Frame header is too large")
-    return struct.pack("!I", len(encoded)) + encoded + payload
+    return struct.pack("!I", len(encoded)) + encoded
+
+
+def _frame_parts(
+    packet: dict, payload=b"", binary: bool = False
+) -> tuple:
+    """Return a frame as buffers for ``writer.writelines``.
+
+    The payload is passed through untouched, so relaying a chunk or a
+    memoryview slice of a track buffer never copies the audio in Python.
+    With ``binary`` set, audio chunk frames get a fixed struct header
+    instead of JSON; only use it towards peers that announced
+    ``binary_frames`` in their hello, since older peers reject the flagged
+    prefix.
+    """
+    header = _encode_frame_header(packet, len(payload), binary)
+    return (header, payload) if payload else (header,)
 
 
 async def _read_frame(reader: asyncio.StreamReader) -> tuple[dict, bytes]:
     prefix = await reader.readexactly(FRAME_PREFIX_SIZE)
     header_size = struct.unpack("!I", prefix)[0]
-    if header_size <= 0 or header_size > MAX_HEADER_SIZE:
-        raise ValueError("Invalid frame header size")
-    raw_header = await reader.readexactly(header_size)
-    packet = json.loads(raw_header.decode("utf-8"))
-    if not isinstance(packet, dict):
-        raise ValueError("Invalid frame header")
-    payload_size = int(packet.pop("payload_size", 0) or 0)
+    if header_size & BINARY_FRAME_FLAG:
+        if header_size & ~BINARY_FRAME_FLAG != _BINARY_HEADER.size:
+            raise ValueError("Invalid binary frame header size")
+        packet, payload_size = _decode_binary_header(
+            await reader.readexactly(_BINARY_HEADER.size)
+        )
+    else:
+        if header_size <= 0 or header_size > MAX_HEADER_SIZE:
+            raise ValueError("Invalid frame header size")
+        raw_header = await reader.readexactly(header_size)
+        packet = json.loads(raw_header.decode("utf-8"))
+        if not isinstance(packet, dict):
+            raise ValueError("Invalid frame header")
+        payload_size = int(packet.pop("payload_size", 0) or 0)
     if payload_size < 0 or payload_size > FILE_CHUNK_SIZE:
         raise ValueError("Invalid frame payload size")
     payload = await reader.readexactly(payload_size) if payload_size else b""
     return packet, payload
 
 
-class _Member:
-    __slots__ = ("writer", "id", "name", "country", "ping_ms")
+class _ClockEstimator:
+    """Estimate the server clock from NTP-style ping exchanges.
+
+    Only the lower half of recent samples by round trip is trusted, since
+    queueing delay only ever adds error. When those samples span long
+    enough, a least-squares drift rate keeps the offset right between pings.
+    Offsets are local time minus server time, in seconds.
+    """
+
+    __slots__ = ("_samples", "_hint")
+
+    def __init__(self, window: int = CLOCK_SAMPLE_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._hint: float | None = None
+
+    @property
+    def synced(self) -> bool:
+        return bool(self._samples) or self._hint is not None
+
+    def reset(self):
+        self._samples.clear()
+        self._hint = None
+
+    def add_hint(self, offset: float):
+        self._hint = float(offset)
+
+    def add_exchange(
+        self, server_sent: float, local_received: float,
+        local_sent: float, server_received: float,
+    ) -> bool:
+        delay = (server_received - server_sent) - (local_sent - local_received)
+        offset = (
+            (local_received - server_sent) + (local_sent - server_received)
+        ) / 2
+        return self.add_sample(local_sent, offset, delay)
+
+    def add_sample(self, local_time: float, offset: float, delay: float) -> bool:
+        if not 0 <= delay <= CLOCK_MAX_DELAY:
+            return False
+        self._samples.append((float(local_time), float(offset), float(delay)))
+        return True
+
+    def offset(self, now: float) -> float:
+        if not self._samples:
+            return self._hint or 0.0
+        trusted = sorted(self._samples, key=lambda sample: sample[2])
+        trusted = trusted[: max(1, (len(trusted) + 1) // 2)]
+        times = [sample[0] for sample in trusted]
+        if len(trusted) < 3 or max(times) - min(times) < CLOCK_SKEW_MIN_SPAN:
+            return trusted[0][1]
+        mean_time = sum(times) / len(trusted)
+        mean_offset = sum(sample[1] for sample in trusted) / len(trusted)
+        spread = sum((value - mean_time) ** 2 for value in times)
+        skew = sum(
+            (sample[0] - mean_time) * (sample[1] - mean_offset)
+            for sample in trusted
+        ) / spread
+        skew = max(-CLOCK_MAX_SKEW, min(CLOCK_MAX_SKEW, skew))
+        return mean_offset + skew * (now - mean_time)
+
+
+class _TrackBuffer:
+    """Fixed-size buffer for one room track, filled once in order.
+
+    Tracks up to ``spill_threshold`` bytes live in a bytearray. Larger ones
+    are backed by a memory-mapped temporary file, so only the pages that are
+    being received or served stay resident and the rest can be evicted.
+    """
+
+    __slots__ = ("size", "_file", "_data", "_view")
+
+    def __init__(
+        self,
+        size: int,
+        spill_threshold: int = ROOM_SPILL_THRESHOLD,
+        directory: Path = ROOM_BUFFER_PATH,
+    ):
+        self.size = int(size)
+        self._file = None
+        self._data = None
+        if self.size > spill_threshold:
+            try:
+                Path(directory).mkdir(parents=True, exist_ok=True)
+                self._file = tempfile.TemporaryFile(dir=directory)
+                self._file.truncate(self.size)
+                self._data = mmap.mmap(self._file.fileno(), self.size)
+            except (OSError, ValueError) as exc:
+                print(f"[Room] Could not spill track buffer to disk: {exc}")
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+        if self._data is None:
+            self._data = bytearray(self.size)
+        self._view = memoryview(self._data)
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, offset: int, data):
+        self._view[offset : offset + len(data)] = data
+
+    def view(self, start: int, stop: int) -> memoryview:
+        return self._view[start:stop]
+
+    def close(self):
+        if self._file is None:
+            return
+        self._view.release()
+        try:
+            self._data.close()
+        except BufferError:
+            pass
+        self._file.close()
+        self._file = None
+
+
+class _MemberOutbox:
+    """Frames waiting to be written to one room member.
+
+    Audio frames queue behind everything else, so playback control, state
+    and roster updates are never stuck behind megabytes of track data. The
+    offsets handed to the socket are kept per transfer, which lets a member
+    that falls behind be resumed from exactly what it was sent.
+    """
+
+    __slots__ = (
+        "_urgent", "_bulk", "urgent_bytes", "bulk_bytes", "_ready",
+        "_writable", "sent", "cover_sent",
+    )
+
+    def __init__(self):
+        self._urgent = deque()
+        self._bulk = deque()
+        self.urgent_bytes = 0
+        self.bulk_bytes = 0
+        self._ready = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.sent: dict[str, int] = {}
+        self.cover_sent: dict[str, int] = {}
+
+    def put(self, packet: dict, parts: tuple, live=()):
+        kind = packet.get("type")
+        transfer_id = str(packet.get("transfer_id") or "")
+        size = sum(len(part) for part in parts)
+        entry = (kind, transfer_id, int(packet.get("offset") or 0), parts, size)
+        if kind in _BULK_FRAME_TYPES:
+            self._bulk.append(entry)
+            self.bulk_bytes += size
+            if self.bulk_bytes > OUTBOX_LOW_WATER:
+                self._writable.clear()
+        else:
+            if kind == "file_begin" and not packet.get("prefetch"):
+                self.discard_transfers(
+                    lambda other: other != transfer_id and other not in live
+                )
+            elif kind == "file_abort":
+                self.discard_transfers(lambda other: other == transfer_id)
+            self._urgent.append(entry)
+            self.urgent_bytes += size
+        self._ready.set()
+
+    def discard_transfers(self, matches):
+        kept = deque(entry for entry in self._bulk if not matches(entry[1]))
+        if len(kept) != len(self._bulk):
+            self._bulk = kept
+            self.bulk_bytes = sum(entry[4] for entry in kept)
+            if self.bulk_bytes <= OUTBOX_LOW_WATER:
+                self._writable.set()
+        for progress in (self.sent, self.cover_sent):
+            for transfer_id in [key for key in progress if matches(key)]:
+                del progress[transfer_id]
+
+    async def get(self) -> tuple:
+        while not self._urgent and not self._bulk:
+            self._ready.clear()
+            await self._ready.wait()
+        if self._urgent:
+            entry = self._urgent.popleft()
+            self.urgent_bytes -= entry[4]
+            return entry[3]
+        kind, transfer_id, offset, parts, size = self._bulk.popleft()
+        self.bulk_bytes -= size
+        if self.bulk_bytes <= OUTBOX_LOW_WATER:
+            self._writable.set()
+        payload_size = len(parts[1]) if len(parts) > 1 else 0
+        if kind == "file_chunk":
+            self.sent[transfer_id] = offset + payload_size
+        elif kind == "file_cover":
+            self.cover_sent[transfer_id] = offset + payload_size
+        return parts
+
+    async def wait_writable(self):
+        await self._writable.wait()
 
-    def __init__(self, writer, member_id: str, name: str, country: str):
+
+class _Member:
+    __slots__ = (
+        "writer", "id", "name", "country", "ping_ms", "features",
+        "binary_frames", "outbox", "peer_address", "peer_port",
+        "clock_samples",
+    )
+
+    def __init__(
+        self,
+        writer,
+        member_id: str,
+        name: str,
+        country: str,
+        features=(),
+    ):
         self.writer = writer
         self.id = member_id
         self.name = name
         self.country = country
         self.ping_ms: int | None = None
+        self.features = frozenset(features)
+        self.binary_frames = BINARY_FRAMES_FEATURE in self.features
+        self.outbox = _MemberOutbox()
+        self.peer_address = ""
+        self.peer_port = 0
+        self.clock_samples = 0
 
     def as_dict(self):
         return {
@@ -8,6 +8,7 @@ import uuid
 
 from network_protocol import (
     DEFAULT_SEGMENT_SIZE, FILE_CHUNK_SIZE, REPLAY_DRAIN_BYTES,
+    SWARM_FEATURE, SWARM_FETCH_TIMEOUT, SWARM_MAX_SERVES, SWARM_MIN_RANGE,
 )
 
 
@@ -27,6 +28,7 @@ class NetworkReplayMixin:
                 for upload in self._server_uploads.values()
                 if upload.get("member_id") == member.id
                 and not upload.get("complete")
+                and not upload.get("variant_of")
             ),
             None,
         )
@@ -115,11 +117,13 @@ class NetworkReplayMixin:
                 "type": "file_begin",
                 "transfer_id": transfer_id,
                 "size": int(upload["size"]),
+                "content_hash": upload.get("content_hash") or "",
                 "track": upload["track"],
                 "segment_size": int(upload.get("segment_size") or 0),
                 "segment_seconds": float(upload.get("segment_seconds") or 0),
                 "resume_offset": requested,
                 "cover_offset": requested_cover,
+                "prefetch": bool(upload.get("prefetch")),
             })
 
             cover = upload.get("cover") or bytearray()
@@ -137,9 +141,11 @@ class NetworkReplayMixin:
                     },
                     bytes(cover[offset : offset + FILE_CHUNK_SIZE]),
                 )
-                await writer.drain()
+                await member.outbox.wait_writable()
 
-            cursor = requested
+            cursor = await self._swarm_catch_up(
+                member, upload, transfer_id, requested
+            )
             segment_size = max(
                 32 * 1024,
                 min(
@@ -152,11 +158,7 @@ class NetworkReplayMixin:
                 available = int(upload.get("received") or 0)
                 while cursor < available:
                     stop = min(available, cursor + segment_size)
-                    view = upload["buffer"].getbuffer()
-                    try:
-                        chunk = bytes(view[cursor:stop])
-                    finally:
-                        view.release()
+                    chunk = upload["buffer"].view(cursor, stop)
                     self._write_packet(
                         writer,
                         {
@@ -173,13 +175,13 @@ class NetworkReplayMixin:
                     cursor = stop
                     pending_drain += len(chunk)
                     if pending_drain >= REPLAY_DRAIN_BYTES:
-                        await writer.drain()
+                        await member.outbox.wait_writable()
                         pending_drain = 0
                         break
                 if cursor < int(upload.get("received") or 0):
                     continue
                 if pending_drain:
-                    await writer.drain()
+                    await member.outbox.wait_writable()
                     pending_drain = 0
                     continue
                 if upload.get("complete"):
@@ -187,12 +189,13 @@ class NetworkReplayMixin:
                         "type": "file_end",
                         "transfer_id": transfer_id,
                     })
-                    await writer.drain()
+                    await member.outbox.wait_writable()
                 upload["catching_up"].discard(writer)
                 break
             if (
                 self._members.get(writer) is member
-                and self._server_uploads.get(transfer_id) is upload
+                and not upload.get("prefetch")
+                and self._member_upload(writer, transfer_id) is upload
             ):
                 self._send_playback_snapshot(writer)
         except asyncio.CancelledError:
@@ -205,6 +208,92 @@ class NetworkReplayMixin:
         finally:
             upload.get("catching_up", set()).discard(writer)
 
+    async def _swarm_catch_up(
+        self, member: _Member, upload: dict, transfer_id: str, cursor: int
+    ) -> int:
+        """Have ``member`` pull what other members already hold.
+
+        Returns the offset the host relay has to continue from.
+        """
+        if SWARM_FEATURE not in member.features:
+            return cursor
+        while True:
+            source = self._swarm_source(member, upload, cursor)
+            if source is None:
+                return cursor
+            source_member, stop = source
+            token = uuid.uuid4().hex
+            future = asyncio.get_running_loop().create_future()
+            self._swarm_fetches[token] = (member, source_member.id, future)
+            try:
+                self._write_packet(source_member.writer, {
+                    "type": "swarm_grant",
+                    "transfer_id": transfer_id,
+                    "token": token,
+                    "start": cursor,
+                    "stop": stop,
+                })
+                self._write_packet(member.writer, {
+                    "type": "swarm_fetch",
+                    "transfer_id": transfer_id,
+                    "token": token,
+                    "address": source_member.peer_address,
+                    "port": source_member.peer_port,
+                    "start": cursor,
+                    "stop": stop,
+                })
+                received = await asyncio.wait_for(
+                    future, timeout=SWARM_FETCH_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                self._swarm_unreachable.add((member.id, source_member.id))
+                continue
+            finally:
+                self._swarm_fetches.pop(token, None)
+            received = min(int(received), int(upload.get("received") or 0))
+            if received <= cursor:
+                self._swarm_unreachable.add((member.id, source_member.id))
+                continue
+            cursor = received
+
+    def _swarm_source(
+        self, member: _Member, upload: dict, cursor: int
+    ) -> tuple[_Member, int] | None:
+        now = time.monotonic()
+        size = int(upload["size"])
+        best = None
+        for source in self._members.values():
+            if (
+                source is member
+                or not source.peer_port
+                or source.id == upload.get("member_id")
+                or (member.id, source.id) in self._swarm_unreachable
+                or sum(
+                    1
+                    for _requester, source_id, _future
+                    in self._swarm_fetches.values()
+                    if source_id == source.id
+                ) >= SWARM_MAX_SERVES
+            ):
+                continue
+            report = upload["reports"].get(source.id)
+            if report is None:
+                continue
+            stop = int(report["received"])
+            if stop < size and now - float(report["updated"]) > 12.0:
+                continue
+            if stop - cursor >= SWARM_MIN_RANGE and (
+                best is None or stop > best[1]
+            ):
+                best = (source, stop)
+        return best
+
+    def _server_swarm_done(self, member: _Member, packet: dict):
+        entry = self._swarm_fetches.get(str(packet.get("token") or ""))
+        if entry is None or entry[0] is not member or entry[2].done():
+            return
+        entry[2].set_result(max(0, int(packet.get("received") or 0)))
+
     def _send_playback_snapshot(self, writer):
         if writer not in self._members:
             return
@@ -7,9 +7,12 @@ import time
 import uuid
 
 from network_protocol import (
-    MAX_PEER_WRITE_BUFFER, PING_INTERVAL, START_DELAY, STATE_INTERVAL,
-    _Member, _detect_country_for_ip, _encode_frame,
-    _normalize_country_code, _normalize_public_ip, _read_frame,
+    CLOCK_BURST_SAMPLES, MAX_PEER_WRITE_BUFFER, PING_INTERVAL,
+    PROTOCOL_FEATURES, QUEUE_PREFETCH_FEATURE, ROSTER_DELTAS_FEATURE,
+    ROSTER_PING_THRESHOLD_MS, SOCKET_BUFFER_SIZE, START_DELAY, STATE_INTERVAL,
+    STATE_KEEPALIVE_INTERVAL, STATE_POSITION_TOLERANCE_MS, SWARM_FEATURE,
+    _Member, _detect_country_for_ip, _encode_frame_header, _frame_parts,
+    _normalize_country_code, _normalize_public_ip, _peer_address, _read_frame,
     _tune_socket,
 )
 from network_replay import NetworkReplayMixin
@@ -54,7 +57,7 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
 
     async def _handle_server_client(self, reader, writer):
         member = None
-        _tune_socket(writer)
+        _tune_socket(writer, SOCKET_BUFFER_SIZE)
         try:
             while True:
                 packet, payload = await _read_frame(reader)
@@ -69,15 +72,21 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                         if old_member.id != member_id:
                             continue
                         self._members.pop(old_writer, None)
-                        replay = self._replay_tasks.pop(old_writer, None)
-                        if replay is not None:
-                            replay.cancel()
+                        for tasks in (
+                            self._replay_tasks, self._member_senders
+                        ):
+                            task = tasks.pop(old_writer, None)
+                            if task is not None:
+                                task.cancel()
                         for upload in self._server_uploads.values():
                             upload.get("catching_up", set()).discard(
                                 old_writer
                             )
+                            upload.get("have", set()).discard(old_writer)
+                            upload.get("diverted", set()).discard(old_writer)
                             if upload.get("writer") is old_writer:
                                 upload["writer"] = None
+                        self._drop_orphaned_variants()
                         try:
                             old_writer.close()
                         except Exception:
@@ -92,14 +101,37 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                         _normalize_public_ip(peer_ip)
                         or _normalize_public_ip(packet.get("public_ip"))
                     )
+                    features = packet.get("features")
                     member = _Member(
                         writer,
                         member_id,
                         str(packet.get("name") or "Unknown"),
                         _normalize_country_code(packet.get("country")),
+                        (
+                            [str(feature) for feature in features]
+                            if isinstance(features, list)
+                            else ()
+                        ),
                     )
+                    if SWARM_FEATURE in member.features:
+                        member.peer_port = max(
+                            0, min(65535, int(packet.get("peer_port") or 0))
+                        )
+                        member.peer_address = _peer_address(peer_ip)
                     self._ready_members.discard(member.id)
                     self._members[writer] = member
+                    self._member_senders[writer] = asyncio.create_task(
+                        self._member_send_loop(member)
+                    )
+                    if isinstance(features, list):
+                        self._write_packet(writer, {
+                            "type": "hello",
+                            "features": list(PROTOCOL_FEATURES),
+                        })
+                    self._write_packet(writer, self._roster_snapshot())
+                    self._write_packet(
+                        writer, {"type": "ping", "ts": time.time()}
+                    )
                     self._broadcast_roster()
                     self._start_country_lookup(member, public_ip)
                     self._send_room_snapshot(
@@ -124,8 +156,18 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                                 "type": "clock_sync",
                                 "offset": clock_offset,
                                 "rtt_ms": member.ping_ms,
+                                "ts": sent_at,
+                                "client_received": packet.get(
+                                    "client_received"
+                                ),
+                                "client_time": client_time,
+                                "server_received": server_now,
                             })
-                        self._broadcast_roster()
+                        if member.clock_samples < CLOCK_BURST_SAMPLES:
+                            member.clock_samples += 1
+                            self._write_packet(
+                                writer, {"type": "ping", "ts": time.time()}
+                            )
                     except Exception:
                         pass
                 elif member is not None:
@@ -138,14 +180,18 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
             pass
         finally:
             removed = self._members.pop(writer, None)
-            replay = self._replay_tasks.pop(writer, None)
-            if replay is not None:
-                replay.cancel()
+            for tasks in (self._replay_tasks, self._member_senders):
+                task = tasks.pop(writer, None)
+                if task is not None:
+                    task.cancel()
             for upload in self._server_uploads.values():
                 upload.get("catching_up", set()).discard(writer)
+                upload.get("have", set()).discard(writer)
+                upload.get("diverted", set()).discard(writer)
                 if upload.get("writer") is writer:
                     upload["writer"] = None
                     upload["event"].set()
+            self._drop_orphaned_variants()
             try:
                 writer.close()
                 await writer.wait_closed()
@@ -185,6 +231,7 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                         len(clean_queue) - 1,
                     ),
                 )
+                self._cancel_prefetch()
                 self._queue_owner = member.id
                 self._room_queue = clean_queue
                 self._begin_prepare(clean_queue[index], index)
@@ -200,9 +247,15 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
             self._server_upload_end(member, packet)
         elif kind == "upload_abort":
             self._server_upload_abort(member, packet)
+        elif kind == "file_have":
+            self._server_file_have(member, packet)
+        elif kind == "swarm_done":
+            self._server_swarm_done(member, packet)
+        elif kind == "roster_sync":
+            self._write_packet(member.writer, self._roster_snapshot())
         elif kind == "buffer_report":
             self._server_buffer_report(member, packet)
-        elif kind == "upload_unavailable":
+        elif kind == "upload_unavailable" and not packet.get("prefetch"):
             for transfer_id, upload in list(self._server_uploads.items()):
                 if (
                     upload.get("member_id") == member.id
@@ -240,6 +293,10 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
             self._server_control(packet)
         elif kind == "repeat":
             self._repeat = bool(packet.get("enabled"))
+            if self._repeat:
+                self._cancel_prefetch()
+            else:
+                self._request_prefetch()
             self._broadcast_packet(
                 {"type": "repeat", "enabled": self._repeat}
             )
@@ -301,19 +358,40 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
         self._started_at = start_at
         self._broadcast_packet(packet)
 
+    def _queue_owner_member(self) -> _Member | None:
+        return next(
+            (
+                member
+                for member in self._members.values()
+                if member.id == self._queue_owner
+            ),
+            None,
+        )
+
     def _advance_queue(self, direction: int):
         if self._room_queue:
             index = (
                 self._room_queue_index + direction
             ) % len(self._room_queue)
-            owner = next(
+            prefetched = next(
                 (
-                    member
-                    for member in self._members.values()
-                    if member.id == self._queue_owner
+                    transfer_id
+                    for transfer_id, upload in self._server_uploads.items()
+                    if upload.get("prefetch")
+                    and not upload.get("variant_of")
+                    and upload["index"] == index
+                    and all(
+                        writer in upload["recipients"]
+                        or member.id == upload["member_id"]
+                        for writer, member in self._members.items()
+                    )
                 ),
                 None,
             )
+            if prefetched is not None:
+                self._commit_prefetched_upload(prefetched)
+                return
+            owner = self._queue_owner_member()
             if owner is None:
                 self._broadcast_packet({
                     "type": "error",
@@ -327,6 +405,59 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                 "index": index,
             })
 
+    def _request_prefetch(self):
+        current = self._server_uploads.get(
+            str((self._room_track or {}).get("stream_id") or "")
+        )
+        if (
+            self._repeat
+            or current is None
+            or not current["complete"]
+            or len(self._room_queue) < 2
+            or self._room_queue_index < 0
+            or any(
+                upload.get("prefetch")
+                for upload in self._server_uploads.values()
+            )
+        ):
+            return
+        owner = self._queue_owner_member()
+        if owner is None or QUEUE_PREFETCH_FEATURE not in owner.features:
+            return
+        index = (self._room_queue_index + 1) % len(self._room_queue)
+        self._write_packet(owner.writer, {
+            "type": "request_upload",
+            "track": self._room_queue[index],
+            "queue": self._room_queue,
+            "index": index,
+            "prefetch": True,
+        })
+
+    def _cancel_prefetch(self):
+        for transfer_id, upload in list(self._server_uploads.items()):
+            if not upload.get("prefetch"):
+                continue
+            if upload.get("writer") is not None:
+                self._write_packet(upload["writer"], {
+                    "type": "cancel_upload",
+                    "transfer_id": transfer_id,
+                })
+            self._drop_server_upload(transfer_id, notify=True)
+
+    def _commit_prefetched_upload(self, transfer_id: str):
+        upload = self._server_uploads[transfer_id]
+        for other_id, other in list(self._server_uploads.items()):
+            if transfer_id not in (other_id, other.get("variant_of")):
+                self._drop_server_upload(other_id)
+        for other in self._server_uploads.values():
+            other["prefetch"] = False
+        upload["prepared"] = True
+        self._queue_owner = upload["member_id"]
+        self._room_queue = upload["queue"]
+        self._begin_prepare(upload["track"], upload["index"])
+        if upload["complete"]:
+            self._request_prefetch()
+
     def _current_position(self):
         if self._playing and self._started_at is not None:
             return max(
@@ -386,53 +517,170 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
         )
 
     def _write_packet(
-        self, writer, packet: dict, payload: bytes = b""
+        self, writer, packet: dict, payload=b""
     ):
+        member = self._members.get(writer)
         try:
-            writer.write(_encode_frame(packet, payload))
+            parts = _frame_parts(
+                packet,
+                payload,
+                member is not None and member.binary_frames,
+            )
+            if member is None:
+                writer.writelines(parts)
+            else:
+                self._queue_frame(member, packet, parts)
         except Exception:
             pass
 
     def _broadcast_packet(
         self,
         packet: dict,
-        payload: bytes = b"",
+        payload=b"",
         exclude=None,
     ):
-        frame = _encode_frame(packet, payload)
+        headers = {}
         if isinstance(exclude, (set, frozenset, list, tuple)):
             excluded = set(exclude)
         else:
             excluded = {exclude} if exclude is not None else set()
-        for writer in list(self._members):
+        transfer_id = str(packet.get("transfer_id") or "")
+        relayed = (
+            packet.get("type") in {"file_chunk", "file_cover"}
+            and transfer_id in self._server_uploads
+        )
+        for writer, member in list(self._members.items()):
             if writer in excluded:
                 continue
+            if (
+                relayed
+                and member.outbox.bulk_bytes > MAX_PEER_WRITE_BUFFER
+            ):
+                self._downgrade_member(member, transfer_id)
+                continue
+            header = headers.get(member.binary_frames)
+            if header is None:
+                header = headers[member.binary_frames] = (
+                    _encode_frame_header(
+                        packet, len(payload), member.binary_frames
+                    )
+                )
             try:
-                transport = getattr(writer, "transport", None)
-                if (
-                    transport is not None
-                    and transport.get_write_buffer_size()
-                    > MAX_PEER_WRITE_BUFFER
-                ):
-                    writer.close()
-                    continue
-                writer.write(frame)
+                self._queue_frame(
+                    member,
+                    packet,
+                    (header, payload) if payload else (header,),
+                )
             except Exception:
                 pass
 
+    def _queue_frame(self, member: _Member, packet: dict, parts: tuple):
+        if member.outbox.urgent_bytes > MAX_PEER_WRITE_BUFFER:
+            member.writer.close()
+            return
+        member.outbox.put(packet, parts, self._server_uploads)
+
+    def _downgrade_member(self, member: _Member, transfer_id: str):
+        upload = self._member_upload(member.writer, transfer_id)
+        outbox = member.outbox
+        outbox.discard_transfers(lambda other: other == transfer_id)
+        if upload["prefetch"]:
+            upload["recipients"].discard(member.writer)
+            self._server_uploads[transfer_id]["recipients"].discard(
+                member.writer
+            )
+            return
+        self._start_transfer_replay(member, upload, {
+            "received": outbox.sent.get(transfer_id, 0),
+            "cover_received": outbox.cover_sent.get(transfer_id, 0),
+            "size": upload["size"],
+        })
+
+    async def _member_send_loop(self, member: _Member):
+        writer = member.writer
+        try:
+            while True:
+                writer.writelines(await member.outbox.get())
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        except Exception:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def _roster_snapshot(self):
+        return {
+            "type": "roster",
+            "version": self._roster_version,
+            "members": list(self._roster_sent.values()),
+        }
+
+    @staticmethod
+    def _roster_entry_changed(sent, current):
+        if sent is None:
+            return True
+        if any(
+            sent.get(key) != current.get(key) for key in ("name", "country")
+        ):
+            return True
+        old_ping, new_ping = sent.get("ping"), current.get("ping")
+        if old_ping is None or new_ping is None:
+            return old_ping != new_ping
+        return abs(new_ping - old_ping) >= ROSTER_PING_THRESHOLD_MS
+
     def _broadcast_roster(self):
-        self._broadcast_packet(
-            {
-                "type": "roster",
-                "members": [
-                    member.as_dict()
-                    for member in self._members.values()
-                ],
-            }
-        )
+        """Send members what changed since the last roster version.
+
+        Ping changes below ``ROSTER_PING_THRESHOLD_MS`` are held back, and
+        members without roster deltas get the whole list instead.
+        """
+        current = {
+            member.id: member.as_dict() for member in self._members.values()
+        }
+        changed = [
+            row
+            for member_id, row in current.items()
+            if self._roster_entry_changed(self._roster_sent.get(member_id), row)
+        ]
+        removed = [
+            member_id for member_id in self._roster_sent
+            if member_id not in current
+        ]
+        if not changed and not removed:
+            return
+        self._roster_version += 1
+        for row in changed:
+            self._roster_sent[row["id"]] = row
+        for member_id in removed:
+            self._roster_sent.pop(member_id, None)
+        legacy = {
+            writer
+            for writer, member in self._members.items()
+            if ROSTER_DELTAS_FEATURE not in member.features
+        }
+        if len(legacy) < len(self._members):
+            self._broadcast_packet(
+                {
+                    "type": "roster_delta",
+                    "base": self._roster_version - 1,
+                    "version": self._roster_version,
+                    "members": changed,
+                    "removed": removed,
+                },
+                exclude=legacy,
+            )
+        if legacy:
+            self._broadcast_packet(
+                self._roster_snapshot(),
+                exclude=set(self._members) - legacy,
+            )
 
     async def _server_tick_loop(self, generation):
         last_ping = 0.0
+        last_state = None
+        last_state_at = 0.0
         try:
             while (
                 generation == self._generation
@@ -445,15 +693,31 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
                         {"type": "ping", "ts": now}
                     )
                     last_ping = now
-                self._broadcast_packet(
-                    {
-                        "type": "state",
-                        "playing": self._playing,
-                        "position": self._current_position(),
-                        "timestamp": now,
-                        "pending": self._pending_request is not None,
-                    }
-                )
+                self._broadcast_roster()
+                state = {
+                    "type": "state",
+                    "playing": self._playing,
+                    "position": self._current_position(),
+                    "timestamp": now,
+                    "pending": self._pending_request is not None,
+                }
+                if last_state is not None:
+                    expected = last_state["position"] + (
+                        round((now - last_state["timestamp"]) * 1000)
+                        if last_state["playing"]
+                        else 0
+                    )
+                    if (
+                        state["playing"] == last_state["playing"]
+                        and state["pending"] == last_state["pending"]
+                        and abs(state["position"] - expected)
+                        <= STATE_POSITION_TOLERANCE_MS
+                        and now - last_state_at < STATE_KEEPALIVE_INTERVAL
+                    ):
+                        continue
+                self._broadcast_packet(state)
+                last_state = state
+                last_state_at = now
         except asyncio.CancelledError:
             pass
 
@@ -477,9 +741,18 @@ class NetworkServerMixin(NetworkServerUploadMixin, NetworkReplayMixin):
         for task in list(self._replay_tasks.values()):
             task.cancel()
         self._replay_tasks.clear()
+        for task in list(self._member_senders.values()):
+            task.cancel()
+        self._member_senders.clear()
+        for _member, _source_id, future in self._swarm_fetches.values():
+            future.cancel()
+        self._swarm_fetches.clear()
+        self._swarm_unreachable.clear()
+        self._roster_sent.clear()
         for upload in self._server_uploads.values():
             upload["complete"] = True
             upload["event"].set()
+            upload["buffer"].close()
         self._pending_request = None
         self._ready_members.clear()
         self._server_uploads.clear()
\ No newline at end of file
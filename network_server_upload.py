@@ -3,18 +3,21 @@
 from __future__ import annotations
 
 import asyncio
-import io
 import time
 import uuid
 
 from network_protocol import (
     MAX_COVER_SIZE, MAX_TRACK_SIZE, STREAM_BUFFER_AHEAD_SECONDS,
-    STREAM_MAX_BUFFER_SECONDS, STREAM_MIN_BUFFER_SECONDS,
+    STREAM_MAX_BUFFER_SECONDS, STREAM_MIN_BUFFER_SECONDS, _TrackBuffer,
+    _transcode_bitrate,
 )
 
 
 class NetworkServerUploadMixin:
     def _server_upload_begin(self, member: _Member, packet: dict):
+        if packet.get("variant_of"):
+            self._server_variant_begin(member, packet)
+            return
         transfer_id = str(packet.get("transfer_id") or "")
         size = int(packet.get("size") or 0)
         track, queue = packet.get("track"), packet.get("queue")
@@ -41,8 +44,13 @@ class NetworkServerUploadMixin:
         track = dict(track)
         track["stream_id"] = transfer_id
         clean_queue[index] = dict(track)
+        prefetch = bool(packet.get("prefetch"))
+        current_id = str((self._room_track or {}).get("stream_id") or "")
         for old_id, old_upload in list(self._server_uploads.items()):
-            if old_id == transfer_id:
+            if old_id == transfer_id or (
+                prefetch
+                and current_id in (old_id, old_upload.get("variant_of"))
+            ):
                 continue
             old_writer = old_upload.get("writer")
             if old_writer is not None:
@@ -60,13 +68,22 @@ class NetworkServerUploadMixin:
             "queue": clean_queue,
             "index": index,
             "prepared": False,
+            "prefetch": prefetch,
+            "recipients": {
+                writer
+                for writer in self._members
+                if writer is not member.writer
+            },
             "cover_received": 0,
             "cover_total": 0,
             "cover": bytearray(),
-            "buffer": io.BytesIO(),
+            "buffer": _TrackBuffer(size),
             "complete": False,
             "event": asyncio.Event(),
             "catching_up": set(),
+            "have": set(),
+            "diverted": set(),
+            "content_hash": str(packet.get("content_hash") or ""),
             "reports": {},
             "resume_token": uuid.uuid4().hex,
             "segment_size": int(packet.get("segment_size") or 0),
@@ -77,13 +94,141 @@ class NetworkServerUploadMixin:
                 "type": "file_begin",
                 "transfer_id": transfer_id,
                 "size": size,
+                "content_hash": str(packet.get("content_hash") or ""),
                 "track": track,
                 "segment_size": int(packet.get("segment_size") or 0),
                 "segment_seconds": float(packet.get("segment_seconds") or 0),
+                "prefetch": prefetch,
             },
             exclude=member.writer,
         )
 
+    def _server_variant_begin(self, member: _Member, packet: dict):
+        """Register a lower-bitrate copy of one of ``member``'s uploads.
+
+        Only members whose reported throughput cannot keep up with the
+        original are moved onto it; everyone else keeps the original.
+        """
+        transfer_id = str(packet.get("transfer_id") or "")
+        source_id = str(packet.get("variant_of") or "")
+        original = self._server_uploads.get(source_id)
+        size = int(packet.get("size") or 0)
+        track = packet.get("track")
+        if not transfer_id:
+            return
+        if (
+            transfer_id in self._server_uploads
+            or original is None
+            or original.get("variant_of")
+            or original.get("member_id") != member.id
+            or size <= 0
+            or size >= int(original["size"])
+            or not isinstance(track, dict)
+        ):
+            self._write_packet(member.writer, {
+                "type": "cancel_upload",
+                "transfer_id": transfer_id,
+            })
+            return
+        slow = [
+            other
+            for other in self._members.values()
+            if self._needs_variant(original, other, size)
+        ]
+        if not slow:
+            self._write_packet(member.writer, {
+                "type": "cancel_upload",
+                "transfer_id": transfer_id,
+            })
+            return
+        track = dict(track)
+        track["stream_id"] = source_id
+        variant = self._server_uploads[transfer_id] = {
+            "writer": member.writer,
+            "member_id": member.id,
+            "size": size,
+            "received": 0,
+            "track": track,
+            "queue": original["queue"],
+            "index": original["index"],
+            "prepared": True,
+            "prefetch": original["prefetch"],
+            "variant_of": source_id,
+            "recipients": set(),
+            "cover_received": original["cover_received"],
+            "cover_total": original["cover_total"],
+            "cover": bytearray(original["cover"]),
+            "buffer": _TrackBuffer(size),
+            "complete": False,
+            "event": asyncio.Event(),
+            "catching_up": set(),
+            "have": set(),
+            "content_hash": original["content_hash"],
+            "reports": {},
+            "resume_token": "",
+            "segment_size": int(packet.get("segment_size") or 0),
+            "segment_seconds": float(packet.get("segment_seconds") or 0),
+        }
+        for other in slow:
+            other.outbox.discard_transfers(
+                lambda other_id: other_id == source_id
+            )
+            original["diverted"].add(other.writer)
+            original["reports"].pop(other.id, None)
+            variant["recipients"].add(other.writer)
+            self._start_transfer_replay(other, variant, {})
+
+    def _needs_variant(self, original: dict, member: _Member, size: int):
+        writer = member.writer
+        report = original["reports"].get(member.id)
+        if (
+            report is None
+            or member.id == original["member_id"]
+            or writer in original["have"]
+            or writer in original["catching_up"]
+            or writer in original["diverted"]
+        ):
+            return False
+        source_id = str(original["track"].get("stream_id") or "")
+        if original["prefetch"]:
+            if writer not in original["recipients"]:
+                return False
+        elif (
+            not self._pending_request
+            or str((self._room_track or {}).get("stream_id") or "")
+            != source_id
+            or member.id in self._ready_members
+        ):
+            return False
+        return (
+            _transcode_bitrate(
+                int(original["size"]),
+                original["track"].get("duration"),
+                float(report["throughput"]),
+            )
+            is not None
+            and int(original["size"]) - int(report["received"]) > size
+        )
+
+    def _member_upload(self, writer, transfer_id: str) -> dict | None:
+        """Return the copy of ``transfer_id`` that ``writer`` is receiving."""
+        for upload in self._server_uploads.values():
+            if (
+                upload.get("variant_of") == transfer_id
+                and writer in upload["recipients"]
+            ):
+                return upload
+        return self._server_uploads.get(transfer_id)
+
+    def _drop_orphaned_variants(self):
+        for transfer_id, upload in list(self._server_uploads.items()):
+            if (
+                upload.get("variant_of")
+                and upload.get("writer") is None
+                and not upload["complete"]
+            ):
+                self._drop_server_upload(transfer_id)
+
     def _server_upload_resume(self, member: _Member, packet: dict):
         transfer_id = str(packet.get("transfer_id") or "")
         upload = self._server_uploads.get(transfer_id)
@@ -124,12 +269,12 @@ class NetworkServerUploadMixin:
         self._broadcast_packet(
             {
                 "type": "file_cover",
-                "transfer_id": transfer_id,
+                "transfer_id": upload["track"]["stream_id"],
                 "offset": offset,
                 "total": total,
             },
             payload,
-            exclude={member.writer, *upload["catching_up"]},
+            exclude=self._upload_excluded(upload),
         )
 
     def _server_upload_chunk(
@@ -150,22 +295,21 @@ class NetworkServerUploadMixin:
         if upload["received"] + len(payload) > upload["size"]:
             self._drop_server_upload(transfer_id, notify=True)
             return
-        upload["buffer"].seek(upload["received"])
-        upload["buffer"].write(payload)
+        upload["buffer"].write(offset, payload)
         upload["received"] += len(payload)
         upload["event"].set()
         self._broadcast_packet(
             {
                 "type": "file_chunk",
-                "transfer_id": transfer_id,
+                "transfer_id": upload["track"]["stream_id"],
                 "offset": offset,
                 "segment_index": int(packet.get("segment_index") or 0),
                 "segment_seconds": upload["segment_seconds"],
             },
             payload,
-            exclude={member.writer, *upload["catching_up"]},
+            exclude=self._upload_excluded(upload),
         )
-        if not upload["prepared"]:
+        if not upload["prepared"] and not upload["prefetch"]:
             upload["prepared"] = True
             self._queue_owner = upload["member_id"]
             self._room_queue = upload["queue"]
@@ -189,13 +333,50 @@ class NetworkServerUploadMixin:
         upload["complete"] = True
         upload["event"].set()
         self._broadcast_packet(
-            {"type": "file_end", "transfer_id": transfer_id},
-            exclude={member.writer, *upload["catching_up"]},
+            {"type": "file_end", "transfer_id": upload["track"]["stream_id"]},
+            exclude=self._upload_excluded(upload),
         )
+        if upload["prefetch"] or upload.get("variant_of"):
+            return
         if not upload["prepared"]:
             self._queue_owner = upload["member_id"]
             self._room_queue = upload["queue"]
             self._begin_prepare(upload["track"], upload["index"])
+        self._request_prefetch()
+
+    def _upload_excluded(self, upload: dict) -> set:
+        excluded = {
+            upload["writer"],
+            *upload["catching_up"],
+            *upload["have"],
+            *upload.get("diverted", ()),
+        }
+        if upload["prefetch"] or upload.get("variant_of"):
+            excluded.update(
+                writer
+                for writer in self._members
+                if writer not in upload["recipients"]
+            )
+        return excluded
+
+    def _server_file_have(self, member: _Member, packet: dict):
+        transfer_id = str(packet.get("transfer_id") or "")
+        upload = self._member_upload(member.writer, transfer_id)
+        if (
+            upload is None
+            or not upload["content_hash"]
+            or str(packet.get("content_hash") or "") != upload["content_hash"]
+        ):
+            return
+        writer = member.writer
+        upload["have"].add(writer)
+        member.outbox.discard_transfers(lambda other: other == transfer_id)
+        if writer in upload["catching_up"]:
+            upload["catching_up"].discard(writer)
+            task = self._replay_tasks.pop(writer, None)
+            if task is not None:
+                task.cancel()
+            self._send_playback_snapshot(writer)
 
     def _server_upload_abort(self, member: _Member, packet: dict):
         transfer_id = str(packet.get("transfer_id") or "")
@@ -212,7 +393,7 @@ class NetworkServerUploadMixin:
 
     def _server_buffer_report(self, member: _Member, packet: dict):
         transfer_id = str(packet.get("transfer_id") or "")
-        upload = self._server_uploads.get(transfer_id)
+        upload = self._member_upload(member.writer, transfer_id)
         received = max(0, int(packet.get("received") or 0))
         if upload is None or received > int(upload.get("received") or 0):
             return
@@ -232,6 +413,7 @@ class NetworkServerUploadMixin:
         upload["reports"][member.id] = {
             "received": received,
             "target": target,
+            "throughput": max(0.0, float(packet.get("throughput_bps") or 0.0)),
             "updated": now,
         }
         active_targets = [
@@ -244,12 +426,18 @@ class NetworkServerUploadMixin:
             if active_targets
             else STREAM_BUFFER_AHEAD_SECONDS
         )
+        throughputs = [
+            float(report["throughput"])
+            for report in upload["reports"].values()
+            if now - float(report["updated"]) <= 12.0 and report["throughput"] > 0
+        ]
         owner_writer = upload.get("writer")
         if owner_writer is not None:
             self._write_packet(owner_writer, {
                 "type": "stream_target",
                 "transfer_id": transfer_id,
                 "target_seconds": room_target,
+                "throughput_bps": min(throughputs) if throughputs else 0.0,
             })
 
     def _drop_server_upload(self, transfer_id: str, notify=False):
@@ -262,6 +450,21 @@ class NetworkServerUploadMixin:
             task = self._replay_tasks.pop(writer, None)
             if task is not None:
                 task.cancel()
+        upload["buffer"].close()
+        source_id = upload.get("variant_of")
+        if source_id:
+            original = self._server_uploads.get(source_id)
+            if original is None:
+                return
+            for writer in upload["recipients"]:
+                original["diverted"].discard(writer)
+                member = self._members.get(writer)
+                if member is not None:
+                    self._start_transfer_replay(member, original, {})
+            return
+        for variant_id, variant in list(self._server_uploads.items()):
+            if variant.get("variant_of") == transfer_id:
+                self._drop_server_upload(variant_id)
         if notify:
             self._broadcast_packet({
                 "type": "file_abort",
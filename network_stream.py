@@ -3,25 +3,60 @@
 from __future__ import annotations
 
 import asyncio
-import io
 import json
 import mimetypes
-import re
 import time
-import urllib.parse
 from pathlib import Path
 
 from config import AUDIO_EXTENSIONS, PLAYLISTS_PATH
+from library_catalog import library_catalog
+from media_server import MediaSource, media_server
 from threads import cache_lyrics
 from network_protocol import (
     HTTP_STREAM_CHUNK_SIZE, MAX_COVER_SIZE, MAX_TRACK_SIZE,
     STREAM_BUFFER_AHEAD_SECONDS, STREAM_MAX_BUFFER_SECONDS,
     STREAM_MIN_BUFFER_SECONDS, STREAM_REPORT_INTERVAL,
-    TARGET_SEGMENT_SECONDS, _PLAYLIST_CACHE_LOCK, _cover_suffix,
-    _duration_seconds, _safe_name,
+    TARGET_SEGMENT_SECONDS, _PLAYLIST_CACHE_LOCK, _TrackBuffer,
+    _cover_suffix, _duration_seconds, _safe_name,
 )
 
 
+class _RoomStreamSource(MediaSource):
+    def __init__(self, state: dict):
+        super().__init__()
+        self._state = state
+        self.content_type = (
+            mimetypes.guess_type(str(state["final"]))[0]
+            or "application/octet-stream"
+        )
+
+    @property
+    def size(self) -> int:
+        return int(self._state["size"])
+
+    @property
+    def available(self) -> int:
+        return int(self._state["received"])
+
+    @property
+    def finished(self) -> bool:
+        return bool(self._state.get("complete"))
+
+    @property
+    def failed(self) -> bool:
+        return bool(self._state.get("error"))
+
+    def view(self, start: int, stop: int):
+        return self._state["buffer"].view(start, stop)
+
+    async def wait(self, offset: int):
+        event = self._state["event"]
+        event.clear()
+        if offset < self.available or self.finished:
+            return
+        await event.wait()
+
+
 class NetworkStreamMixin:
     def _receive_file_begin(self, packet: dict):
         transfer_id = str(packet.get("transfer_id") or "")
@@ -37,9 +72,39 @@ class NetworkStreamMixin:
             or resume_offset > size
         ):
             return
+        prefetch = bool(packet.get("prefetch"))
         for stale_id in list(self._incoming_files):
-            if stale_id != transfer_id:
+            if (
+                stale_id != transfer_id
+                and (stale_id in self._prefetch_ids) == prefetch
+            ):
                 self._abort_incoming_file(stale_id)
+        if prefetch:
+            for stale_id in self._prefetch_ids - {transfer_id}:
+                self._local_copies.pop(stale_id, None)
+            self._prefetch_ids = {transfer_id}
+        else:
+            self._prefetch_ids.discard(transfer_id)
+        content_hash = str(packet.get("content_hash") or "")
+        local_copy = self._local_content_copy(
+            content_hash, int(track.get("source_size") or size)
+        )
+        if local_copy is not None:
+            self._abort_incoming_file(transfer_id)
+            if prefetch:
+                self._prefetch_ids.add(transfer_id)
+            self._local_copies[transfer_id] = local_copy
+            self._send_packet({
+                "type": "file_have",
+                "transfer_id": transfer_id,
+                "content_hash": content_hash,
+            })
+            if not prefetch:
+                self.stream_buffer_progress_changed.emit(size, size)
+                self.connection_state_changed.emit(
+                    "Track is already on this device; playing the local copy..."
+                )
+            return
         existing = self._incoming_files.get(transfer_id)
         if existing is not None:
             can_resume = (
@@ -53,14 +118,20 @@ class NetworkStreamMixin:
                     packet.get("segment_seconds") or 0
                 )
                 existing["event"].set()
-                self.stream_buffer_progress_changed.emit(
-                    resume_offset, size
-                )
-                self.connection_state_changed.emit(
-                    f"Resuming current track from {resume_offset * 100 // size}%..."
-                )
+                if not prefetch:
+                    self.stream_buffer_progress_changed.emit(
+                        resume_offset, size
+                    )
+                    self.connection_state_changed.emit(
+                        f"Resuming current track from {resume_offset * 100 // size}%..."
+                    )
                 return
+            # A re-begin with another size (the host switching this member
+            # to a different copy) restarts the transfer but keeps it a
+            # prefetch.
             self._abort_incoming_file(transfer_id)
+            if prefetch:
+                self._prefetch_ids.add(transfer_id)
         playlist = _safe_name(
             track.get("playlist"), "Listen Together"
         )
@@ -80,7 +151,7 @@ class NetworkStreamMixin:
             "received": 0,
             "size": size,
             "track": track,
-            "buffer": io.BytesIO(),
+            "buffer": _TrackBuffer(size),
             "cover": bytearray(),
             "cover_total": 0,
             "segment_seconds": float(packet.get("segment_seconds") or 0),
@@ -94,10 +165,26 @@ class NetworkStreamMixin:
         }
         self._incoming_files[transfer_id] = state
         self._streams[transfer_id] = state
-        self.stream_buffer_progress_changed.emit(0, size)
-        self.connection_state_changed.emit(
-            "Receiving metadata and the first audio segment..."
-        )
+        if not prefetch:
+            self.stream_buffer_progress_changed.emit(0, size)
+            self.connection_state_changed.emit(
+                "Receiving metadata and the first audio segment..."
+            )
+
+    @staticmethod
+    def _local_content_copy(content_hash: str, size: int) -> Path | None:
+        if not content_hash:
+            return None
+        for path in library_catalog().find_content_hash(content_hash):
+            try:
+                if (
+                    path.suffix.lower() in AUDIO_EXTENSIONS
+                    and path.stat().st_size == size
+                ):
+                    return path
+            except OSError:
+                continue
+        return None
 
     def _receive_file_cover(self, packet: dict, payload: bytes):
         transfer_id = str(packet.get("transfer_id") or "")
@@ -143,11 +230,14 @@ class NetworkStreamMixin:
                 raise RuntimeError(
                     "Received track is larger than announced"
                 )
-            state["buffer"].write(payload)
+            state["buffer"].write(state["received"], payload)
             state["received"] += len(payload)
             state["event"].set()
             self._report_stream_buffer(transfer_id, state)
-            if state["received"] == len(payload):
+            if (
+                state["received"] == len(payload)
+                and transfer_id not in self._prefetch_ids
+            ):
                 seconds = state["segment_seconds"]
                 suffix = f" ({seconds:.0f}s ready)" if seconds else ""
                 self.connection_state_changed.emit(
@@ -160,7 +250,8 @@ class NetworkStreamMixin:
     def _report_stream_buffer(self, transfer_id: str, state: dict):
         received = int(state.get("received") or 0)
         size = int(state.get("size") or 0)
-        self.stream_buffer_progress_changed.emit(received, size)
+        if transfer_id not in self._prefetch_ids:
+            self.stream_buffer_progress_changed.emit(received, size)
         now = time.monotonic()
         elapsed = now - float(state.get("report_time") or now)
         previous = int(state.get("report_received") or 0)
@@ -174,6 +265,10 @@ class NetworkStreamMixin:
         old_speed = float(state.get("throughput_bps") or 0.0)
         throughput = instant if old_speed <= 0 else old_speed * 0.55 + instant * 0.45
         state["throughput_bps"] = throughput
+        if previous > 0:
+            state["peak_throughput_bps"] = max(
+                float(state.get("peak_throughput_bps") or 0.0), instant
+            )
         state["report_time"] = now
         state["report_received"] = received
 
@@ -218,6 +313,7 @@ class NetworkStreamMixin:
             "buffered_seconds": buffered_seconds,
             "position_seconds": position_seconds,
             "throughput_ratio": ratio,
+            "throughput_bps": float(state.get("peak_throughput_bps") or 0.0),
             "target_seconds": target,
         })
 
@@ -231,15 +327,16 @@ class NetworkStreamMixin:
                 raise RuntimeError("Track transfer is incomplete")
             state["complete"] = True
             state["event"].set()
-            self.stream_buffer_progress_changed.emit(
-                state["size"], state["size"]
-            )
             task = asyncio.create_task(self._persist_received_stream(state))
             self._persist_tasks.add(task)
             task.add_done_callback(self._persist_tasks.discard)
-            self.connection_state_changed.emit(
-                "Track is in RAM; saving it to disk in the background..."
-            )
+            if transfer_id not in self._prefetch_ids:
+                self.stream_buffer_progress_changed.emit(
+                    state["size"], state["size"]
+                )
+                self.connection_state_changed.emit(
+                    "Track is in RAM; saving it to disk in the background..."
+                )
         except Exception as exc:
             state["complete"] = True
             state["error"] = str(exc)
@@ -265,7 +362,11 @@ class NetworkStreamMixin:
             active_id = str(
                 (self._room_track or {}).get("stream_id") or ""
             )
-            if stream_id and stream_id != active_id:
+            if (
+                stream_id
+                and stream_id != active_id
+                and stream_id not in self._prefetch_ids
+            ):
                 self._streams.pop(stream_id, None)
 
     @staticmethod
@@ -273,15 +374,12 @@ class NetworkStreamMixin:
         final_path = Path(state["final"])
         temporary = Path(state["temporary"])
         final_path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = state["buffer"]
         with temporary.open("wb", buffering=HTTP_STREAM_CHUNK_SIZE) as output:
-            view = state["buffer"].getbuffer()
-            try:
-                for offset in range(0, len(view), HTTP_STREAM_CHUNK_SIZE):
-                    output.write(
-                        view[offset : offset + HTTP_STREAM_CHUNK_SIZE]
-                    )
-            finally:
-                view.release()
+            for offset in range(0, buffer.size, HTTP_STREAM_CHUNK_SIZE):
+                output.write(
+                    buffer.view(offset, offset + HTTP_STREAM_CHUNK_SIZE)
+                )
         temporary.replace(final_path)
 
         track = dict(state.get("track") or {})
@@ -338,137 +436,22 @@ class NetworkStreamMixin:
         state["error"] = "Transfer aborted"
         state["event"].set()
         state["temporary"].unlink(missing_ok=True)
+        state["buffer"].close()
         self._streams.pop(transfer_id, None)
+        self._prefetch_ids.discard(transfer_id)
         if transfer_id == self._committed_stream_id:
             self.stream_buffer_progress_changed.emit(0, 0)
 
     async def _ensure_stream_server(self):
-        if self._stream_server is not None:
+        if self._stream_port:
             return
-        self._stream_server = await asyncio.start_server(
-            self._handle_stream_http,
-            "127.0.0.1",
-            0,
-            limit=64 * 1024,
-        )
-        sockets = self._stream_server.sockets or []
-        if not sockets:
-            raise RuntimeError("Could not start the local audio stream")
-        self._stream_port = int(sockets[0].getsockname()[1])
-
-    async def _handle_stream_http(self, reader, writer):
-        try:
-            raw = await asyncio.wait_for(
-                reader.readuntil(b"\r\n\r\n"), timeout=10
-            )
-            if len(raw) > 64 * 1024:
-                raise ValueError("HTTP header is too large")
-            lines = raw.decode("iso-8859-1").split("\r\n")
-            request = lines[0].split()
-            if len(request) != 3 or request[0] not in {"GET", "HEAD"}:
-                await self._write_http_error(writer, 405, "Method Not Allowed")
-                return
-            path = urllib.parse.urlsplit(request[1]).path
-            parts = path.split("/")
-            transfer_id = parts[2] if len(parts) >= 3 else ""
-            state = self._streams.get(transfer_id)
-            if not state:
-                await self._write_http_error(writer, 404, "Not Found")
-                return
-
-            headers = {}
-            for line in lines[1:]:
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    headers[key.strip().casefold()] = value.strip()
-            total = int(state["size"])
-            start, end = 0, total - 1
-            partial = False
-            match = re.match(
-                r"bytes=(\d*)-(\d*)", headers.get("range", ""), re.I
-            )
-            if match:
-                partial = True
-                if not match.group(1) and match.group(2):
-                    suffix_length = int(match.group(2))
-                    start = max(0, total - suffix_length)
-                    end = total - 1
-                elif match.group(1):
-                    start = int(match.group(1))
-                if match.group(1) and match.group(2):
-                    end = min(end, int(match.group(2)))
-            if start < 0 or start >= total or end < start:
-                await self._write_http_error(
-                    writer, 416, "Range Not Satisfiable"
-                )
-                return
-
-            mime = mimetypes.guess_type(str(state["final"]))[0]
-            mime = mime or "application/octet-stream"
-            status = "206 Partial Content" if partial else "200 OK"
-            response_headers = [
-                f"HTTP/1.1 {status}",
-                f"Content-Type: {mime}",
-                f"Content-Length: {end - start + 1}",
-                "Accept-Ranges: bytes",
-                "Cache-Control: no-store",
-                "Connection: close",
-            ]
-            if partial:
-                response_headers.append(
-                    f"Content-Range: bytes {start}-{end}/{total}"
-                )
-            writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode())
-            await writer.drain()
-            if request[0] == "HEAD":
-                return
+        server = media_server()
+        server.add_resolver("stream", self._room_stream_source)
+        self._stream_port = server.start()
 
-            offset = start
-            while offset <= end:
-                available = int(state["received"])
-                if offset < available:
-                    stop = min(
-                        available, end + 1, offset + HTTP_STREAM_CHUNK_SIZE
-                    )
-                    view = state["buffer"].getbuffer()
-                    try:
-                        writer.write(bytes(view[offset:stop]))
-                    finally:
-                        view.release()
-                    await writer.drain()
-                    offset = stop
-                    continue
-                if state.get("complete"):
-                    break
-                event = state["event"]
-                event.clear()
-                if offset < int(state["received"]) or state.get("complete"):
-                    continue
-                await event.wait()
-        except (asyncio.IncompleteReadError, ConnectionError, BrokenPipeError):
-            pass
-        except Exception:
-            try:
-                await self._write_http_error(writer, 500, "Stream Error")
-            except Exception:
-                pass
-        finally:
-            writer.close()
-            try:
-                await writer.wait_closed()
-            except Exception:
-                pass
+    def _room_stream_source(self, transfer_id: str):
+        state = self._streams.get(transfer_id)
+        return _RoomStreamSource(state) if state else None
 
-    @staticmethod
-    async def _write_http_error(writer, status: int, reason: str):
-        body = f"{status} {reason}\n".encode("utf-8")
-        writer.write(
-            (
-                f"HTTP/1.1 {status} {reason}\r\n"
-                "Content-Type: text/plain; charset=utf-8\r\n"
-                f"Content-Length: {len(body)}\r\n"
-                "Connection: close\r\n\r\n"
-            ).encode("ascii")
-            + body
-        )
-        await writer.drain()
+    def stream_connection_stats(self) -> dict:
+        return media_server().stats()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from config import ROOM_PEER_PORT
+from network_protocol import (
+    FILE_CHUNK_SIZE, SOCKET_BUFFER_SIZE, SWARM_CONNECT_TIMEOUT,
+    SWARM_GRANT_TTL, SWARM_IDLE_TIMEOUT, _frame_parts, _read_frame,
+    _tune_socket,
+)
+
+
+class NetworkSwarmMixin:
+    """Serve and fetch room track ranges directly between members.
+
+    The host decides who fetches what from whom: it grants a serving member
+    a one-off token for a byte range it already holds and tells the member
+    that is catching up where to collect it. Ranges are read straight out of
+    the received track buffer, and whatever a fetch fails to deliver is
+    relayed by the host as before.
+    """
+
+    async def _ensure_peer_server(self):
+        if self._peer_server is not None or ROOM_PEER_PORT < 0:
+            return
+        try:
+            self._peer_server = await asyncio.start_server(
+                self._handle_peer_client,
+                None,
+                ROOM_PEER_PORT,
+                limit=64 * 1024,
+            )
+        except OSError as exc:
+            print(f"[Room] Peer server unavailable: {exc}")
+            return
+        sockets = self._peer_server.sockets or []
+        self._peer_port = int(sockets[0].getsockname()[1]) if sockets else 0
+
+    async def _stop_peer_server(self):
+        for task in list(self._swarm_tasks.values()):
+            task.cancel()
+        self._swarm_tasks.clear()
+        self._swarm_grants.clear()
+        if self._peer_server is not None:
+            self._peer_server.close()
+            try:
+                await self._peer_server.wait_closed()
+            except Exception:
+                pass
+            self._peer_server = None
+            self._peer_port = 0
+
+    def _swarm_grant(self, packet: dict):
+        token = str(packet.get("token") or "")
+        transfer_id = str(packet.get("transfer_id") or "")
+        if not token or transfer_id not in self._streams:
+            return
+        now = time.monotonic()
+        for stale in [
+            key for key, grant in self._swarm_grants.items()
+            if grant[3] <= now
+        ]:
+            self._swarm_grants.pop(stale, None)
+        self._swarm_grants[token] = (
+            transfer_id,
+            max(0, int(packet.get("start") or 0)),
+            max(0, int(packet.get("stop") or 0)),
+            now + SWARM_GRANT_TTL,
+        )
+
+    async def _handle_peer_client(self, reader, writer):
+        _tune_socket(writer)
+        try:
+            packet, _payload = await asyncio.wait_for(
+                _read_frame(reader), timeout=SWARM_CONNECT_TIMEOUT
+            )
+            grant = self._swarm_grants.pop(str(packet.get("token") or ""), None)
+            if (
+                packet.get("type") != "swarm_request"
+                or grant is None
+                or grant[3] <= time.monotonic()
+                or str(packet.get("transfer_id") or "") != grant[0]
+            ):
+                return
+            transfer_id, start, stop, _expires = grant
+            state = self._streams.get(transfer_id)
+            if state is None:
+                return
+            buffer = state["buffer"]
+            segment_seconds = float(state.get("segment_seconds") or 0)
+            cursor = start
+            while cursor < min(stop, int(state["received"])):
+                end = min(stop, int(state["received"]), cursor + FILE_CHUNK_SIZE)
+                writer.writelines(
+                    _frame_parts(
+                        {
+                            "type": "file_chunk",
+                            "transfer_id": transfer_id,
+                            "offset": cursor,
+                            "segment_seconds": segment_seconds,
+                        },
+                        buffer.view(cursor, end),
+                        True,
+                    )
+                )
+                await writer.drain()
+                cursor = end
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception as exc:
+            print(f"[Room] Peer transfer failed: {exc}")
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    def _swarm_fetch(self, packet: dict):
+        token = str(packet.get("token") or "")
+        if not token:
+            return
+        previous = self._swarm_tasks.pop(token, None)
+        if previous is not None:
+            previous.cancel()
+        task = asyncio.create_task(self._fetch_swarm_range(packet))
+        self._swarm_tasks[token] = task
+
+        def clear(done):
+            if self._swarm_tasks.get(token) is done:
+                self._swarm_tasks.pop(token, None)
+
+        task.add_done_callback(clear)
+
+    async def _fetch_swarm_range(self, packet: dict):
+        transfer_id = str(packet.get("transfer_id") or "")
+        token = str(packet.get("token") or "")
+        start = max(0, int(packet.get("start") or 0))
+        stop = max(0, int(packet.get("stop") or 0))
+        address = str(packet.get("address") or "") or (
+            self._connection_target or ("127.0.0.1", 0)
+        )[0]
+        writer = None
+        try:
+            state = self._incoming_files.get(transfer_id)
+            if state is None or int(state["received"]) != start:
+                return
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    address,
+                    int(packet.get("port") or 0),
+                    limit=4 * SOCKET_BUFFER_SIZE,
+                ),
+                timeout=SWARM_CONNECT_TIMEOUT,
+            )
+            _tune_socket(writer)
+            writer.writelines(_frame_parts({
+                "type": "swarm_request",
+                "transfer_id": transfer_id,
+                "token": token,
+            }))
+            await writer.drain()
+            while self._incoming_files.get(transfer_id) is state:
+                if int(state["received"]) >= stop:
+                    break
+                chunk, payload = await asyncio.wait_for(
+                    _read_frame(reader), timeout=SWARM_IDLE_TIMEOUT
+                )
+                if (
+                    chunk.get("type") != "file_chunk"
+                    or str(chunk.get("transfer_id") or "") != transfer_id
+                ):
+                    break
+                self._receive_file_chunk(chunk, payload)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except (OSError, ValueError) as exc:
+            print(f"[Room] Peer fetch from {address} failed: {exc}")
+        finally:
+            if writer is not None:
+                writer.close()
+            state = (
+                self._incoming_files.get(transfer_id)
+                or self._streams.get(transfer_id)
+                or {}
+            )
+            if self.is_connected:
+                self._send_packet({
+                    "type": "swarm_done",
+                    "transfer_id": transfer_id,
+                    "token": token,
+                    "received": int(state.get("received") or 0),
+                })
@@ -3,16 +3,19 @@ from __future__ import annotations
 import asyncio
 import socket
 import time
-import urllib.parse
-import urllib.request
 import uuid
+from pathlib import Path
 
 from PySide6.QtCore import QObject, QTimer, Signal
 from PySide6.QtMultimedia import QMediaPlayer
 
+from cover_thumbnails import find_cover_path
+from media_server import media_server
 from network_protocol import (
-    DRIFT_LIMIT_MS, SOCKET_BUFFER_SIZE, _Member, _detect_public_location,
-    _encode_frame, _normalize_room_host,
+    DRIFT_LIMIT_MS, SOCKET_BUFFER_SIZE, SYNC_CHECK_INTERVAL_MS,
+    SYNC_MAX_RATE_NUDGE, SYNC_NUDGE_SECONDS, SYNC_SETTLE_MS, SYNC_TOLERANCE_MS,
+    _ClockEstimator, _Member, _detect_public_location, _frame_parts,
+    _normalize_room_host,
 )
 from network_server import NetworkServerMixin
 from network_transfer import NetworkTransferMixin
@@ -53,24 +56,44 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         self._upload_task: asyncio.Task | None = None
         self._reconnect_task: asyncio.Task | None = None
         self._write_lock: asyncio.Lock | None = None
+        self._binary_frames = False
         self._connection_target: tuple[str, int] | None = None
         self._auto_reconnect = False
         self._reconnecting = False
         self._connection_serial = 0
-        self._server_clock_offset = 0.0
-        self._clock_synced = False
+        self._clock = _ClockEstimator()
+        self._sync_anchor: tuple[int, float] | None = None
+        self._sync_rate = 1.0
+        self._drift_timer = QTimer(self)
+        self._drift_timer.setInterval(SYNC_CHECK_INTERVAL_MS)
+        self._drift_timer.timeout.connect(self._correct_drift)
         self._incoming_files: dict[str, dict] = {}
         self._streams: dict[str, dict] = {}
+        self._local_copies: dict[str, Path] = {}
+        self._prefetch_ids: set[str] = set()
         self._outgoing_metadata: dict[str, dict] = {}
         self._outgoing_transfers: dict[str, dict] = {}
         self._active_upload_id = ""
         self._stream_targets: dict[str, float] = {}
+        self._room_throughput_bps = 0.0
         self._persist_tasks: set[asyncio.Task] = set()
         self._replay_tasks: dict[object, asyncio.Task] = {}
+        self._member_senders: dict[object, asyncio.Task] = {}
         self._geo_tasks: set[asyncio.Task] = set()
         self._country_cache: dict[str, tuple[str, float]] = {}
-        self._stream_server = None
+        self._roster_version = 0
+        self._roster_sent: dict[str, dict] = {}
+        self._client_roster: dict[str, dict] = {}
+        self._client_roster_version = -1
         self._stream_port = 0
+        self._peer_server = None
+        self._peer_port = 0
+        self._swarm_grants: dict[str, tuple[str, int, int, float]] = {}
+        self._swarm_tasks: dict[str, asyncio.Task] = {}
+        self._swarm_fetches: dict[
+            str, tuple[_Member, str, asyncio.Future]
+        ] = {}
+        self._swarm_unreachable: set[tuple[str, str]] = set()
 
         self.local_name = socket.gethostname()
         self.local_public_ip = ""
@@ -110,13 +133,14 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
 
     def stream_url(self, track: dict) -> str:
         transfer_id = str(track.get("stream_id") or "")
+        local_copy = self._local_copies.get(transfer_id)
+        if local_copy is not None:
+            return local_copy.as_uri()
         state = self._streams.get(transfer_id)
         if not state or not self._stream_port:
             return ""
-        filename = urllib.parse.quote(str(state["final"].name))
-        return (
-            f"http://127.0.0.1:{self._stream_port}/stream/"
-            f"{transfer_id}/{filename}"
+        return media_server().url(
+            "stream", transfer_id, str(state["final"].name)
         )
 
     def track_metadata(self, track: dict) -> dict:
@@ -128,13 +152,27 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             if cover:
                 metadata["cover_bytes"] = cover
             return metadata
+        local_copy = self._local_copies.get(transfer_id)
+        if local_copy is not None:
+            metadata = dict(track)
+            cover_path = find_cover_path(local_copy)
+            try:
+                if cover_path is not None:
+                    metadata["cover_bytes"] = cover_path.read_bytes()
+            except OSError:
+                pass
+            return metadata
         metadata = self._outgoing_metadata.get(transfer_id)
         return dict(metadata or track)
 
     def release_streams_except(self, transfer_id: str | None):
         keep = str(transfer_id or "")
         for stream_id, state in list(self._streams.items()):
-            if stream_id == keep or stream_id in self._incoming_files:
+            if (
+                stream_id == keep
+                or stream_id in self._incoming_files
+                or stream_id in self._prefetch_ids
+            ):
                 continue
             if state.get("complete") and (
                 state.get("persisted") or state.get("error")
@@ -143,6 +181,9 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         for stream_id in list(self._outgoing_metadata):
             if stream_id != keep:
                 self._outgoing_metadata.pop(stream_id, None)
+        for stream_id in list(self._local_copies):
+            if stream_id != keep and stream_id not in self._prefetch_ids:
+                self._local_copies.pop(stream_id, None)
 
     def _start_local_location_lookup(self, generation):
         async def resolve():
@@ -163,6 +204,7 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         self._auto_reconnect = False
         await self._reset(False)
         await self._ensure_stream_server()
+        await self._ensure_peer_server()
         self.role = "host"
         try:
             advertised_host = _normalize_room_host(host_url)
@@ -206,6 +248,7 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         self._auto_reconnect = False
         await self._reset(False)
         await self._ensure_stream_server()
+        await self._ensure_peer_server()
         self.role = "guest"
         try:
             host_url = _normalize_room_host(host_url)
@@ -325,7 +368,9 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         if not self._writer:
             return False
         try:
-            self._writer.write(_encode_frame(packet, payload))
+            self._writer.writelines(
+                _frame_parts(packet, payload, self._binary_frames)
+            )
             return True
         except Exception as exc:
             self.error_occurred.emit(f"Send failed: {exc}")
@@ -338,11 +383,11 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         lock = self._write_lock
         if not writer or not lock:
             raise ConnectionError("Not connected")
-        frame = _encode_frame(packet, payload)
+        frame = _frame_parts(packet, payload, self._binary_frames)
         async with lock:
             if self._writer is not writer or self._write_lock is not lock:
                 raise ConnectionError("Connection changed while sending")
-            writer.write(frame)
+            writer.writelines(frame)
             await writer.drain()
 
     def _apply_track_commit(self, packet):
@@ -369,6 +414,7 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             )
         elif self.player is not None:
             self._play_token += 1
+            self._set_sync_anchor(None)
             self._applying_remote = True
             try:
                 self.player.pause()
@@ -383,12 +429,11 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         self._play_token += 1
         play_token = self._play_token
         stream_id = self._committed_stream_id
-        local_start_at = start_at + (
-            self._server_clock_offset if self._clock_synced else 0.0
-        )
+        local_start_at = start_at + self._server_offset()
         delay_ms = max(
             0, round((local_start_at - time.time()) * 1000)
         )
+        self._set_sync_anchor(None)
         self._applying_remote = True
         self.player.pause()
         self.player.setPosition(max(0, int(position)))
@@ -412,6 +457,7 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             self.player.setPosition(target)
             self.player.play()
             self._applying_remote = False
+            self._set_sync_anchor((int(position), start_at))
 
         QTimer.singleShot(delay_ms, start)
 
@@ -429,6 +475,11 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             self._schedule_play(position, effective_at)
         else:
             self._play_token += 1
+            self._set_sync_anchor(
+                (position, effective_at)
+                if action == "seek" and self._sync_anchor is not None
+                else None
+            )
             self._applying_remote = True
             self.player.setPosition(position)
             if action == "pause":
@@ -436,6 +487,60 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             self._applying_remote = False
         self.sync_received.emit(action, position)
 
+    def _server_offset(self) -> float:
+        return self._clock.offset(time.time())
+
+    def _set_sync_anchor(self, anchor: tuple[int, float] | None):
+        self._sync_anchor = anchor
+        if anchor is None:
+            self._drift_timer.stop()
+            self._set_sync_rate(1.0)
+        elif not self._drift_timer.isActive():
+            self._drift_timer.start()
+
+    def _set_sync_rate(self, rate: float):
+        if abs(rate - self._sync_rate) < 0.0005:
+            return
+        self._sync_rate = rate
+        if self.player is not None:
+            self.player.setPlaybackRate(rate)
+
+    def _correct_drift(self):
+        """Pull local playback onto the room clock.
+
+        Small drift is corrected by playing slightly fast or slow until the
+        gap closes; only drift beyond ``DRIFT_LIMIT_MS`` is seeked away.
+        """
+        if (
+            self.player is None
+            or self._sync_anchor is None
+            or self._client_preparing_request
+            or self.player.playbackState() != QMediaPlayer.PlayingState
+        ):
+            self._set_sync_rate(1.0)
+            return
+        anchor_position, anchor_time = self._sync_anchor
+        expected = anchor_position + (
+            time.time() - self._server_offset() - anchor_time
+        ) * 1000
+        drift = self.player.position() - expected
+        if abs(drift) > DRIFT_LIMIT_MS:
+            self._applying_remote = True
+            try:
+                self.player.setPosition(max(0, round(expected)))
+            finally:
+                self._applying_remote = False
+            self._set_sync_rate(1.0)
+        elif abs(drift) <= SYNC_SETTLE_MS or (
+            self._sync_rate == 1.0 and abs(drift) <= SYNC_TOLERANCE_MS
+        ):
+            self._set_sync_rate(1.0)
+        else:
+            nudge = drift / (SYNC_NUDGE_SECONDS * 1000)
+            self._set_sync_rate(
+                1.0 - max(-SYNC_MAX_RATE_NUDGE, min(SYNC_MAX_RATE_NUDGE, nudge))
+            )
+
     def _apply_state_packet(self, packet):
         if (
             self.player is None
@@ -446,34 +551,36 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         playing = bool(packet.get("playing"))
         position = max(0, int(packet.get("position", 0)))
         timestamp = float(packet.get("timestamp", time.time()))
-        local_timestamp = timestamp + (
-            self._server_clock_offset if self._clock_synced else 0.0
-        )
-        if playing:
-            position += max(
-                0, round((time.time() - local_timestamp) * 1000)
-            )
         playback_changed = False
         self._applying_remote = True
         try:
-            if abs(self.player.position() - position) > DRIFT_LIMIT_MS:
-                self.player.setPosition(position)
-            if (
-                playing
-                and self.player.playbackState()
-                != QMediaPlayer.PlayingState
-            ):
-                self.player.play()
-                playback_changed = True
-            elif (
-                not playing
-                and self.player.playbackState()
-                == QMediaPlayer.PlayingState
-            ):
-                self.player.pause()
-                playback_changed = True
+            if playing:
+                if (
+                    self.player.playbackState()
+                    != QMediaPlayer.PlayingState
+                ):
+                    self.player.play()
+                    playback_changed = True
+            else:
+                if (
+                    self.player.playbackState()
+                    == QMediaPlayer.PlayingState
+                ):
+                    self.player.pause()
+                    playback_changed = True
+                if abs(self.player.position() - position) > DRIFT_LIMIT_MS:
+                    self.player.setPosition(position)
         finally:
             self._applying_remote = False
+        self._set_sync_anchor((position, timestamp) if playing else None)
+        if playing:
+            self._correct_drift()
+            position += max(
+                0,
+                round(
+                    (time.time() - self._server_offset() - timestamp) * 1000
+                ),
+            )
         if playback_changed:
             self.sync_received.emit("play" if playing else "pause", position)
 
@@ -501,6 +608,7 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             self._abort_incoming_file(transfer_id)
         writer, self._writer = self._writer, None
         self._write_lock = None
+        self._binary_frames = False
         if writer:
             try:
                 writer.close()
@@ -508,18 +616,17 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
             except Exception:
                 pass
         await self._stop_server()
-        if self._stream_server is not None:
-            self._stream_server.close()
-            try:
-                await self._stream_server.wait_closed()
-            except Exception:
-                pass
-            self._stream_server = None
+        if self._stream_port:
+            media_server().remove_resolver("stream", self._room_stream_source)
             self._stream_port = 0
+        await self._stop_peer_server()
         self._streams.clear()
+        self._local_copies.clear()
+        self._prefetch_ids.clear()
         self._outgoing_metadata.clear()
         self._outgoing_transfers.clear()
         self._stream_targets.clear()
+        self._room_throughput_bps = 0.0
         self._active_upload_id = ""
         self._room_track = None
         self._committed_stream_id = ""
@@ -532,8 +639,8 @@ class NetworkSyncManager(QObject, NetworkTransferMixin, NetworkServerMixin):
         self._started_at = None
         self._playback_request_id = None
         self._client_preparing_request = None
-        self._server_clock_offset = 0.0
-        self._clock_synced = False
+        self._clock.reset()
+        self._set_sync_anchor(None)
         self._play_token += 1
         self.stream_buffer_progress_changed.emit(0, 0)
         if notify:
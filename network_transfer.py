@@ -8,7 +8,8 @@ import time
 import uuid
 from pathlib import Path
 
-from config import AUDIO_EXTENSIONS, PLAYLISTS_PATH
+from config import AUDIO_EXTENSIONS, PLAYLISTS_PATH, ROOM_BUFFER_PATH
+from library_catalog import library_catalog, track_content_hash
 from threads import fetch_track_metadata
 from network_protocol import (
     FILE_CHUNK_SIZE, MAX_COVER_SIZE, MAX_LYRICS_SIZE, MAX_TRACK_SIZE,
@@ -16,12 +17,16 @@ from network_protocol import (
     STREAM_MAX_BUFFER_SECONDS, STREAM_MIN_BUFFER_SECONDS,
     STREAM_POSITION_POLL_INTERVAL, STREAM_PREPARE_TIMEOUT,
     _audio_segment_size, _duration_seconds, _probe_duration, _safe_name,
+    _transcode_bitrate, _transcode_track,
 )
 from network_connection import NetworkConnectionMixin
 from network_stream import NetworkStreamMixin
+from network_swarm import NetworkSwarmMixin
 
 
-class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
+class NetworkTransferMixin(
+    NetworkConnectionMixin, NetworkStreamMixin, NetworkSwarmMixin
+):
     def _find_local_track(self, track: dict) -> Path | None:
         view = self.player.parent() if self.player is not None else None
         if view is not None and hasattr(view, "_find_local_track"):
@@ -32,7 +37,16 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
             except Exception:
                 pass
         filename = _safe_name(track.get("filename"), "track")
-        for candidate in PLAYLISTS_PATH.glob(f"*/songs/{filename}"):
+        catalog = library_catalog()
+        playlist = track.get("playlist")
+        candidates = [
+            *catalog.find_content_hash(track.get("content_hash"), playlist),
+            *catalog.find_filename(filename, playlist),
+            *catalog.find_source_url(track.get("source_url"), playlist),
+        ]
+        if not candidates and not catalog.wait_ready(0):
+            candidates = list(PLAYLISTS_PATH.glob(f"*/songs/{filename}"))
+        for candidate in candidates:
             if (
                 candidate.is_file()
                 and candidate.suffix.lower() in AUDIO_EXTENSIONS
@@ -73,7 +87,12 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
         return ""
 
     async def _upload_local_track(
-        self, path: Path, track: dict, queue: list[dict], index: int
+        self,
+        path: Path,
+        track: dict,
+        queue: list[dict],
+        index: int,
+        prefetch: bool = False,
     ):
         transfer_id = ""
         context = None
@@ -84,9 +103,10 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
             transfer_id = uuid.uuid4().hex
             track = dict(track)
             track["filename"] = path.name
-            self.connection_state_changed.emit(
-                "Preparing title, artwork, lyrics and first audio segment..."
-            )
+            if not prefetch:
+                self.connection_state_changed.emit(
+                    "Preparing title, artwork, lyrics and first audio segment..."
+                )
             metadata = await asyncio.to_thread(fetch_track_metadata, path)
             lyrics = str(metadata.get("lyrics") or "")
             if len(lyrics.encode("utf-8")) > MAX_LYRICS_SIZE:
@@ -96,6 +116,9 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
             duration = metadata.get("duration") or track.get("duration") or ""
             if not _duration_seconds(duration):
                 duration = await asyncio.to_thread(_probe_duration, path) or ""
+            content_hash = await asyncio.to_thread(
+                track_content_hash, path, size
+            )
             track.update({
                 "title": metadata.get("title") or track.get("title") or path.stem,
                 "artist": metadata.get("artist") or track.get("artist") or "Unknown Artist",
@@ -103,6 +126,7 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                 "cover_url": metadata.get("cover_url") or track.get("cover_url") or "",
                 "duration": duration,
                 "genius_url": metadata.get("genius_url") or "",
+                "content_hash": content_hash,
                 "stream_id": transfer_id,
             })
             queue = [dict(row) for row in queue]
@@ -120,6 +144,8 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
             context = {
                 "transfer_id": transfer_id,
                 "path": path,
+                "source_path": path,
+                "transcoded": None,
                 "size": size,
                 "track": track,
                 "queue": queue,
@@ -132,17 +158,21 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                 "resume_token": "",
                 "cancelled": False,
                 "suppress_abort": False,
+                "prefetch": prefetch,
             }
             self._outgoing_transfers[transfer_id] = context
             self._active_upload_id = transfer_id
-            self.connection_state_changed.emit(
-                "Sending metadata and the first audio segment..."
-            )
+            if not prefetch:
+                self.connection_state_changed.emit(
+                    "Sending metadata and the first audio segment..."
+                )
             await self._send_frame_locked(
                 {
                     "type": "upload_begin",
                     "transfer_id": transfer_id,
                     "size": size,
+                    "content_hash": content_hash,
+                    "prefetch": prefetch,
                     "track": track,
                     "queue": queue,
                     "index": index,
@@ -162,10 +192,19 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                     cover_chunk,
                 )
                 context["cover_offset"] = offset + len(cover_chunk)
+            bitrate = _transcode_bitrate(
+                size, duration, self._room_throughput_bps
+            )
+            if bitrate is not None:
+                context["variant_task"] = asyncio.create_task(
+                    self._upload_room_variant(context, bitrate)
+                )
             await self._send_upload_context(context, 0)
         except asyncio.CancelledError:
             if context is None or not context.get("suppress_abort"):
                 await self._abort_outgoing_transfer(transfer_id)
+            if context is None:
+                self._prune_transcodes()
         except Exception as exc:
             connection_lost = (
                 not self.is_connected or isinstance(exc, ConnectionError)
@@ -183,8 +222,105 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                 await self._abort_outgoing_transfer(transfer_id)
                 self.error_occurred.emit(f"Track transfer failed: {exc}")
 
+    async def _upload_room_variant(self, original: dict, bitrate: int):
+        """Send a lower-bitrate copy of ``original`` next to it.
+
+        The original goes out untouched and immediately; the host moves only
+        the members whose links cannot keep up onto this copy.
+        """
+        source_id = str(original["transfer_id"])
+        transfer_id = uuid.uuid4().hex
+        output = ROOM_BUFFER_PATH / f"transcode-{transfer_id}.mp3"
+        original["transcoded"] = output
+        source = Path(original["source_path"])
+        try:
+            if not await asyncio.to_thread(
+                _transcode_track, source, output, bitrate
+            ):
+                return
+            size = output.stat().st_size
+            if original.get("cancelled") or size >= int(original["size"]):
+                return
+            track = dict(original["track"])
+            track["filename"] = f"{source.stem}.mp3"
+            track["source_size"] = int(original["size"])
+            segment_size, segment_seconds = _audio_segment_size(
+                size, track.get("duration")
+            )
+            context = {
+                "transfer_id": transfer_id,
+                "variant_of": source_id,
+                "path": output,
+                "source_path": source,
+                "transcoded": output,
+                "size": size,
+                "track": track,
+                "queue": original["queue"],
+                "index": original["index"],
+                "segment_size": segment_size,
+                "segment_seconds": segment_seconds,
+                "cover": b"",
+                "cover_offset": 0,
+                "offset": 0,
+                "resume_token": "",
+                "cancelled": False,
+                "suppress_abort": False,
+                "prefetch": original["prefetch"],
+            }
+            self._outgoing_transfers[transfer_id] = context
+            await self._send_frame_locked({
+                "type": "upload_begin",
+                "transfer_id": transfer_id,
+                "variant_of": source_id,
+                "size": size,
+                "content_hash": track.get("content_hash") or "",
+                "prefetch": original["prefetch"],
+                "track": track,
+                "queue": original["queue"],
+                "index": original["index"],
+                "segment_size": segment_size,
+                "segment_seconds": segment_seconds,
+            })
+            await self._send_upload_context(context, 0)
+        except asyncio.CancelledError:
+            await self._abort_outgoing_transfer(transfer_id)
+        except Exception as exc:
+            print(f"[Room] Slow-link copy failed: {exc}")
+            await self._abort_outgoing_transfer(transfer_id)
+        finally:
+            if original.get("transcoded") == output:
+                original["transcoded"] = None
+            self._prune_transcodes()
+
+    def _cancel_room_variants(self, transfer_id: str):
+        for variant_id, context in list(self._outgoing_transfers.items()):
+            if context.get("variant_of") == transfer_id:
+                context["cancelled"] = True
+                self._outgoing_transfers.pop(variant_id, None)
+
+    def _prune_transcodes(self):
+        active = {
+            Path(context["transcoded"])
+            for context in self._outgoing_transfers.values()
+            if context.get("transcoded") is not None
+        }
+        try:
+            stale = [
+                path
+                for path in ROOM_BUFFER_PATH.glob("transcode-*.mp3")
+                if path not in active
+            ]
+        except OSError:
+            return
+        for path in stale:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
     async def _send_upload_context(self, context: dict, start_offset: int):
         transfer_id = str(context["transfer_id"])
+        stream_id = str(context.get("variant_of") or transfer_id)
         path = Path(context["path"])
         size = int(context["size"])
         segment_size = int(context["segment_size"])
@@ -201,7 +337,10 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                     or self._outgoing_transfers.get(transfer_id) is not context
                 ):
                     raise asyncio.CancelledError
-                if segment_index >= STREAM_INITIAL_SEGMENTS:
+                if segment_index >= STREAM_INITIAL_SEGMENTS and (
+                    not context.get("prefetch")
+                    or self._committed_stream_id == stream_id
+                ):
                     duration_seconds = _duration_seconds(track.get("duration"))
                     sent_seconds = (
                         float(duration_seconds) * offset / size
@@ -209,7 +348,7 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                         else segment_index * segment_seconds
                     )
                     await self._wait_for_stream_window(
-                        transfer_id, sent_seconds, segment_seconds
+                        stream_id, sent_seconds, segment_seconds
                     )
                 chunk = await asyncio.to_thread(source.read, segment_size)
                 if not chunk:
@@ -226,7 +365,9 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                 offset += len(chunk)
                 segment_index += 1
                 context["offset"] = offset
-                if segment_index == 1:
+                if segment_index == 1 and not (
+                    context.get("prefetch") or context.get("variant_of")
+                ):
                     self.connection_state_changed.emit(
                         "Playing from RAM while the rest downloads..."
                     )
@@ -235,19 +376,23 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
         )
         self._outgoing_transfers.pop(transfer_id, None)
         self._stream_targets.pop(transfer_id, None)
+        self._prune_transcodes()
         if self._active_upload_id == transfer_id:
             self._active_upload_id = ""
-        self.connection_state_changed.emit(
-            "Track buffered in RAM; saving to disk in background..."
-        )
+        if not (context.get("prefetch") or context.get("variant_of")):
+            self.connection_state_changed.emit(
+                "Track buffered in RAM; saving to disk in background..."
+            )
 
     async def _abort_outgoing_transfer(self, transfer_id: str):
         transfer_id = str(transfer_id or "")
         context = self._outgoing_transfers.pop(transfer_id, None)
         if context is not None:
             context["cancelled"] = True
+        self._cancel_room_variants(transfer_id)
         self._stream_targets.pop(transfer_id, None)
         self._outgoing_metadata.pop(transfer_id, None)
+        self._prune_transcodes()
         if self._active_upload_id == transfer_id:
             self._active_upload_id = ""
         if transfer_id and self.is_connected:
@@ -313,18 +458,20 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
         index = max(
             0, min(int(packet.get("index") or 0), len(queue) - 1)
         )
+        prefetch = bool(packet.get("prefetch"))
         path = self._find_local_track(track)
         if not path:
             self._send_packet({
                 "type": "upload_unavailable",
                 "message": "The queue owner no longer has this track",
+                "prefetch": prefetch,
             })
             return
         self._discard_outgoing_transfers()
         if self._upload_task and not self._upload_task.done():
             self._upload_task.cancel()
         self._upload_task = asyncio.create_task(
-            self._upload_local_track(path, track, queue, index)
+            self._upload_local_track(path, track, queue, index, prefetch)
         )
 
     def _discard_outgoing_transfers(self):
@@ -339,6 +486,7 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
         self._outgoing_transfers.clear()
         self._stream_targets.clear()
         self._active_upload_id = ""
+        self._prune_transcodes()
 
     @staticmethod
     def _same_local_path(first, second):
@@ -357,7 +505,7 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
     def _release_local_sources(self, matches):
         released = False
         for transfer_id, context in list(self._outgoing_transfers.items()):
-            if not matches(context.get("path")):
+            if not matches(context.get("source_path") or context.get("path")):
                 continue
             released = True
             context["cancelled"] = True
@@ -371,6 +519,8 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
                 })
             if self._active_upload_id == transfer_id:
                 self._active_upload_id = ""
+        if released:
+            self._prune_transcodes()
         if released and self._upload_task and not self._upload_task.done():
             self._upload_task.cancel()
         return released
@@ -500,8 +650,10 @@ class NetworkTransferMixin(NetworkConnectionMixin, NetworkStreamMixin):
         context = self._outgoing_transfers.pop(transfer_id, None)
         if context is not None:
             context["cancelled"] = True
+        self._cancel_room_variants(transfer_id)
         self._stream_targets.pop(transfer_id, None)
         self._outgoing_metadata.pop(transfer_id, None)
+        self._prune_transcodes()
         if self._active_upload_id == transfer_id:
             self._active_upload_id = ""
             if self._upload_task and not self._upload_task.done():
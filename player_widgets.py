@@ -16,6 +16,7 @@ from config import (
     PLAYLISTS_PATH, TEXT_COLOR, TEXT_MUTED, SAVED_VOLUME, save_volume,
 )
 from dropdown_ui import QDialog, QInputDialog
+from library_catalog import library_catalog
 from threads import TrackMetaFetcher
 from utils import colored_icon, format_time, rounded_cover_pixmap
 import discord_rpc
@@ -25,6 +26,7 @@ from playlist_components import (
 )
 from playlist_storage import PlaylistStorageMixin
 from playlist_actions import PlaylistActionsMixin
+from track_order import TrackOrder
 
 MENU_ICON_SIZE = 28
 MENU_TEXT_SIZE = 14
@@ -251,8 +253,7 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         self.current_track_path = None
         self.playing_playlist = None
         self.playing_playlist_path = None
-        self._playback_order = []
-        self._playback_row_by_filename = {}
+        self._playback_order = TrackOrder()
         self._current_metadata = {}
         self.is_shuffled = False
         self.repeat_track = False
@@ -355,7 +356,7 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         self.songs_list.customContextMenuRequested.connect(
             self._track_menu
         )
-        self.songs_list.itemDoubleClicked.connect(self.play_song)
+        self.songs_list.doubleClicked.connect(self.play_song)
         center.addWidget(self.songs_list, 25)
 
         sidebar = QVBoxLayout()
@@ -600,11 +601,10 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         self.cancel_playlist_loading()
         self.current_playlist = None
         self.current_playlist_path = None
-        self._playlist_order = []
-        self._row_by_filename = {}
+        self._set_playlist_order([])
         self.playlist_name.setText("Playlist")
-        self.songs_list.clear()
         self._order_undo_stack.clear()
+        self._update_watched_playlists()
         self.back_requested.emit()
 
     def reset_current_track(self):
@@ -618,11 +618,11 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         self.current_track_path = None
         self.playing_playlist = None
         self.playing_playlist_path = None
-        self._playback_order = []
-        self._playback_row_by_filename = {}
+        self._playback_order = TrackOrder()
         self._current_metadata = {}
         self._active_room_request = None
         self._reset_shuffle_queue()
+        self._update_watched_playlists()
         self._show_idle_display(True)
         discord_rpc.clear_activity()
 
@@ -671,13 +671,16 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         if self.current_playlist == name:
             self.current_playlist = None
             self.current_playlist_path = None
-            self._playlist_order = []
-            self._row_by_filename = {}
+            self._set_playlist_order([])
             self.playlist_name.setText("Playlist")
-            self.songs_list.clear()
             self._order_undo_stack.clear()
+        self._update_watched_playlists()
         QApplication.processEvents()
 
+    @property
+    def _playback_row_by_filename(self):
+        return self._playback_order.rows
+
     def _activate_playback_context(self, path, filename, index, preserve_queue):
         path = Path(path)
         current_path = Path(self.current_playlist_path) if self.current_playlist_path else None
@@ -686,25 +689,21 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         same_playlist = current_path is not None and path.parent == current_path
         if same_playback:
             playlist = self.playing_playlist
-            order = list(self._playback_order)
+            order = self._playback_order.copy()
         elif same_playlist:
             playlist = self.current_playlist
-            order = list(self._playlist_order)
+            order = self._playlist_order.copy()
         else:
             playlist = path.parent.parent.name if path.parent.name == "songs" else None
-            order = []
-        if not order:
-            order = [filename]
-        elif filename not in order:
+            order = TrackOrder()
+        if filename not in order:
             insert_at = max(0, min(int(index), len(order))) if index >= 0 else len(order)
-            order.insert(insert_at, filename)
+            order.insert(insert_at, [filename])
         self.playing_playlist = playlist
         self.playing_playlist_path = path.parent
         self._playback_order = order
-        self._playback_row_by_filename = {
-            name: row for row, name in enumerate(order)
-        }
         self.current_track_index = self._playback_row_by_filename.get(filename, 0)
+        self._update_watched_playlists()
         if preserve_queue:
             self._shuffle_anchor = filename
             self._refresh_queue_dialog()
@@ -714,11 +713,7 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
     def _playback_order_changed(self):
         if self.playing_playlist != self.current_playlist:
             return
-        self._playback_order = list(self._playlist_order)
-        self._playback_row_by_filename = {
-            filename: row
-            for row, filename in enumerate(self._playback_order)
-        }
+        self._playback_order = self._playlist_order.copy()
         self.current_track_index = self._playback_row_by_filename.get(
             self.current_track_filename, -1
         )
@@ -804,7 +799,15 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         )
         if preferred.is_file():
             return preferred
-        for candidate in PLAYLISTS_PATH.glob(f"*/songs/{filename}"):
+        catalog = library_catalog()
+        candidates = [
+            *catalog.find_content_hash(track.get("content_hash")),
+            *catalog.find_filename(filename),
+            *catalog.find_source_url(track.get("source_url")),
+        ]
+        if not candidates and not catalog.wait_ready(0):
+            candidates = list(PLAYLISTS_PATH.glob(f"*/songs/{filename}"))
+        for candidate in candidates:
             if candidate.is_file():
                 return candidate
         return None
@@ -899,9 +902,9 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
             discord_rpc.update_paused()
         else:
             if not self.player.source().isValid() and self._playlist_order:
-                item = self.songs_list.currentItem()
-                if item is not None:
-                    self.play_song(item)
+                index = self.songs_list.currentIndex()
+                if index.isValid():
+                    self.play_song(index)
                 else:
                     filename = self._playlist_order[0]
                     self.play_file(
@@ -961,7 +964,7 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         self._refresh_queue_dialog()
 
     def _queue_order_changed(self):
-        valid = set(self._playback_order)
+        valid = self._playback_order
         self._shuffle_upcoming = [
             filename
             for filename in self._shuffle_upcoming
@@ -1055,12 +1058,7 @@ class PlaylistView(PlaylistStorageMixin, PlaylistActionsMixin, QWidget):
         if len(positions) != len(filenames) or set(existing) != set(filenames):
             self._refresh_queue_dialog()
             return
-        for position, filename in zip(positions, filenames):
-            self._playback_order[position] = filename
-        self._playback_row_by_filename = {
-            filename: row
-            for row, filename in enumerate(self._playback_order)
-        }
+        self._playback_order.permute(positions, filenames)
         self.current_track_index = self._playback_row_by_filename.get(
             self.current_track_filename,
             current,
@@ -4,7 +4,7 @@ import shutil
 import time
 from pathlib import Path
 
-from PySide6.QtCore import QUrl, Qt
+from PySide6.QtCore import QItemSelectionModel, QPersistentModelIndex, QUrl, Qt
 from PySide6.QtGui import QGuiApplication
 from PySide6.QtMultimedia import QMediaPlayer
 from PySide6.QtWidgets import (
@@ -55,17 +55,15 @@ class PlaylistActionsMixin:
                 playlist_name, dialog.downloaded_paths
             )
 
-    def delete_selected_tracks(self, items=None):
-        items = list(items or self.songs_list.selectedItems())
-        if not items and self.songs_list.currentItem() is not None:
-            items = [self.songs_list.currentItem()]
-        items = [item for item in items if item.data(Qt.UserRole)]
-        if not items or not self.current_playlist_path:
+    def delete_selected_tracks(self, filenames=None):
+        filenames = list(filenames or self.songs_list.selected_filenames())
+        if not filenames and self.songs_list.current_filename():
+            filenames = [self.songs_list.current_filename()]
+        if not filenames or not self.current_playlist_path:
             return False
 
         paths = [
-            self.current_playlist_path / item.data(Qt.UserRole)
-            for item in items
+            self.current_playlist_path / filename for filename in filenames
         ]
         count = len(paths)
         prompt = (
@@ -113,24 +111,20 @@ class PlaylistActionsMixin:
         return True
 
     def _track_menu(self, position):
-        item = self.songs_list.itemAt(position)
-        if not item:
+        index = self.songs_list.indexAt(position)
+        if not index.isValid():
             return
-        if not item.isSelected():
-            self.songs_list.clearSelection()
-            item.setSelected(True)
-        items = [
-            selected
-            for selected in self.songs_list.selectedItems()
-            if selected.data(Qt.UserRole)
-        ]
-        if not items:
+        selection = self.songs_list.selectionModel()
+        if not selection.isSelected(index):
+            selection.select(index, QItemSelectionModel.ClearAndSelect)
+        item = QPersistentModelIndex(index)
+        filenames = self.songs_list.selected_filenames()
+        if not filenames:
             return
         paths = [
-            self.current_playlist_path / selected.data(Qt.UserRole)
-            for selected in items
+            self.current_playlist_path / filename for filename in filenames
         ]
-        single_selection = len(items) == 1
+        single_selection = len(filenames) == 1
         menu = make_menu(self)
         play = menu.addAction(
             colored_icon("play.svg", size=MENU_ICON_SIZE), "Play"
@@ -155,6 +149,8 @@ class PlaylistActionsMixin:
         chosen = menu.exec(
             self.songs_list.viewport().mapToGlobal(position)
         )
+        if not item.isValid():
+            return
         path = self.current_playlist_path / item.data(Qt.UserRole)
 
         if chosen is play:
@@ -248,7 +244,7 @@ class PlaylistActionsMixin:
                     + "\n".join(failures[:3]),
                 )
         elif chosen is delete:
-            self.delete_selected_tracks(items)
+            self.delete_selected_tracks(filenames)
         elif chosen is folder:
             path_menu = make_menu(self)
             location = path_menu.addAction(str(path))
@@ -2,8 +2,11 @@
 import math
 
 from PySide6.QtCore import (
+    QAbstractListModel,
     QElapsedTimer,
     QEvent,
+    QModelIndex,
+    QPersistentModelIndex,
     QPoint,
     QPointF,
     QRectF,
@@ -14,7 +17,7 @@ from PySide6.QtCore import (
 )
 from PySide6.QtGui import QColor, QDrag, QFont, QPainter, QPainterPath, QPixmap
 from PySide6.QtWidgets import (
-    QHBoxLayout, QLabel, QListWidget, QSlider, QStyle,
+    QHBoxLayout, QLabel, QListView, QSlider, QStyle,
     QStyledItemDelegate, QVBoxLayout, QWidget,
 )
 
@@ -22,9 +25,93 @@ from config import ACCENT_COLOR, BG_COLOR, BUTTON_BORDER, PANEL_BG, TEXT_COLOR,
 from dropdown_ui import QDialog
 from hotkeys import handle_list_multi_selection
 from smooth_scroll import SmoothScrollArea
+from track_order import TrackOrder
 from utils import rounded_cover_pixmap
 
-class BoundedSongList(QListWidget):
+class SongListModel(QAbstractListModel):
+    """Rows of a playlist order; the list is shared with the owning view.
+
+    Edits go through the row methods so the view only relayouts what moved,
+    and nothing per-row exists until the view asks for a visible index.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._order = TrackOrder()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._order):
+            return None
+        if role == Qt.UserRole:
+            return self._order[index.row()]
+        if role == Qt.SizeHintRole:
+            return QSize(0, TrackListItemWidget.ROW_HEIGHT)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def order(self):
+        return self._order
+
+    def filename(self, row):
+        return self._order[row] if 0 <= row < len(self._order) else None
+
+    def set_order(self, order):
+        self.beginResetModel()
+        self._order = order
+        self.endResetModel()
+
+    def move_row(self, source_row, target_row):
+        if source_row == target_row:
+            return False
+        destination = target_row + 1 if target_row > source_row else target_row
+        if not self.beginMoveRows(
+            QModelIndex(), source_row, source_row, QModelIndex(), destination
+        ):
+            return False
+        self._order.move(source_row, target_row)
+        self.endMoveRows()
+        return True
+
+    def insert_rows(self, row, filenames):
+        filenames = list(filenames)
+        if not filenames:
+            return
+        row = max(0, min(row, len(self._order)))
+        self.beginInsertRows(QModelIndex(), row, row + len(filenames) - 1)
+        self._order.insert(row, filenames)
+        self.endInsertRows()
+
+    def remove_rows(self, rows):
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self._order.remove_range(first, last)
+            self.endRemoveRows()
+
+    def replace_row(self, row, filename):
+        if not 0 <= row < len(self._order):
+            return
+        self._order.replace(row, filename)
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index)
+
+    def refresh_row(self, row):
+        if 0 <= row < len(self._order):
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index)
+
+
+class BoundedSongList(QListView):
 
 
     reorder_started = Signal(list)
@@ -34,7 +121,7 @@ class BoundedSongList(QListWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._drag_item = None
+        self._drag_index = None
         self._drag_source_row = -1
         self._drag_hotspot_y = 0
         self._last_cursor_y = 0
@@ -56,24 +143,49 @@ class BoundedSongList(QListWidget):
             return
         super().keyPressEvent(event)
 
+    def count(self):
+        model = self.model()
+        return model.rowCount() if model is not None else 0
+
     def order(self):
+        model = self.model()
+        return list(model.order()) if model is not None else []
+
+    def current_filename(self):
+        index = self.currentIndex()
+        return index.data(Qt.UserRole) if index.isValid() else None
+
+    def selected_filenames(self):
         return [
-            self.item(row).data(Qt.UserRole)
-            for row in range(self.count())
-            if self.item(row) is not None
+            index.data(Qt.UserRole)
+            for index in sorted(
+                self.selectionModel().selectedRows(), key=QModelIndex.row
+            )
+            if index.data(Qt.UserRole)
         ]
 
+    def select_row(self, row):
+        index = self.model().index(row, 0)
+        if index.isValid():
+            self.setCurrentIndex(index)
+        return index
+
+    def refresh_row(self, row):
+        index = self.model().index(row, 0)
+        if index.isValid():
+            self.viewport().update(self.visualRect(index))
+
     def startDrag(self, _supported_actions):
-        item = self.currentItem()
-        if item is None:
+        index = self.currentIndex()
+        if not index.isValid():
             return
-        item_rect = self.visualItemRect(item)
+        item_rect = self.visualRect(index)
         if not item_rect.isValid():
             return
         self.reorder_started.emit(self.order())
         cursor = self.viewport().mapFromGlobal(self.cursor().pos())
-        self._drag_item = item
-        self._drag_source_row = self.row(item)
+        self._drag_index = QPersistentModelIndex(index)
+        self._drag_source_row = index.row()
         self._last_cursor_y = cursor.y()
         self._drag_hotspot_y = max(
             0, min(item_rect.height() - 1, cursor.y() - item_rect.top())
@@ -88,7 +200,7 @@ class BoundedSongList(QListWidget):
         self._auto_scroll_timer.start()
 
         drag = QDrag(self)
-        drag.setMimeData(self.model().mimeData(self.selectedIndexes()))
+        drag.setMimeData(self.model().mimeData([index]))
         transparent = QPixmap(1, 1)
         transparent.fill(Qt.transparent)
         drag.setPixmap(transparent)
@@ -96,7 +208,7 @@ class BoundedSongList(QListWidget):
         self._finish_drag_preview()
 
     def dragEnterEvent(self, event):
-        if event.source() is self and self._drag_item is not None:
+        if event.source() is self and self._drag_index is not None:
             event.setDropAction(Qt.MoveAction)
             event.accept()
             self._drag_preview.show()
@@ -105,7 +217,7 @@ class BoundedSongList(QListWidget):
         super().dragEnterEvent(event)
 
     def dragMoveEvent(self, event):
-        if event.source() is not self or self._drag_item is None:
+        if event.source() is not self or self._drag_index is None:
             super().dragMoveEvent(event)
             return
         y = event.position().toPoint().y()
@@ -120,12 +232,16 @@ class BoundedSongList(QListWidget):
         event.accept()
 
     def dropEvent(self, event):
-        if event.source() is not self or self._drag_item is None:
+        if event.source() is not self or self._drag_index is None:
             super().dropEvent(event)
             return
 
         before = self.order()
-        source_row = self._drag_source_row
+        source_row = (
+            self._drag_index.row()
+            if self._drag_index.isValid()
+            else self._drag_source_row
+        )
         target_row = self._row_for_y(event.position().toPoint().y())
         target_row = max(0, min(target_row, len(before)))
         after = list(before)
@@ -140,9 +256,8 @@ class BoundedSongList(QListWidget):
         event.accept()
         self._finish_drag_preview()
         if before != after:
-            item = self.takeItem(source_row)
-            self.insertItem(target_row, item)
-            self.setCurrentItem(item)
+            self.model().move_row(source_row, target_row)
+            self.select_row(target_row)
             self.reorder_finished.emit(before, after)
 
     def apply_order(self, target):
@@ -165,9 +280,8 @@ class BoundedSongList(QListWidget):
             without_target = target[:target_row] + target[target_row + 1 :]
             if without_current != without_target:
                 continue
-            item = self.takeItem(source_row)
-            self.insertItem(target_row, item)
-            self.setCurrentItem(item)
+            self.model().move_row(source_row, target_row)
+            self.select_row(target_row)
             return True
         return False
 
@@ -176,12 +290,11 @@ class BoundedSongList(QListWidget):
             return 0
         point = self.viewport().rect().topLeft()
         point.setY(max(0, min(y, self.viewport().height() - 1)))
-        item = self.itemAt(point)
-        if item is None:
+        index = self.indexAt(point)
+        if not index.isValid():
             return self.count() if y >= self.viewport().height() / 2 else 0
-        row = self.row(item)
-        rect = self.visualItemRect(item)
-        return row + (1 if y >= rect.center().y() else 0)
+        rect = self.visualRect(index)
+        return index.row() + (1 if y >= rect.center().y() else 0)
 
     def _update_auto_scroll_target(self, y):
         height = self.viewport().height()
@@ -195,7 +308,7 @@ class BoundedSongList(QListWidget):
             self._target_scroll_speed = 0.0
 
     def _auto_scroll_tick(self):
-        if self._drag_item is None:
+        if self._drag_index is None:
             self._auto_scroll_timer.stop()
             return
         elapsed = self._scroll_clock.nsecsElapsed() / 1_000_000.0
@@ -220,7 +333,7 @@ class BoundedSongList(QListWidget):
             self._move_preview(self._last_cursor_y)
 
     def _move_preview(self, cursor_y):
-        if self._drag_item is None:
+        if self._drag_index is None:
             return
         height = self._drag_preview.height()
         max_y = max(0, self.viewport().height() - height)
@@ -234,7 +347,7 @@ class BoundedSongList(QListWidget):
         self._scroll_remainder = 0.0
         self._drag_preview.hide()
         self._drag_preview.clear()
-        self._drag_item = None
+        self._drag_index = None
         self._drag_source_row = -1
 
 
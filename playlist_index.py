@@ -1,13 +1,31 @@
 import atexit
 import json
+import mmap
 import os
+import struct
 import threading
 import time
+import uuid
+from bisect import bisect_left
 from pathlib import Path
 
 from PySide6.QtCore import QThread, Signal
 
-from config import AUDIO_EXTENSIONS, PLAYLISTS_PATH
+from config import (
+    AUDIO_EXTENSIONS, PLAYLIST_SUMMARY_CACHE_PATH, PLAYLISTS_PATH,
+)
+from library_catalog import sync_catalog_playlist
+
+ORDER_JSON_NAME = "order.json"
+ORDER_COMPACT_NAME = "order.bin"
+ORDER_JOURNAL_NAME = "order.log"
+JOURNAL_COMPACT_OPS = 256
+JOURNAL_COMPACT_SECONDS = 30.0
+COMPACT_ORDER_MAGIC = b"CPOB"
+COMPACT_ORDER_VERSION = 1
+COMPACT_ORDER_THRESHOLD = 4096
+_COMPACT_HEADER = struct.Struct("<4sHHI16s")
+_COMPACT_LENGTH = struct.Struct("<H")
 
 
 def _read_json(path, default):
@@ -18,24 +36,243 @@ def _read_json(path, default):
     return value
 
 
+class CompactOrder:
+    """Read-only view of an order.bin string table.
+
+    Iterating decodes the length-prefixed names straight from the mapped
+    file, which is cheaper than parsing the same order as JSON.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._view = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        try:
+            magic, version, _flags, count, base = _COMPACT_HEADER.unpack_from(
+                self._view
+            )
+        except struct.error as exc:
+            self.close()
+            raise ValueError("Truncated compact order header") from exc
+        if magic != COMPACT_ORDER_MAGIC or version != COMPACT_ORDER_VERSION:
+            self.close()
+            raise ValueError("Unsupported compact order file")
+        self._count = count
+        self.journal_base = base.rstrip(b"\0").decode("ascii") or None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+    def close(self):
+        view, self._view = getattr(self, "_view", None), None
+        if view is not None:
+            view.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _entries(self):
+        view = self._view
+        offset = _COMPACT_HEADER.size
+        for _index in range(self._count):
+            (length,) = _COMPACT_LENGTH.unpack_from(view, offset)
+            start = offset + _COMPACT_LENGTH.size
+            if start + length > len(view):
+                raise ValueError("Truncated compact order entry")
+            yield start, length
+            offset = start + length
+
+    def __iter__(self):
+        view = self._view
+        for start, length in self._entries():
+            yield view[start:start + length].decode("utf-8")
+
+
+def encode_compact_order(order, journal_base=""):
+    encoded = [str(name).encode("utf-8") for name in order]
+    parts = [
+        _COMPACT_HEADER.pack(
+            COMPACT_ORDER_MAGIC,
+            COMPACT_ORDER_VERSION,
+            0,
+            len(encoded),
+            str(journal_base or "").encode("ascii")[:16],
+        )
+    ]
+    for name in encoded:
+        parts.append(_COMPACT_LENGTH.pack(len(name)))
+        parts.append(name)
+    return b"".join(parts)
+
+
+def _read_json_order(path):
+    stored = _read_json(path, None)
+    if isinstance(stored, dict):
+        songs = stored.get("songs")
+        if isinstance(songs, list):
+            return songs, stored.get("journal")
+    elif isinstance(stored, list):
+        return stored, None
+    return None
+
+
+def _read_compact_order(path):
+    try:
+        with CompactOrder(path) as compact:
+            return list(compact), compact.journal_base
+    except (OSError, ValueError, UnicodeDecodeError, struct.error):
+        return None
+
+
+def _read_stored_order(playlist_folder):
+    candidates = []
+    for filename, reader in (
+        (ORDER_COMPACT_NAME, _read_compact_order),
+        (ORDER_JSON_NAME, _read_json_order),
+    ):
+        path = playlist_folder / filename
+        try:
+            candidates.append((path.stat().st_mtime_ns, path, reader))
+        except OSError:
+            continue
+    # Both files only coexist after an interrupted migration; the newer one
+    # is the one the writer was switching to.
+    for _mtime, path, reader in sorted(candidates, reverse=True):
+        stored = reader(path)
+        if stored is not None:
+            return stored
+    return None
+
+
+def _stable_names(previous, order):
+    # Longest run of names that keep their relative position; everything
+    # else has to be moved or inserted.
+    positions = {name: index for index, name in enumerate(previous)}
+    common = [name for name in order if name in positions]
+    tails = []
+    tail_indices = []
+    parents = [-1] * len(common)
+    for index, name in enumerate(common):
+        position = positions[name]
+        slot = bisect_left(tails, position)
+        if slot == len(tails):
+            tails.append(position)
+            tail_indices.append(index)
+        else:
+            tails[slot] = position
+            tail_indices[slot] = index
+        parents[index] = tail_indices[slot - 1] if slot else -1
+    stable = set()
+    index = tail_indices[-1] if tail_indices else -1
+    while index >= 0:
+        stable.add(common[index])
+        index = parents[index]
+    return stable
+
+
+def order_journal_ops(previous, order):
+    target = set(order)
+    ops = []
+    removed = [name for name in previous if name not in target]
+    if removed:
+        ops.append(["del", removed])
+    remaining = [name for name in previous if name in target]
+    stable = _stable_names(remaining, order)
+    run = []
+    anchor = None
+    for name in order:
+        if name in stable:
+            if run:
+                ops.append(["put", anchor, run])
+                run = []
+            anchor = name
+        else:
+            run.append(name)
+    if run:
+        ops.append(["put", anchor, run])
+    return ops
+
+
+def apply_order_journal_ops(order, ops):
+    order = list(order)
+    for op in ops:
+        if op[0] == "del":
+            removed = set(op[1])
+            order = [name for name in order if name not in removed]
+        elif op[0] == "put":
+            anchor, names = op[1], op[2]
+            moved = set(names)
+            order = [name for name in order if name not in moved]
+            try:
+                position = 0 if anchor is None else order.index(anchor) + 1
+            except ValueError:
+                position = len(order)
+            order[position:position] = names
+    return order
+
+
+def _read_order_journal(path, base):
+    ops = []
+    try:
+        with Path(path).open("r", encoding="utf-8") as journal:
+            lines = iter(journal)
+            header = json.loads(next(lines, "null"))
+            if not isinstance(header, dict) or header.get("base") != base:
+                return []
+            for line in lines:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                if not (
+                    isinstance(op, list)
+                    and (
+                        (len(op) == 2 and op[0] == "del")
+                        or (len(op) == 3 and op[0] == "put")
+                    )
+                    and isinstance(op[-1], list)
+                ):
+                    break
+                ops.append(op)
+    except (OSError, ValueError):
+        return []
+    return ops
+
+
 def load_playlist_snapshot(playlists_path, name, should_stop=None):
     playlists_path = Path(playlists_path)
     playlist_folder = playlists_path / str(name)
     songs_path = playlist_folder / "songs"
     metadata_path = playlists_path / f"{name}.json"
-    order_path = playlist_folder / "order.json"
 
     metadata = _read_json(metadata_path, {})
     if not isinstance(metadata, dict):
         metadata = {}
 
-    stored_order = _read_json(order_path, None)
-    if isinstance(stored_order, dict):
-        stored_order = stored_order.get("songs")
+    stored = _read_stored_order(playlist_folder)
+    stored_order, journal_base = stored if stored is not None else (None, None)
     if not isinstance(stored_order, list):
         stored_order = metadata.get("songs", [])
     if not isinstance(stored_order, list):
         stored_order = []
+    if journal_base:
+        ops = _read_order_journal(
+            playlist_folder / ORDER_JOURNAL_NAME, journal_base
+        )
+        if ops:
+            stored_order = apply_order_journal_ops(
+                [str(value) for value in stored_order], ops
+            )
 
     files_by_name = {}
     try:
@@ -67,7 +304,7 @@ def load_playlist_snapshot(playlists_path, name, should_stop=None):
 
     needs_write = (
         ordered_names != stored_order
-        or not order_path.exists()
+        or stored is None
         or metadata.get("song_count") != len(ordered_names)
         or "songs" in metadata
     )
@@ -101,6 +338,103 @@ class PlaylistSnapshotLoader(QThread):
         )
 
 
+class _PlaylistSummaryCache:
+    # Directory mtimes closer to "now" than this may still change within the
+    # same timestamp tick (FAT and SMB shares have 2 s resolution).
+    RACY_MTIME_SECONDS = 2.0
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = _read_json(self.path, {})
+        if not isinstance(entries, dict):
+            entries = {}
+        self._entries = {
+            str(folder): value
+            for folder, value in entries.items()
+            if isinstance(value, list) and len(value) == 3
+        }
+
+    def get(self, folder, mtime_ns):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(str(folder))
+        if entry is None or entry[0] != mtime_ns:
+            return None
+        count, first_name = entry[1], entry[2]
+        first_track = str(Path(folder) / first_name) if first_name else ""
+        return int(count), first_track
+
+    def put(self, folder, mtime_ns, count, first_track):
+        if time.time() - mtime_ns / 1e9 < self.RACY_MTIME_SECONDS:
+            return
+        first_name = Path(first_track).name if first_track else ""
+        entry = [mtime_ns, int(count), first_name]
+        with self._lock:
+            self._load()
+            if self._entries.get(str(folder)) != entry:
+                self._entries[str(folder)] = entry
+                self._dirty = True
+
+    def retain(self, playlists_path, folders):
+        root = str(Path(playlists_path))
+        keep = {str(folder) for folder in folders}
+        with self._lock:
+            self._load()
+            for folder in list(self._entries):
+                if str(Path(folder).parent.parent) == root and folder not in keep:
+                    del self._entries[folder]
+                    self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            text = json.dumps(
+                self._entries, ensure_ascii=False, separators=(",", ":")
+            )
+            self._dirty = False
+        temporary = self.path.with_name(f".{self.path.name}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(text, encoding="utf-8")
+            temporary.replace(self.path)
+        except OSError as exc:
+            temporary.unlink(missing_ok=True)
+            print(f"[Playlist index] Failed to save summaries: {exc}")
+
+
+_SUMMARY_CACHE = _PlaylistSummaryCache(PLAYLIST_SUMMARY_CACHE_PATH)
+
+
+def _scan_playlist_summary(songs_path, should_stop=None):
+    count = 0
+    first_track = ""
+    try:
+        with os.scandir(songs_path) as entries:
+            for index, entry in enumerate(entries):
+                if index % 256 == 0 and should_stop and should_stop():
+                    return None
+                if (
+                    entry.is_file()
+                    and Path(entry.name).suffix.lower() in AUDIO_EXTENSIONS
+                ):
+                    count += 1
+                    if not first_track or entry.name.casefold() < Path(
+                        first_track
+                    ).name.casefold():
+                        first_track = entry.path
+    except OSError:
+        pass
+    return count, first_track
+
+
 class PlaylistSummaryLoader(QThread):
     names_ready = Signal(object)
     summary_ready = Signal(str, int, str)
@@ -123,30 +457,39 @@ class PlaylistSummaryLoader(QThread):
                 )
             except OSError:
                 self.names = []
+            _SUMMARY_CACHE.retain(
+                self.playlists_path,
+                (self.playlists_path / name / "songs" for name in self.names),
+            )
             self.names_ready.emit(self.names)
+        try:
+            self._load_summaries()
+        finally:
+            _SUMMARY_CACHE.save()
+
+    def _load_summaries(self):
         for name in self.names:
             if self.isInterruptionRequested():
                 return
-            count = 0
-            first_track = ""
             songs_path = self.playlists_path / name / "songs"
             try:
-                with os.scandir(songs_path) as entries:
-                    for index, entry in enumerate(entries):
-                        if index % 256 == 0 and self.isInterruptionRequested():
-                            return
-                        if (
-                            entry.is_file()
-                            and Path(entry.name).suffix.lower()
-                            in AUDIO_EXTENSIONS
-                        ):
-                            count += 1
-                            if not first_track or entry.name.casefold() < Path(
-                                first_track
-                            ).name.casefold():
-                                first_track = entry.path
+                mtime_ns = songs_path.stat().st_mtime_ns
             except OSError:
-                pass
+                mtime_ns = None
+            summary = (
+                _SUMMARY_CACHE.get(songs_path, mtime_ns)
+                if mtime_ns is not None
+                else None
+            )
+            if summary is None:
+                summary = _scan_playlist_summary(
+                    songs_path, self.isInterruptionRequested
+                )
+                if summary is None:
+                    return
+                if mtime_ns is not None:
+                    _SUMMARY_CACHE.put(songs_path, mtime_ns, *summary)
+            count, first_track = summary
             self.summary_ready.emit(name, count, first_track)
 
 
@@ -155,6 +498,7 @@ class _PlaylistMetadataWriter:
         self._condition = threading.Condition()
         self._pending = {}
         self._generation = {}
+        self._journals = {}
         self._busy_key = None
         self._thread = threading.Thread(
             target=self._run,
@@ -178,7 +522,7 @@ class _PlaylistMetadataWriter:
                 generation,
                 playlists_path,
                 name,
-                order,
+                list(order),
                 dict(metadata or {}),
             )
             self._condition.notify()
@@ -190,6 +534,7 @@ class _PlaylistMetadataWriter:
             self._pending.pop(key, None)
             while self._busy_key == key:
                 self._condition.wait(0.05)
+            self._journals.pop(key, None)
             self._condition.notify_all()
 
     def _is_current(self, key, generation):
@@ -200,26 +545,109 @@ class _PlaylistMetadataWriter:
     def _write_temporary(path, text):
         path.parent.mkdir(parents=True, exist_ok=True)
         temporary = path.with_name(f".{path.name}.tmp")
-        temporary.write_text(text, encoding="utf-8")
+        if isinstance(text, bytes):
+            temporary.write_bytes(text)
+        else:
+            temporary.write_text(text, encoding="utf-8")
         return temporary
 
+    @staticmethod
+    def _use_compact_order(playlist_folder, order):
+        if len(order) >= COMPACT_ORDER_THRESHOLD:
+            return True
+        # Hysteresis keeps playlists hovering around the threshold from
+        # flipping formats on every compaction.
+        return (
+            len(order) >= COMPACT_ORDER_THRESHOLD // 2
+            and (playlist_folder / ORDER_COMPACT_NAME).exists()
+        )
+
     def _write(self, key, payload):
         generation, playlists_path, name, order, metadata = payload
-        playlist_folder = playlists_path / name
-        order_path = playlist_folder / "order.json"
-        metadata_path = playlists_path / f"{name}.json"
         metadata["name"] = name
         metadata["song_count"] = len(order)
         metadata.pop("songs", None)
-
-        order_text = json.dumps(
-            {"songs": order}, ensure_ascii=False, separators=(",", ":")
-        )
         metadata_text = json.dumps(
             metadata, ensure_ascii=False, indent=2
         )
+        journal = self._journals.get(key)
+        if journal is not None and journal["ops"] < JOURNAL_COMPACT_OPS:
+            ops = order_journal_ops(journal["order"], order)
+            moved = sum(len(op[-1]) for op in ops)
+            if (
+                journal["ops"] + len(ops) <= JOURNAL_COMPACT_OPS
+                and moved <= max(64, len(order) // 4)
+            ):
+                self._append_journal(
+                    key, generation, payload, ops, metadata_text
+                )
+                return
+        self._compact(
+            key, generation, playlists_path, name, order, metadata_text
+        )
+
+    def _append_journal(self, key, generation, payload, ops, metadata_text):
+        _generation, playlists_path, name, order, _metadata = payload
+        journal = self._journals[key]
+        journal_path = playlists_path / name / ORDER_JOURNAL_NAME
+        metadata_path = playlists_path / f"{name}.json"
+        metadata_temporary = None
+        try:
+            if not self._is_current(key, generation):
+                return
+            if ops:
+                lines = [
+                    json.dumps(op, ensure_ascii=False, separators=(",", ":"))
+                    for op in ops
+                ]
+                if not journal["ops"]:
+                    lines.insert(0, json.dumps({"base": journal["base"]}))
+                with journal_path.open(
+                    "a" if journal["ops"] else "w", encoding="utf-8"
+                ) as output:
+                    output.write("\n".join(lines) + "\n")
+                if not journal["ops"]:
+                    journal["since"] = time.monotonic()
+                journal["ops"] += len(ops)
+                journal["order"] = list(order)
+            if metadata_text != journal["metadata_text"]:
+                metadata_temporary = self._write_temporary(
+                    metadata_path, metadata_text
+                )
+                metadata_temporary.replace(metadata_path)
+                journal["metadata_text"] = metadata_text
+            if ops:
+                sync_catalog_playlist(name, playlists_path)
+        except OSError as exc:
+            print(f"[Playlist index] Failed to journal {name}: {exc}")
+            self._journals.pop(key, None)
+        finally:
+            if metadata_temporary is not None:
+                metadata_temporary.unlink(missing_ok=True)
+
+    def _compact(
+        self, key, generation, playlists_path, name, order, metadata_text
+    ):
+        playlist_folder = playlists_path / name
+        journal_path = playlist_folder / ORDER_JOURNAL_NAME
+        metadata_path = playlists_path / f"{name}.json"
+        base = uuid.uuid4().hex[:16]
+
+        if self._use_compact_order(playlist_folder, order):
+            order_path = playlist_folder / ORDER_COMPACT_NAME
+            stale_path = playlist_folder / ORDER_JSON_NAME
+            order_text = encode_compact_order(order, base)
+        else:
+            order_path = playlist_folder / ORDER_JSON_NAME
+            stale_path = playlist_folder / ORDER_COMPACT_NAME
+            order_text = json.dumps(
+                {"songs": order, "journal": base},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
         order_temporary = None
         metadata_temporary = None
+        self._journals.pop(key, None)
         try:
             if not self._is_current(key, generation):
                 return
@@ -231,6 +659,18 @@ class _PlaylistMetadataWriter:
                 return
             order_temporary.replace(order_path)
             metadata_temporary.replace(metadata_path)
+            stale_path.unlink(missing_ok=True)
+            journal_path.unlink(missing_ok=True)
+            self._journals[key] = {
+                "base": base,
+                "order": list(order),
+                "ops": 0,
+                "since": None,
+                "playlists_path": playlists_path,
+                "name": name,
+                "metadata_text": metadata_text,
+            }
+            sync_catalog_playlist(name, playlists_path)
         except OSError as exc:
             print(f"[Playlist index] Failed to save {name}: {exc}")
         finally:
@@ -239,14 +679,50 @@ class _PlaylistMetadataWriter:
             if metadata_temporary is not None:
                 metadata_temporary.unlink(missing_ok=True)
 
+    def _compaction_due(self, now):
+        wait = None
+        for key, journal in self._journals.items():
+            if not journal["ops"] or key in self._pending:
+                continue
+            remaining = journal["since"] + JOURNAL_COMPACT_SECONDS - now
+            if remaining <= 0:
+                return key, 0
+            if wait is None or remaining < wait:
+                wait = remaining
+        return None, wait
+
+    def _compact_journal(self, key):
+        journal = self._journals.get(key)
+        if journal is None or not journal["ops"]:
+            return
+        with self._condition:
+            generation = self._generation.get(key, 0)
+        self._compact(
+            key,
+            generation,
+            journal["playlists_path"],
+            journal["name"],
+            journal["order"],
+            journal["metadata_text"],
+        )
+
     def _run(self):
         while True:
             with self._condition:
                 while not self._pending:
-                    self._condition.wait()
-                key, payload = self._pending.popitem()
+                    due, wait = self._compaction_due(time.monotonic())
+                    if due is not None:
+                        break
+                    self._condition.wait(wait)
+                if self._pending:
+                    key, payload = self._pending.popitem()
+                else:
+                    key, payload = due, None
                 self._busy_key = key
-            self._write(key, payload)
+            if payload is None:
+                self._compact_journal(key)
+            else:
+                self._write(key, payload)
             with self._condition:
                 self._busy_key = None
                 self._condition.notify_all()
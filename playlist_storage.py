@@ -1,46 +1,78 @@
 import json
+import os
 import random
 from collections import OrderedDict
 from pathlib import Path
 
-from PySide6.QtCore import QSize, Qt, QTimer
-from PySide6.QtGui import QImageReader, QPainter, QPixmap
-from PySide6.QtWidgets import QListWidgetItem
+from PySide6.QtCore import QPoint, Qt, QTimer
+from PySide6.QtGui import QPixmap
 
 from config import AUDIO_EXTENSIONS, PLAYLISTS_PATH
-from playlist_components import TrackItemDelegate
+from cover_thumbnails import CoverThumbnailCache, find_cover_path
+from library_catalog import update_catalog_tracks
+from playlist_components import SongListModel, TrackItemDelegate
 from playlist_index import (
     PlaylistSnapshotLoader,
     cancel_playlist_writes,
     schedule_playlist_write,
 )
+from playlist_watcher import PlaylistFolderWatcher
+from row_prefetcher import (
+    RowPrefetcher,
+    read_track_metadata,
+    track_metadata_key,
+)
+from track_order import TrackOrder
 
 
 class PlaylistStorageMixin:
-    LOAD_BATCH_SIZE = 256
     METADATA_CACHE_SIZE = 2048
     ROW_CACHE_SIZE = 384
+    PREFETCH_SCREENS = 2
+    PREFETCH_DELAY_MS = 30
 
     def _ensure_storage_state(self):
         if hasattr(self, "_playlist_order"):
             return
-        self._playlist_order = []
-        self._row_by_filename = {}
+        self._playlist_order = TrackOrder()
         self._playlist_metadata = {}
         self._track_metadata_cache = OrderedDict()
+        self._metadata_keys_by_name = {}
         self._row_display_cache = OrderedDict()
+        self._metadata_cache_size = self.METADATA_CACHE_SIZE
+        self._row_cache_size = self.ROW_CACHE_SIZE
+        self._song_model = SongListModel(self)
         self._playlist_load_generation = 0
-        self._population_generation = 0
         self._playlist_loaders = set()
-        self._list_fully_loaded = True
         self._pending_selection_name = None
+        self._loaded_playlist_name = None
+        self._playlist_watcher = PlaylistFolderWatcher(self)
+        self._playlist_watcher.playlist_changed.connect(
+            self._playlist_folder_changed
+        )
+        self._cover_thumbnails = CoverThumbnailCache(
+            TrackItemDelegate.COVER_SIZE, self
+        )
+        self._cover_thumbnails.thumbnail_ready.connect(
+            self._cover_thumbnail_ready
+        )
+        self._row_prefetcher = RowPrefetcher(self)
+        self._row_prefetcher.loaded.connect(self._rows_prefetched)
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(self.PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self._prefetch_visible_rows)
 
     def install_track_delegate(self):
         self._ensure_storage_state()
+        self.songs_list.setModel(self._song_model)
         self._track_delegate = TrackItemDelegate(
             self._row_display_data, self.songs_list
         )
         self.songs_list.setItemDelegate(self._track_delegate)
+        scroll_bar = self.songs_list.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._schedule_row_prefetch)
+        scroll_bar.rangeChanged.connect(self._schedule_row_prefetch)
 
     def load_playlist(self, name):
         self._ensure_storage_state()
@@ -50,22 +82,23 @@ class PlaylistStorageMixin:
         self.playlist_name.setText(str(name))
         self._order_undo_stack.clear()
         self._start_playlist_load(reset=True)
+        self._update_watched_playlists()
 
     def _start_playlist_load(self, selected_name=None, reset=False):
         self._ensure_storage_state()
         self._playlist_load_generation += 1
         generation = self._playlist_load_generation
-        self._population_generation += 1
-        self._list_fully_loaded = False
         self._pending_selection_name = selected_name
         self.songs_list.setDragEnabled(False)
         if reset:
-            self._playlist_order = []
-            self._row_by_filename = {}
+            self._loaded_playlist_name = None
+            self._set_playlist_order([])
             self._playlist_metadata = {}
             self._track_metadata_cache.clear()
+            self._metadata_keys_by_name.clear()
             self._row_display_cache.clear()
-            self.songs_list.clear()
+            self._cover_thumbnails.cancel_pending()
+            self._row_prefetcher.cancel()
         if not self.current_playlist:
             return
 
@@ -82,10 +115,9 @@ class PlaylistStorageMixin:
     def cancel_playlist_loading(self):
         self._ensure_storage_state()
         self._playlist_load_generation += 1
-        self._population_generation += 1
         for loader in tuple(self._playlist_loaders):
             loader.requestInterruption()
-        self._list_fully_loaded = True
+        self.songs_list.setDragEnabled(True)
 
     def _playlist_loader_finished(self, loader):
         self._playlist_loaders.discard(loader)
@@ -101,17 +133,17 @@ class PlaylistStorageMixin:
             return
         self._playlist_metadata = dict(metadata or {})
         self._playlist_metadata.pop("songs", None)
-        self._playlist_order = list(order)
-        self._row_by_filename = {
-            filename: row for row, filename in enumerate(self._playlist_order)
-        }
+        self._set_playlist_order(order)
+        self._loaded_playlist_name = name
         if needs_write:
             schedule_playlist_write(
                 name, self._playlist_order, self._playlist_metadata
             )
-        self._begin_population(
-            self._playlist_order, self._pending_selection_name
-        )
+        selected_row = self._row_by_filename.get(self._pending_selection_name)
+        if selected_row is not None:
+            self.songs_list.select_row(selected_row)
+        self.songs_list.setDragEnabled(True)
+        self._schedule_row_prefetch()
         playback_changed = getattr(self, "_playback_order_changed", None)
         if playback_changed is not None:
             playback_changed()
@@ -122,44 +154,7 @@ class PlaylistStorageMixin:
         updated = getattr(self, "playlist_updated", None)
         if updated is not None:
             updated.emit(name)
-
-    def _begin_population(self, order, selected_name=None):
-        self._population_generation += 1
-        generation = self._population_generation
-        self._populate_order = order
-        self._populate_offset = 0
-        self._pending_selection_name = selected_name
-        self._list_fully_loaded = False
-        self.songs_list.setDragEnabled(False)
-        self.songs_list.clear()
-        self._append_population_batch(generation)
-
-    def _append_population_batch(self, generation):
-        if (
-            generation != self._population_generation
-            or not self.current_playlist_path
-        ):
-            return
-        start = self._populate_offset
-        end = min(start + self.LOAD_BATCH_SIZE, len(self._populate_order))
-        self.songs_list.setUpdatesEnabled(False)
-        try:
-            for row in range(start, end):
-                filename = self._populate_order[row]
-                item = self._append_song_row(filename, row + 1)
-                if filename == self._pending_selection_name:
-                    self.songs_list.setCurrentItem(item)
-        finally:
-            self.songs_list.setUpdatesEnabled(True)
-        self._populate_offset = end
-        if end < len(self._populate_order):
-            QTimer.singleShot(
-                0, lambda token=generation: self._append_population_batch(token)
-            )
-            return
-        self._list_fully_loaded = True
-        self.songs_list.setDragEnabled(True)
-        self.songs_list.viewport().update()
+        self._playlist_watcher.rescan(name)
 
     def _playlist_metadata_path(self):
         return (
@@ -181,13 +176,24 @@ class PlaylistStorageMixin:
         except (OSError, ValueError):
             return {"name": self.current_playlist or "", "song_count": 0}
 
+    @property
+    def _row_by_filename(self):
+        return self._playlist_order.rows
+
+    def _set_playlist_order(self, order):
+        if not isinstance(order, TrackOrder):
+            order = TrackOrder(order)
+        self._playlist_order = order
+        self._song_model.set_order(order)
+
     def _write_song_order(self, filenames):
         self._ensure_storage_state()
-        order = filenames if isinstance(filenames, list) else list(filenames)
-        self._playlist_order = order
-        self._row_by_filename = {
-            filename: row for row, filename in enumerate(order)
-        }
+        if filenames is not self._playlist_order:
+            if not isinstance(filenames, (list, TrackOrder)):
+                filenames = list(filenames)
+            if filenames != self._playlist_order:
+                self._set_playlist_order(filenames)
+        order = self._playlist_order
         self._playlist_metadata["name"] = self.current_playlist
         self._playlist_metadata["song_count"] = len(order)
         if self.current_playlist:
@@ -211,16 +217,16 @@ class PlaylistStorageMixin:
         ]
 
     def refresh(self):
-        selected = self.songs_list.currentItem()
-        selected_name = selected.data(Qt.UserRole) if selected else None
+        selected_name = self.songs_list.current_filename()
         if not self.current_playlist_path:
-            self.songs_list.clear()
+            self._set_playlist_order([])
             return
         self._start_playlist_load(selected_name, reset=False)
 
     def register_added_tracks(self, playlist_name, paths):
         playlist_name = str(playlist_name or "")
         filenames = []
+        accepted = []
         seen = set()
         for value in paths or []:
             path = Path(value)
@@ -232,10 +238,12 @@ class PlaylistStorageMixin:
                 continue
             seen.add(path.name)
             filenames.append(path.name)
+            accepted.append(path)
         if not filenames:
             if self.current_playlist == playlist_name:
                 self.refresh()
             return []
+        update_catalog_tracks(playlist_name, accepted)
 
         playback_additions = (
             [
@@ -254,15 +262,10 @@ class PlaylistStorageMixin:
                 if filename not in self._row_by_filename
             ]
             if additions:
-                fully_loaded = self._list_fully_loaded
-                self._write_song_order(self._playlist_order + additions)
-                for filename in additions:
-                    self._invalidate_track_cache(filename)
-                if fully_loaded:
-                    for filename in additions:
-                        self.songs_list.addItem(self._new_song_item(filename))
-                else:
-                    self._begin_population(self._playlist_order)
+                self._song_model.insert_rows(
+                    len(self._playlist_order), additions
+                )
+                self._write_song_order(self._playlist_order)
             for filename in filenames:
                 self._invalidate_track_cache(filename)
             self.songs_list.viewport().update()
@@ -275,10 +278,6 @@ class PlaylistStorageMixin:
             ]
             if missing:
                 self._playback_order.extend(missing)
-                self._playback_row_by_filename = {
-                    filename: row
-                    for row, filename in enumerate(self._playback_order)
-                }
                 self.current_track_index = self._playback_row_by_filename.get(
                     self.current_track_filename, self.current_track_index
                 )
@@ -299,27 +298,98 @@ class PlaylistStorageMixin:
 
     update_songs_list = refresh
 
-    def _new_song_item(self, filename):
-        item = QListWidgetItem()
-        item.setData(Qt.UserRole, filename)
-        item.setSizeHint(QSize(0, TrackItemDelegate.ROW_HEIGHT))
-        item.setFlags(
+    def _update_watched_playlists(self):
+        self._ensure_storage_state()
+        self._playlist_watcher.set_playlists(
+            (self.current_playlist, getattr(self, "playing_playlist", None))
+        )
+
+    def _playlist_folder_changed(self, playlist_name, delta):
+        files = delta["files"]
+        if (
+            playlist_name == self.current_playlist
+            and playlist_name == self._loaded_playlist_name
+        ):
+            for old_name, new_name in delta["renamed"]:
+                if (
+                    old_name in self._row_by_filename
+                    and new_name not in self._row_by_filename
+                ):
+                    self._follow_renamed_track(
+                        playlist_name, old_name, new_name
+                    )
+                    self._replace_song_in_order(old_name, new_name)
+            removed = [
+                filename
+                for filename in self._playlist_order
+                if filename not in files
+            ]
+            if removed:
+                self._remove_songs_from_order(removed)
+            for filename in delta["updated"]:
+                self._invalidate_track_cache(filename)
+            if delta["updated"]:
+                self.songs_list.viewport().update()
+            known = self._row_by_filename
+        elif (
+            playlist_name == self.playing_playlist
+            and playlist_name != self.current_playlist
+        ):
+            for old_name, new_name in delta["renamed"]:
+                self._follow_renamed_track(playlist_name, old_name, new_name)
+            missing = [
+                filename
+                for filename in self._playback_order
+                if filename not in files
+            ]
+            if missing:
+                self._playback_order.remove(missing)
+                self.current_track_index = self._playback_row_by_filename.get(
+                    self.current_track_filename, -1
+                )
+                self._queue_order_changed()
+            known = self._playback_row_by_filename
+        else:
+            return
+
+        added = sorted(
             (
-                item.flags()
-                | Qt.ItemIsDragEnabled
-                | Qt.ItemIsSelectable
-                | Qt.ItemIsEnabled
-            )
-            & ~Qt.ItemIsDropEnabled
+                filename
+                for filename in files - delta["unsettled"]
+                if filename not in known
+            ),
+            key=str.casefold,
         )
-        return item
+        if added:
+            folder = PLAYLISTS_PATH / playlist_name / "songs"
+            self.register_added_tracks(
+                playlist_name, [folder / filename for filename in added]
+            )
 
-    def _append_song_row(
-        self, filename, _index, _title=None, _artist=None, _cover_pixmap=None
-    ):
-        item = self._new_song_item(filename)
-        self.songs_list.addItem(item)
-        return item
+    def stop_playlist_watcher(self):
+        self._ensure_storage_state()
+        self._playlist_watcher.close()
+
+    def stop_row_loaders(self):
+        self._ensure_storage_state()
+        self._prefetch_timer.stop()
+        self._row_prefetcher.close()
+        self._cover_thumbnails.close()
+
+    def _follow_renamed_track(self, playlist_name, old_name, new_name):
+        if (
+            playlist_name != self.playing_playlist
+            or self.current_track_filename != old_name
+        ):
+            return
+        self.current_track_filename = new_name
+        if self.current_track_path is not None:
+            self.current_track_path = Path(self.current_track_path).with_name(
+                new_name
+            )
+        row = self._playback_row_by_filename.get(old_name)
+        if row is not None:
+            self._playback_order.replace(row, new_name)
 
     def _songs_reordered(self, before, after):
         if before == after:
@@ -334,8 +404,7 @@ class PlaylistStorageMixin:
         if not self._order_undo_stack:
             return
         previous = self._order_undo_stack.pop()
-        if not self.songs_list.apply_order(previous):
-            self._begin_population(previous)
+        self.songs_list.apply_order(previous)
         self._write_song_order(list(previous))
         self._sync_current_track_index()
         self.songs_list.viewport().update()
@@ -352,14 +421,10 @@ class PlaylistStorageMixin:
         row = self._row_by_filename.get(old_name)
         if row is None:
             return
-        order = list(self._playlist_order)
-        order[row] = new_name
-        if row < self.songs_list.count():
-            self.songs_list.item(row).setData(Qt.UserRole, new_name)
+        self._song_model.replace_row(row, new_name)
         self._invalidate_track_cache(old_name)
         self._invalidate_track_cache(new_name)
-        self._write_song_order(order)
-        self.songs_list.viewport().update()
+        self._write_song_order(self._playlist_order)
 
     def _insert_songs_after(self, pairs):
         pairs = [(str(source), str(new)) for source, new in pairs]
@@ -369,30 +434,18 @@ class PlaylistStorageMixin:
         for source, new_name in pairs:
             insertions.setdefault(source, []).append(new_name)
 
-        order = []
-        inserted = set()
-        for filename in self._playlist_order:
-            order.append(filename)
-            for new_name in insertions.get(filename, []):
-                if new_name not in inserted:
-                    order.append(new_name)
-                    inserted.add(new_name)
-        for _source, new_name in pairs:
-            if new_name not in inserted:
-                order.append(new_name)
-                inserted.add(new_name)
-
-        was_fully_loaded = self._list_fully_loaded
-        self._write_song_order(order)
-        if not was_fully_loaded:
-            self._begin_population(order)
-            return
-        for _source, new_name in sorted(
-            pairs, key=lambda pair: self._row_by_filename[pair[1]]
-        ):
-            row = self._row_by_filename[new_name]
-            self.songs_list.insertItem(row, self._new_song_item(new_name))
-        self.songs_list.viewport().update()
+        for source, new_names in insertions.items():
+            new_names = [
+                new_name
+                for new_name in dict.fromkeys(new_names)
+                if new_name not in self._row_by_filename
+            ]
+            row = self._row_by_filename.get(source)
+            self._song_model.insert_rows(
+                len(self._playlist_order) if row is None else row + 1,
+                new_names,
+            )
+        self._write_song_order(self._playlist_order)
 
     def _insert_song_after(self, source_name, new_name):
         self._insert_songs_after([(source_name, new_name)])
@@ -401,28 +454,14 @@ class PlaylistStorageMixin:
         removed = {str(filename) for filename in filenames}
         if not removed:
             return
-        old_rows = sorted(
-            (
-                self._row_by_filename[name]
-                for name in removed
-                if name in self._row_by_filename
-            ),
-            reverse=True,
+        self._song_model.remove_rows(
+            self._row_by_filename[name]
+            for name in removed
+            if name in self._row_by_filename
         )
-        order = [
-            filename
-            for filename in self._playlist_order
-            if filename not in removed
-        ]
-        was_fully_loaded = self._list_fully_loaded
-        if was_fully_loaded:
-            for row in old_rows:
-                self.songs_list.takeItem(row)
-        self._write_song_order(order)
+        self._write_song_order(self._playlist_order)
         for filename in removed:
             self._invalidate_track_cache(filename)
-        if not was_fully_loaded:
-            self._begin_population(order)
         self._sync_current_track_index()
         self.songs_list.viewport().update()
 
@@ -433,99 +472,123 @@ class PlaylistStorageMixin:
         if not filename:
             return
         key = str(filename)
-        for cached_key in list(self._track_metadata_cache):
-            if cached_key == key or Path(cached_key).name == key:
-                self._track_metadata_cache.pop(cached_key, None)
+        for cached_key in self._metadata_keys_by_name.pop(key, ()):
+            self._track_metadata_cache.pop(cached_key, None)
+        self._track_metadata_cache.pop(key, None)
         self._row_display_cache.pop(key, None)
+        if self.current_playlist_path:
+            self._cover_thumbnails.invalidate(self.current_playlist_path / key)
+        self._row_prefetcher.cancel()
 
     def _metadata(self, file):
         self._ensure_storage_state()
-        file = Path(file)
-        try:
-            cache_key = str(file.resolve())
-        except OSError:
-            cache_key = str(file)
+        cache_key = track_metadata_key(file)
         cached = self._track_metadata_cache.get(cache_key)
         if cached is not None:
             self._track_metadata_cache.move_to_end(cache_key)
             return cached
+        result = read_track_metadata(file)
+        self._cache_track_metadata(cache_key, result)
+        return result
 
-        data = {}
-        try:
-            sidecar = file.with_suffix(".json")
-            if sidecar.exists():
-                value = json.loads(sidecar.read_text(encoding="utf-8"))
-                if isinstance(value, dict):
-                    data = value
-        except (OSError, ValueError):
-            pass
-        title, artist = data.get("title"), data.get("artist")
-        if (not title or not artist) and " - " in file.stem:
-            parsed_artist, parsed_title = file.stem.split(" - ", 1)
-            title = title or parsed_title
-            artist = artist or parsed_artist
-        result = (title or file.stem, artist or "Unknown Artist", data)
+    def _cache_track_metadata(self, cache_key, result):
         self._track_metadata_cache[cache_key] = result
         self._track_metadata_cache.move_to_end(cache_key)
-        while len(self._track_metadata_cache) > self.METADATA_CACHE_SIZE:
-            self._track_metadata_cache.popitem(last=False)
-        return result
+        self._metadata_keys_by_name.setdefault(
+            os.path.basename(cache_key), set()
+        ).add(cache_key)
+        while len(self._track_metadata_cache) > self._metadata_cache_size:
+            evicted, _result = self._track_metadata_cache.popitem(last=False)
+            name = os.path.basename(evicted)
+            keys = self._metadata_keys_by_name.get(name)
+            if keys is not None:
+                keys.discard(evicted)
+                if not keys:
+                    del self._metadata_keys_by_name[name]
+
+    def _cache_row_display(self, filename, title, artist):
+        self._row_display_cache[filename] = (title, artist)
+        self._row_display_cache.move_to_end(filename)
+        while len(self._row_display_cache) > self._row_cache_size:
+            self._row_display_cache.popitem(last=False)
 
     @staticmethod
     def _cover_path(file):
-        for extension in (".jpg", ".jpeg", ".png", ".webp"):
-            path = Path(file).with_suffix(extension)
-            if path.exists():
-                return path
-        return None
-
-    @classmethod
-    def _cover_thumbnail(cls, file):
-        path = cls._cover_path(file)
-        if path is None:
-            return None
-        reader = QImageReader(str(path))
-        source_size = reader.size()
-        target = TrackItemDelegate.COVER_SIZE
-        if source_size.isValid() and (
-            source_size.width() > target or source_size.height() > target
-        ):
-            reader.setScaledSize(source_size.scaled(
-                target, target, Qt.KeepAspectRatio
-            ))
-        image = reader.read()
-        if image.isNull():
-            return None
-        source = QPixmap.fromImage(image)
-        source = source.scaled(
-            target, target, Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        output = QPixmap(target, target)
-        output.fill(Qt.transparent)
-        painter = QPainter(output)
-        painter.drawPixmap(
-            (target - source.width()) // 2,
-            (target - source.height()) // 2,
-            source,
-        )
-        painter.end()
-        return output
+        return find_cover_path(file)
 
     def _row_display_data(self, filename):
         self._ensure_storage_state()
         filename = str(filename or "")
+        path = self.current_playlist_path / filename
         cached = self._row_display_cache.get(filename)
         if cached is not None:
             self._row_display_cache.move_to_end(filename)
-            return cached
-        path = self.current_playlist_path / filename
-        title, artist, _data = self._metadata(path)
-        result = (title, artist, self._cover_thumbnail(path))
-        self._row_display_cache[filename] = result
-        self._row_display_cache.move_to_end(filename)
-        while len(self._row_display_cache) > self.ROW_CACHE_SIZE:
-            self._row_display_cache.popitem(last=False)
-        return result
+            title, artist = cached
+        else:
+            title, artist, _data = self._metadata(path)
+            self._cache_row_display(filename, title, artist)
+        return title, artist, self._cover_thumbnails.thumbnail(path)
+
+    def _schedule_row_prefetch(self, *_args):
+        if not self._prefetch_timer.isActive():
+            self._prefetch_timer.start()
+
+    def _resize_row_caches(self, visible_rows):
+        window = visible_rows * (2 * self.PREFETCH_SCREENS + 1)
+        self._row_cache_size = max(self.ROW_CACHE_SIZE, window * 2)
+        self._metadata_cache_size = max(
+            self.METADATA_CACHE_SIZE, self._row_cache_size * 2
+        )
+        self._cover_thumbnails.resize(self._row_cache_size)
+
+    def _prefetch_visible_rows(self):
+        count = len(self._playlist_order)
+        if not count or not self.current_playlist_path:
+            return
+        viewport = self.songs_list.viewport()
+        first = self.songs_list.indexAt(QPoint(0, 0)).row()
+        first = max(0, first)
+        visible = max(1, viewport.height() // TrackItemDelegate.ROW_HEIGHT + 1)
+        self._resize_row_caches(visible)
+        span = visible * self.PREFETCH_SCREENS
+        rows = [
+            *range(first, min(count, first + visible + span)),
+            *range(first - 1, max(-1, first - span - 1), -1),
+        ]
+        self._cover_thumbnails.cancel_pending()
+        paths = []
+        for row in rows:
+            filename = self._playlist_order[row]
+            path = self.current_playlist_path / filename
+            self._cover_thumbnails.request(path)
+            if filename not in self._row_display_cache:
+                paths.append(path)
+        self._row_prefetcher.prefetch(paths)
+
+    def _rows_prefetched(self, generation, results):
+        if generation != self._row_prefetcher.generation:
+            return
+        for path, cache_key, result in results:
+            path = Path(path)
+            if cache_key not in self._track_metadata_cache:
+                self._cache_track_metadata(cache_key, result)
+            if (
+                self.current_playlist_path
+                and path.parent == self.current_playlist_path
+                and path.name not in self._row_display_cache
+            ):
+                self._cache_row_display(path.name, result[0], result[1])
+
+    def _cover_thumbnail_ready(self, key):
+        path = Path(key)
+        if (
+            not self.current_playlist_path
+            or path.parent != self.current_playlist_path
+        ):
+            return
+        row = self._row_by_filename.get(path.name)
+        if row is not None:
+            self.songs_list.refresh_row(row)
 
     @classmethod
     def _cover(cls, file):
@@ -568,10 +631,12 @@ class PlaylistStorageMixin:
     def forget_playlist(self, name):
         cancel_playlist_writes(str(name))
 
-    def play_song(self, item):
-        filename = item.data(Qt.UserRole)
+    def play_song(self, index):
+        filename = index.data(Qt.UserRole)
+        if not filename:
+            return
         self.play_file(
             self.current_playlist_path / filename,
             filename,
-            self._row_by_filename.get(filename, self.songs_list.row(item)),
+            self._row_by_filename.get(filename, index.row()),
         )
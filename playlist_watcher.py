@@ -0,0 +1,227 @@
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QThread, QTimer, Signal
+
+from config import PLAYLISTS_PATH
+from library_catalog import scan_songs_folder
+
+
+def playlist_delta(previous, current, settle_seconds=0.0, now=None):
+    audio, sidecars, covers = current
+    files = set(audio)
+    now = time.time() if now is None else now
+    unsettled = {
+        filename
+        for filename, (_path, _size, mtime) in audio.items()
+        if now - mtime < settle_seconds
+    }
+    delta = {
+        "files": files,
+        "unsettled": unsettled,
+        "added": [],
+        "removed": [],
+        "renamed": [],
+        "updated": [],
+    }
+    if previous is None:
+        return delta
+    old_audio, old_sidecars, old_covers = previous
+    added = sorted(files - set(old_audio), key=str.casefold)
+    removed = sorted(set(old_audio) - files, key=str.casefold)
+
+    removed_by_identity = {}
+    for filename in removed:
+        _path, size, mtime = old_audio[filename]
+        removed_by_identity.setdefault((size, mtime), []).append(filename)
+    renamed = []
+    for filename in added:
+        _path, size, mtime = audio[filename]
+        matches = removed_by_identity.get((size, mtime))
+        if matches:
+            renamed.append((matches.pop(0), filename))
+    renamed_old = {old for old, _new in renamed}
+    renamed_new = {new for _old, new in renamed}
+
+    updated = []
+    for filename in sorted(files & set(old_audio), key=str.casefold):
+        stem = Path(filename).stem
+        if (
+            sidecars.get(stem) != old_sidecars.get(stem)
+            or covers.get(stem) != old_covers.get(stem)
+            or audio[filename][1:] != old_audio[filename][1:]
+        ):
+            updated.append(filename)
+
+    delta["added"] = [name for name in added if name not in renamed_new]
+    delta["removed"] = [name for name in removed if name not in renamed_old]
+    delta["renamed"] = renamed
+    delta["updated"] = updated
+    return delta
+
+
+class _SongsFolderScanner(QThread):
+    scanned = Signal(str, object)
+
+    def __init__(self, name, songs_path, parent=None):
+        super().__init__(parent)
+        self.name = str(name)
+        self.songs_path = Path(songs_path)
+
+    def run(self):
+        if not self.songs_path.is_dir():
+            self.scanned.emit(self.name, None)
+            return
+        try:
+            result = scan_songs_folder(
+                self.songs_path, self.isInterruptionRequested
+            )
+        except OSError:
+            result = ({}, {}, {})
+        if result is None or self.isInterruptionRequested():
+            return
+        self.scanned.emit(self.name, result)
+
+
+class PlaylistFolderWatcher(QObject):
+    """Watch playlist songs folders and report per-playlist deltas.
+
+    Directory notifications are debounced and coalesced, then the folder is
+    rescanned off the GUI thread and compared with the previous listing.
+    Renames are recognised by matching size and mtime, and files that are
+    still being written are reported as unsettled and rechecked later.
+    """
+
+    playlist_changed = Signal(str, object)
+
+    DEBOUNCE_MS = 300
+    MAX_DELAY_MS = 2000
+    SETTLE_SECONDS = 1.5
+
+    def __init__(self, parent=None, playlists_path=None):
+        super().__init__(parent)
+        self.playlists_path = Path(playlists_path or PLAYLISTS_PATH)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._directory_changed)
+        self._folders = {}
+        self._names_by_folder = {}
+        self._snapshots = {}
+        self._dirty = set()
+        self._dirty_since = None
+        self._scanners = {}
+        self._rescan_after_scan = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._flush)
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.timeout.connect(self._recheck_unsettled)
+        self._unsettled = set()
+
+    def set_playlists(self, names):
+        names = {str(name) for name in names if name}
+        for name in set(self._folders) - names:
+            self._unwatch(name)
+        for name in names - set(self._folders):
+            self._watch(name)
+
+    def rescan(self, name):
+        name = str(name)
+        if name not in self._folders:
+            return
+        self._dirty.add(name)
+        self._schedule()
+
+    def close(self):
+        self._timer.stop()
+        self._settle_timer.stop()
+        for name in tuple(self._folders):
+            self._unwatch(name)
+        for scanner in tuple(self._scanners.values()):
+            scanner.requestInterruption()
+            scanner.wait(1000)
+
+    def _watch(self, name):
+        folder = self.playlists_path / name / "songs"
+        if not folder.is_dir() or not self._watcher.addPath(str(folder)):
+            return
+        self._folders[name] = str(folder)
+        self._names_by_folder[str(folder)] = name
+        self.rescan(name)
+
+    def _unwatch(self, name):
+        folder = self._folders.pop(name, None)
+        if folder is not None:
+            self._names_by_folder.pop(folder, None)
+            self._watcher.removePath(folder)
+        self._snapshots.pop(name, None)
+        self._dirty.discard(name)
+        self._unsettled.discard(name)
+        self._rescan_after_scan.discard(name)
+        scanner = self._scanners.get(name)
+        if scanner is not None:
+            scanner.requestInterruption()
+
+    def _directory_changed(self, folder):
+        name = self._names_by_folder.get(str(folder))
+        if name is None:
+            return
+        if not Path(folder).is_dir():
+            self._unwatch(name)
+            return
+        self.rescan(name)
+
+    def _schedule(self):
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        waited_ms = (now - self._dirty_since) * 1000
+        self._timer.start(
+            max(0, min(self.DEBOUNCE_MS, self.MAX_DELAY_MS - waited_ms))
+        )
+
+    def _flush(self):
+        self._dirty_since = None
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            folder = self._folders.get(name)
+            if folder is None:
+                continue
+            if name in self._scanners:
+                self._rescan_after_scan.add(name)
+                continue
+            scanner = _SongsFolderScanner(name, folder, self)
+            self._scanners[name] = scanner
+            scanner.scanned.connect(self._scanned)
+            scanner.finished.connect(
+                lambda current=scanner: self._scanner_finished(current)
+            )
+            scanner.start()
+
+    def _scanner_finished(self, scanner):
+        if self._scanners.get(scanner.name) is scanner:
+            self._scanners.pop(scanner.name, None)
+        scanner.deleteLater()
+        if scanner.name in self._rescan_after_scan:
+            self._rescan_after_scan.discard(scanner.name)
+            self.rescan(scanner.name)
+
+    def _scanned(self, name, result):
+        if name not in self._folders:
+            return
+        if result is None:
+            self._unwatch(name)
+            return
+        previous = self._snapshots.get(name)
+        self._snapshots[name] = result
+        delta = playlist_delta(previous, result, self.SETTLE_SECONDS)
+        if delta["unsettled"]:
+            self._unsettled.add(name)
+            self._settle_timer.start(round(self.SETTLE_SECONDS * 1000))
+        else:
+            self._unsettled.discard(name)
+        self.playlist_changed.emit(name, delta)
+
+    def _recheck_unsettled(self):
+        for name in tuple(self._unsettled):
+            self.rescan(name)
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+from config import PREVIEW_CACHE_LIMIT, PREVIEW_CACHE_PATH
+
+PREVIEW_STREAM_TTL = 30 * 60
+PREVIEW_STREAM_MARGIN = 60
+PREVIEW_INDEX_SAVE_INTERVAL = 60
+
+
+def _stream_expiry(url, now):
+    """Return when a resolved CDN URL stops working, from its signature."""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    for key in ("expire", "Expires", "expires"):
+        try:
+            value = float(query[key][0])
+        except (KeyError, IndexError, ValueError):
+            continue
+        if value > now:
+            return value - PREVIEW_STREAM_MARGIN
+    return now + PREVIEW_STREAM_TTL
+
+
+class PreviewCache:
+    """Size-bounded LRU of resolved preview streams and their bytes on disk.
+
+    Entries are keyed by the catalogue page URL. Each one remembers the
+    resolved stream URL until it expires, and the bytes downloaded so far,
+    so a preview that is played again starts from disk and only fetches what
+    is missing. Complete files can be handed to the track downloader.
+    """
+
+    def __init__(self, path, limit):
+        self.path = Path(path)
+        self.limit = int(limit)
+        self._lock = threading.Lock()
+        self._entries = None
+        self._saved = 0.0
+
+    def _key(self, page_url):
+        return hashlib.sha1(
+            str(page_url or "").strip().encode("utf-8", "surrogatepass")
+        ).hexdigest()
+
+    def _index(self):
+        if self._entries is None:
+            try:
+                entries = json.loads(
+                    (self.path / "index.json").read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                entries = {}
+            self._entries = entries if isinstance(entries, dict) else {}
+        return self._entries
+
+    def _save(self):
+        self._saved = time.monotonic()
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            temporary = self.path / "index.json.tmp"
+            temporary.write_text(json.dumps(self._entries), encoding="utf-8")
+            temporary.replace(self.path / "index.json")
+        except OSError as exc:
+            print(f"[Preview cache] Could not save index: {exc}")
+
+    def _file(self, key, entry):
+        extension = str(entry.get("extension") or "audio")
+        return self.path / f"{key}.{extension}"
+
+    def stream(self, page_url):
+        """Return the cached stream details for ``page_url`` if still valid."""
+        with self._lock:
+            entry = self._index().get(self._key(page_url))
+            if (
+                entry is None
+                or not entry.get("url")
+                or float(entry.get("expires") or 0) <= time.time()
+            ):
+                return None
+            return {
+                "url": entry["url"],
+                "headers": dict(entry.get("headers") or {}),
+                "extension": entry.get("extension") or "",
+            }
+
+    def store_stream(self, page_url, details):
+        key = self._key(page_url)
+        now = time.time()
+        with self._lock:
+            entries = self._index()
+            entry = entries.get(key) or {}
+            extension = str(details.get("extension") or "")
+            if entry.get("extension", extension) != extension:
+                self._file(key, entry).unlink(missing_ok=True)
+                entry = {}
+            entry.update({
+                "page_url": str(page_url),
+                "url": str(details.get("url") or ""),
+                "headers": dict(details.get("headers") or {}),
+                "extension": extension,
+                "expires": _stream_expiry(str(details.get("url") or ""), now),
+                "used": now,
+            })
+            entries[key] = entry
+            self._trim(keep=key)
+            self._save()
+
+    def audio(self, page_url):
+        """Return ``(path, cached_bytes, total_size, content_type)`` or None.
+
+        The preview is complete when ``cached_bytes == total_size``; partial
+        entries keep the size the CDN reported so the rest can be requested
+        as a range.
+        """
+        key = self._key(page_url)
+        with self._lock:
+            entry = self._index().get(key)
+            if entry is None or not entry.get("bytes"):
+                return None
+            path = self._file(key, entry)
+            try:
+                on_disk = path.stat().st_size
+            except OSError:
+                on_disk = -1
+            if on_disk != int(entry["bytes"]):
+                entry["bytes"] = 0
+                self._save()
+                return None
+            entry["used"] = time.time()
+            if time.monotonic() - self._saved >= PREVIEW_INDEX_SAVE_INTERVAL:
+                self._save()
+            return (
+                path,
+                int(entry["bytes"]),
+                entry.get("total"),
+                entry.get("content_type") or "",
+            )
+
+    def complete_file(self, page_url):
+        cached = self.audio(page_url)
+        if cached is None or cached[2] is None or cached[1] != cached[2]:
+            return None
+        return cached[0]
+
+    def store_audio(self, page_url, data, total_size, content_type=""):
+        """Keep ``data`` (the first bytes of the preview) for ``page_url``."""
+        key = self._key(page_url)
+        size = len(data)
+        if not size or size > self.limit:
+            return
+        with self._lock:
+            entries = self._index()
+            entry = entries.get(key)
+            if entry is None or size <= int(entry.get("bytes") or 0):
+                return
+            path = self._file(key, entry)
+            temporary = path.with_name(f"{path.name}.tmp")
+            try:
+                self.path.mkdir(parents=True, exist_ok=True)
+                with temporary.open("wb") as output:
+                    output.write(data)
+                temporary.replace(path)
+            except OSError as exc:
+                temporary.unlink(missing_ok=True)
+                print(f"[Preview cache] Could not store preview: {exc}")
+                return
+            entry.update({
+                "bytes": size,
+                "total": int(total_size) if total_size else None,
+                "content_type": str(content_type or ""),
+                "used": time.time(),
+            })
+            self._trim(keep=key)
+            self._save()
+
+    def _trim(self, keep=None):
+        entries = self._entries
+        now = time.time()
+        used = sum(int(entry.get("bytes") or 0) for entry in entries.values())
+        for key, entry in sorted(
+            entries.items(), key=lambda item: float(item[1].get("used") or 0)
+        ):
+            stale = (
+                not entry.get("bytes")
+                and float(entry.get("expires") or 0) <= now
+            )
+            if key == keep or (used <= self.limit and not stale):
+                continue
+            used -= int(entry.get("bytes") or 0)
+            self._file(key, entry).unlink(missing_ok=True)
+            del entries[key]
+
+
+_PREVIEW_CACHE = PreviewCache(PREVIEW_CACHE_PATH, PREVIEW_CACHE_LIMIT)
+
+
+def preview_cache():
+    return _PREVIEW_CACHE
@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PySide6.QtCore import QObject, Signal
+
+
+def track_metadata_key(file):
+    file = Path(file)
+    try:
+        return str(file.resolve())
+    except OSError:
+        return str(file)
+
+
+def read_track_metadata(file):
+    file = Path(file)
+    data = {}
+    try:
+        sidecar = file.with_suffix(".json")
+        if sidecar.exists():
+            value = json.loads(sidecar.read_text(encoding="utf-8"))
+            if isinstance(value, dict):
+                data = value
+    except (OSError, ValueError):
+        pass
+    title, artist = data.get("title"), data.get("artist")
+    if (not title or not artist) and " - " in file.stem:
+        parsed_artist, parsed_title = file.stem.split(" - ", 1)
+        title = title or parsed_title
+        artist = artist or parsed_artist
+    return title or file.stem, artist or "Unknown Artist", data
+
+
+class RowPrefetcher(QObject):
+    """Read track sidecars for rows around the viewport on a worker thread.
+
+    Each ``prefetch`` call supersedes the previous one, so a fast scroll only
+    finishes the batch for where the list ended up.
+    """
+
+    loaded = Signal(int, object)
+
+    BATCH_SIZE = 32
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="row-prefetch"
+        )
+        self._generation = 0
+        self._closed = False
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def prefetch(self, paths):
+        self._generation += 1
+        if paths and not self._closed:
+            self._executor.submit(self._read, self._generation, list(paths))
+        return self._generation
+
+    def cancel(self):
+        self._generation += 1
+
+    def close(self):
+        self._closed = True
+        self._generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read(self, generation, paths):
+        batch = []
+        for path in paths:
+            if generation != self._generation:
+                return
+            batch.append(
+                (str(path), track_metadata_key(path), read_track_metadata(path))
+            )
+            if len(batch) >= self.BATCH_SIZE:
+                self.loaded.emit(generation, batch)
+                batch = []
+        if batch and generation == self._generation:
+            self.loaded.emit(generation, batch)
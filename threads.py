@@ -5,8 +5,8 @@ from lyrics_service import (
     GeniusLyricsParser, cache_lyrics, read_cached_lyrics,
 )
 from track_workers import (
-    DemoStreamResolver, RecommendationFetcher, SearchWorker, TrackMetaFetcher,
-    fetch_track_metadata,
+    DemoStreamResolver, PreviewPrefetcher, RecommendationFetcher, SearchWorker,
+    TrackMetaFetcher, fetch_track_metadata,
 )
 from worker_http import ParallelDownloadError
 
@@ -15,6 +15,7 @@ __all__ = [
     "DemoStreamResolver",
     "GeniusLyricsParser",
     "ParallelDownloadError",
+    "PreviewPrefetcher",
     "RecommendationFetcher",
     "SearchWorker",
     "TrackMetaFetcher",
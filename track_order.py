@@ -0,0 +1,139 @@
+class TrackOrder:
+    """Ordered track filenames with filename -> row lookups.
+
+    Edits only mark the index stale from the first row they touch. Lookups
+    repair it forward from there as far as they need, so a burst of edits
+    costs one partial pass instead of a full rebuild after each edit.
+    """
+
+    __slots__ = ("_items", "_rows", "_valid", "rows")
+
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._rows = {filename: row for row, filename in enumerate(self._items)}
+        self._valid = len(self._items)
+        self.rows = _RowIndex(self)
+
+    def copy(self):
+        order = TrackOrder.__new__(TrackOrder)
+        order._items = self._items.copy()
+        order._rows = self._rows.copy()
+        order._valid = self._valid
+        order.rows = _RowIndex(order)
+        return order
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, row):
+        return self._items[row]
+
+    def __contains__(self, filename):
+        return filename in self._rows
+
+    def __eq__(self, other):
+        if isinstance(other, TrackOrder):
+            return self._items == other._items
+        if isinstance(other, list):
+            return self._items == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def row(self, filename, default=None):
+        row = self._rows.get(filename)
+        if row is None:
+            return default
+        if row < self._valid and self._items[row] == filename:
+            return row
+        try:
+            found = self._items.index(filename, self._valid)
+        except ValueError:
+            return default
+        self._repair(found + 1)
+        return found
+
+    def insert(self, row, filenames):
+        filenames = list(filenames)
+        if not filenames:
+            return
+        row = max(0, min(row, len(self._items)))
+        self._items[row:row] = filenames
+        self._valid = min(self._valid, row)
+        for filename in filenames:
+            self._rows[filename] = row
+
+    def replace(self, row, filename):
+        self._repair(row + 1)
+        previous = self._items[row]
+        self._items[row] = filename
+        if previous != filename and self._rows.get(previous) == row:
+            del self._rows[previous]
+        self._rows[filename] = row
+
+    def permute(self, rows, filenames):
+        for row, filename in zip(rows, filenames):
+            self._items[row] = filename
+            self._rows[filename] = row
+
+    def extend(self, filenames):
+        self.insert(len(self._items), filenames)
+
+    def move(self, source_row, target_row):
+        if source_row == target_row:
+            return
+        self._items.insert(target_row, self._items.pop(source_row))
+        self._valid = min(self._valid, source_row, target_row)
+
+    def remove_range(self, first, last):
+        removed = self._items[first:last + 1]
+        del self._items[first:last + 1]
+        self._valid = min(self._valid, first)
+        for filename in removed:
+            self._rows.pop(filename, None)
+        return removed
+
+    def remove(self, filenames):
+        rows = sorted(
+            {
+                row
+                for row in (self.row(filename) for filename in filenames)
+                if row is not None
+            },
+            reverse=True,
+        )
+        for row in rows:
+            self.remove_range(row, row)
+        return len(rows)
+
+    def _repair(self, stop):
+        items = self._items
+        rows = self._rows
+        for row in range(self._valid, min(stop, len(items))):
+            rows[items[row]] = row
+        self._valid = max(self._valid, min(stop, len(items)))
+
+
+class _RowIndex:
+    __slots__ = ("_order",)
+
+    def __init__(self, order):
+        self._order = order
+
+    def get(self, filename, default=None):
+        return self._order.row(filename, default)
+
+    def __getitem__(self, filename):
+        row = self._order.row(filename)
+        if row is None:
+            raise KeyError(filename)
+        return row
+
+    def __contains__(self, filename):
+        return filename in self._order
+
+    def __len__(self):
+        return len(self._order)
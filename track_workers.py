@@ -3,22 +3,23 @@
 import json
 import os
 import random
-import tempfile
 import threading
 import time
 import urllib.request
-import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from PySide6.QtCore import QThread, Signal
 
-from config import PLAYLISTS_PATH, genius_credentials_ready
+from config import PREVIEW_BUFFER_PATH, genius_credentials_ready
+from library_catalog import library_catalog, update_catalog_tracks
 from lyrics_service import (
     _download_bytes, _find_genius_song, _genius_json, _lyrics_from_html,
     _normalize, _read_identity, _request, cache_lyrics, read_cached_lyrics,
 )
+from media_server import MediaSource, media_server
+from network_protocol import _TrackBuffer
+from preview_cache import preview_cache
 from worker_http import HTTP_POOL_SIZE
 
 
@@ -78,35 +79,94 @@ def _preview_stream_details(info):
     return max(candidates, key=lambda candidate: candidate[:-1])[-1]
 
 
-class _ChunkedPreviewHTTPServer(ThreadingHTTPServer):
-    daemon_threads = True
-    allow_reuse_address = True
+def _extract_preview_stream(page_url):
+    import yt_dlp
+
+    options = {
+        "quiet": True,
+        "no_warnings": True,
+        "skip_download": True,
+        "noplaylist": True,
+        # Prefer progressive AAC/M4A because its headers are usually
+        # available at the beginning and start quickly on Windows.
+        "format": "bestaudio[ext=m4a][protocol^=http]/"
+                  "bestaudio[protocol^=http]/bestaudio/best",
+    }
+    if os.name == "nt":
+        options["windows_creation_flags"] = 0x08000000
+
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(page_url, download=False) or {}
 
+    entries = info.get("entries") or []
+    if entries and isinstance(entries[0], dict):
+        info = entries[0]
+    details = _preview_stream_details(info)
+    if not details:
+        raise RuntimeError("No playable audio stream was returned")
+    return details
 
-class ChunkedDemoBuffer:
-    """Progressively download audio and expose it through a local HTTP stream.
+
+_PREVIEW_RESOLVING = {}
+_PREVIEW_RESOLVING_LOCK = threading.Lock()
+
+
+def resolve_preview_stream(page_url):
+    """Return stream details for ``page_url``, resolving it at most once.
+
+    Valid cached details are returned straight away. Otherwise a caller that
+    finds the same page already being resolved, e.g. by the speculative
+    prefetcher, waits for that result instead of starting yt-dlp again.
+    """
+    cache = preview_cache()
+    details = cache.stream(page_url)
+    if details is not None:
+        return details
+    with _PREVIEW_RESOLVING_LOCK:
+        pending = _PREVIEW_RESOLVING.get(page_url)
+        owner = pending is None
+        if owner:
+            pending = _PREVIEW_RESOLVING[page_url] = Future()
+    if not owner:
+        return pending.result()
+    try:
+        details = _extract_preview_stream(page_url)
+        cache.store_stream(page_url, details)
+        pending.set_result(details)
+        return details
+    except Exception as exc:
+        pending.set_exception(exc)
+        raise
+    finally:
+        with _PREVIEW_RESOLVING_LOCK:
+            _PREVIEW_RESOLVING.pop(page_url, None)
+
+
+class ChunkedDemoBuffer(MediaSource):
+    """Progressively download audio and serve it from the local media server.
 
     A small prefix is buffered before QMediaPlayer receives the local URL. The
-    rest of the track is downloaded in 64 KiB chunks while the player reads the
-    growing temporary file. Range requests are supported because Windows media
-    backends commonly probe different parts of a stream before playback.
+    rest of the track is downloaded in 64 KiB chunks into memory while the
+    player reads it. When the length is known up front the buffer is
+    preallocated, and large previews spill to a memory-mapped temp file.
+
+    With a ``cache_key`` the bytes are kept in the preview cache when the
+    buffer stops, and a later buffer for the same page starts from them,
+    requesting only the missing tail from the CDN. Without a ``stream_url``
+    the stream is resolved from ``cache_key`` when the cache falls short.
     """
 
     CHUNK_SIZE = 64 * 1024
     START_BUFFER_BYTES = 128 * 1024
     START_BUFFER_TIMEOUT = 2.5
 
-    def __init__(self, stream_url, headers=None, extension=""):
+    def __init__(self, stream_url, headers=None, extension="", cache_key=""):
+        super().__init__()
         self.stream_url = str(stream_url or "").strip()
         self.headers = dict(headers or {})
-        suffix = f".{extension}" if extension else ".audio"
-        handle = tempfile.NamedTemporaryFile(
-            prefix="cloudplayer_demo_", suffix=suffix, delete=False
-        )
-        self.path = Path(handle.name)
-        handle.close()
-
-        self.token = uuid.uuid4().hex
+        self.extension = str(extension or "")
+        self.cache_key = str(cache_key or "")
+        self._cached_bytes = 0
         self.condition = threading.Condition()
         self.downloaded = 0
         self.total_size = None
@@ -114,12 +174,38 @@ class ChunkedDemoBuffer:
         self.done = False
         self.stopped = False
         self.error = ""
+        self._buffer = None
+        self._data = bytearray()
         self._response = None
         self._download_thread = None
-        self._server = None
-        self._server_thread = None
         self.local_url = ""
 
+    @property
+    def size(self):
+        if self._buffer is not None or self.done:
+            return self.total_size
+        return None
+
+    @property
+    def available(self):
+        return self.downloaded
+
+    @property
+    def finished(self):
+        return self.done or self.stopped
+
+    @property
+    def failed(self):
+        return self.stopped or bool(self.error)
+
+    def view(self, start, stop):
+        if self.stopped:
+            return None
+        if self._buffer is not None:
+            return self._buffer.view(start, stop)
+        with self.condition:
+            return bytes(self._data[start:stop])
+
     def start(self):
         self._download_thread = threading.Thread(
             target=self._download_loop,
@@ -144,60 +230,124 @@ class ChunkedDemoBuffer:
             if self.error and self.downloaded == 0:
                 raise RuntimeError(self.error)
 
-        owner = self
-
-        class Handler(BaseHTTPRequestHandler):
-            protocol_version = "HTTP/1.1"
-
-            def log_message(self, _format, *_args):
-                return
-
-            def do_HEAD(self):
-                owner._serve(self, send_body=False)
+        suffix = f".{self.extension}" if self.extension else ".audio"
+        self.local_url = media_server().register(self, f"demo{suffix}")
+        return self.local_url
 
-            def do_GET(self):
-                owner._serve(self, send_body=True)
+    def _load_cached(self):
+        cached = preview_cache().audio(self.cache_key)
+        if cached is None or not cached[2]:
+            return
+        path, cached_bytes, total_size, content_type = cached
+        buffer = _TrackBuffer(total_size, directory=PREVIEW_BUFFER_PATH)
+        try:
+            with path.open("rb") as source:
+                source.readinto(buffer.view(0, cached_bytes))
+        except OSError as exc:
+            buffer.close()
+            print(f"[Preview cache] Could not read {path.name}: {exc}")
+            return
+        with self.condition:
+            self._buffer = buffer
+            self.total_size = total_size
+            self.downloaded = self._cached_bytes = cached_bytes
+            self.extension = path.suffix[1:]
+            if content_type:
+                self.content_type = content_type
+            self.done = cached_bytes >= total_size
+            self.condition.notify_all()
+        self.notify()
+
+    def _open_stream(self):
+        headers = dict(self.headers)
+        if self.downloaded:
+            headers["Range"] = f"bytes={self.downloaded}-"
+        request = urllib.request.Request(self.stream_url, headers=headers)
+        response = urllib.request.urlopen(request, timeout=20)
+        self._response = response
+        if self.downloaded:
+            content_range = str(response.headers.get("Content-Range") or "")
+            if (
+                response.status == 206
+                and content_range.startswith(f"bytes {self.downloaded}-")
+                and content_range.endswith(f"/{self.total_size}")
+            ):
+                return response
+            with self.condition:
+                self.downloaded = self._cached_bytes = 0
+            if response.status != 200:
+                response.close()
+                return self._open_stream()
+        elif response.status != 200:
+            response.close()
+            raise RuntimeError(f"Unexpected preview response {response.status}")
+        content_length = response.headers.get("Content-Length")
+        content_type = response.headers.get("Content-Type")
+        with self.condition:
+            total_size = None
+            if content_length:
+                try:
+                    total_size = int(content_length)
+                except (TypeError, ValueError):
+                    total_size = None
+            if content_type:
+                self.content_type = content_type.split(";", 1)[0].strip()
+            if self._buffer is not None and total_size != self.total_size:
+                self._buffer.close()
+                self._buffer = None
+            self.total_size = total_size
+            if self.total_size and self._buffer is None:
+                self._buffer = _TrackBuffer(
+                    self.total_size, directory=PREVIEW_BUFFER_PATH
+                )
+        return response
 
-        self._server = _ChunkedPreviewHTTPServer(("127.0.0.1", 0), Handler)
-        port = self._server.server_address[1]
-        self.local_url = f"http://127.0.0.1:{port}/demo/{self.token}"
-        self._server_thread = threading.Thread(
-            target=self._server.serve_forever,
-            name="CloudPlayerDemoHTTP",
-            daemon=True,
+    def _store_cached(self):
+        if not self.cache_key or self.downloaded <= self._cached_bytes:
+            return
+        if self._buffer is not None:
+            data = self._buffer.view(0, self.downloaded)
+        elif self.done and not self.error and not self.stopped:
+            data = self._data
+        else:
+            return
+        preview_cache().store_audio(
+            self.cache_key, data, self.total_size, self.content_type
         )
-        self._server_thread.start()
-        return self.local_url
 
     def _download_loop(self):
         try:
-            request = urllib.request.Request(self.stream_url, headers=self.headers)
-            response = urllib.request.urlopen(request, timeout=20)
-            self._response = response
-            content_length = response.headers.get("Content-Length")
-            content_type = response.headers.get("Content-Type")
-            with self.condition:
-                if content_length:
-                    try:
-                        self.total_size = int(content_length)
-                    except (TypeError, ValueError):
-                        self.total_size = None
-                if content_type:
-                    self.content_type = content_type.split(";", 1)[0].strip()
-
-            with self.path.open("wb", buffering=0) as output:
-                while not self.stopped:
-                    chunk = response.read(self.CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    output.write(chunk)
-                    with self.condition:
-                        self.downloaded += len(chunk)
-                        self.condition.notify_all()
+            if self.cache_key:
+                self._load_cached()
+            if self.done:
+                return
+            if not self.stream_url and self.cache_key:
+                details = resolve_preview_stream(self.cache_key)
+                self.stream_url = str(details.get("url") or "").strip()
+                self.headers = dict(details.get("headers") or {})
+                if not self.extension:
+                    self.extension = str(details.get("extension") or "")
+            response = self._open_stream()
+
+            while not self.stopped:
+                chunk = response.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                with self.condition:
+                    if self._buffer is not None:
+                        chunk = chunk[: self.total_size - self.downloaded]
+                        self._buffer.write(self.downloaded, chunk)
+                    else:
+                        self._data.extend(chunk)
+                    self.downloaded += len(chunk)
+                    self.condition.notify_all()
+                self.notify()
+                if self._buffer is not None and self.downloaded >= self.total_size:
+                    break
 
             with self.condition:
                 self.done = True
-                if self.total_size is None:
+                if self.total_size is None or self._buffer is None:
                     self.total_size = self.downloaded
                 self.condition.notify_all()
         except Exception as exc:
@@ -207,6 +357,7 @@ class ChunkedDemoBuffer:
                 self.done = True
                 self.condition.notify_all()
         finally:
+            self.notify()
             response = self._response
             self._response = None
             if response is not None:
@@ -214,121 +365,7 @@ class ChunkedDemoBuffer:
                     response.close()
                 except Exception:
                     pass
-
-    @staticmethod
-    def _parse_range(value, total_size):
-        if not value or not value.startswith("bytes="):
-            return None
-        value = value[6:].split(",", 1)[0].strip()
-        if "-" not in value:
-            return None
-        start_text, end_text = value.split("-", 1)
-        try:
-            if start_text:
-                start = int(start_text)
-                end = int(end_text) if end_text else None
-            elif end_text and total_size:
-                suffix = int(end_text)
-                start = max(0, total_size - suffix)
-                end = total_size - 1
-            else:
-                return None
-        except ValueError:
-            return None
-        if start < 0:
-            return None
-        if total_size is not None:
-            if start >= total_size:
-                return (start, start - 1)
-            if end is None or end >= total_size:
-                end = total_size - 1
-        return start, end
-
-    def _serve(self, handler, send_body):
-        if handler.path.split("?", 1)[0] != f"/demo/{self.token}":
-            handler.send_error(404)
-            return
-
-        with self.condition:
-            while self.downloaded == 0 and not self.done and not self.stopped:
-                self.condition.wait(0.1)
-            total = self.total_size
-            downloaded = self.downloaded
-            error = self.error
-
-        if self.stopped:
-            handler.send_error(410)
-            return
-        if error and downloaded == 0:
-            handler.send_error(502)
-            return
-
-        requested = self._parse_range(handler.headers.get("Range"), total)
-        if requested is not None:
-            start, end = requested
-            if end is not None and end < start:
-                handler.send_response(416)
-                if total is not None:
-                    handler.send_header("Content-Range", f"bytes */{total}")
-                handler.end_headers()
-                return
-            status = 206
-        else:
-            start, end, status = 0, None, 200
-
-        handler.send_response(status)
-        handler.send_header("Content-Type", self.content_type or "application/octet-stream")
-        handler.send_header("Accept-Ranges", "bytes")
-        handler.send_header("Cache-Control", "no-store")
-        handler.send_header("Connection", "close")
-        if total is not None:
-            final_end = total - 1 if end is None else min(end, total - 1)
-            if status == 206:
-                handler.send_header(
-                    "Content-Range", f"bytes {start}-{final_end}/{total}"
-                )
-            handler.send_header("Content-Length", str(max(0, final_end - start + 1)))
-        handler.end_headers()
-        if not send_body:
-            return
-
-        position = start
-        try:
-            while not self.stopped:
-                with self.condition:
-                    while (
-                        self.downloaded <= position
-                        and not self.done
-                        and not self.error
-                        and not self.stopped
-                    ):
-                        self.condition.wait(0.15)
-                    available_end = self.downloaded
-                    finished = self.done or bool(self.error)
-
-                if end is not None:
-                    available_end = min(available_end, end + 1)
-                if available_end > position:
-                    amount = min(self.CHUNK_SIZE, available_end - position)
-                    with self.path.open("rb") as source:
-                        source.seek(position)
-                        data = source.read(amount)
-                    if not data:
-                        if finished:
-                            break
-                        time.sleep(0.02)
-                        continue
-                    handler.wfile.write(data)
-                    handler.wfile.flush()
-                    position += len(data)
-                    if end is not None and position > end:
-                        break
-                    continue
-
-                if finished:
-                    break
-        except (BrokenPipeError, ConnectionResetError, OSError):
-            return
+            self._store_cached()
 
     def close(self):
         with self.condition:
@@ -336,6 +373,8 @@ class ChunkedDemoBuffer:
                 return
             self.stopped = True
             self.condition.notify_all()
+        media_server().unregister(self)
+        self.notify()
 
         response = self._response
         if response is not None:
@@ -344,24 +383,12 @@ class ChunkedDemoBuffer:
             except Exception:
                 pass
 
-        server = self._server
-        if server is not None:
-            def shutdown_server():
-                try:
-                    server.shutdown()
-                    server.server_close()
-                except Exception:
-                    pass
-            threading.Thread(target=shutdown_server, daemon=True).start()
-
         def cleanup():
             thread = self._download_thread
             if thread is not None and thread.is_alive():
-                thread.join(timeout=2.0)
-            try:
-                self.path.unlink(missing_ok=True)
-            except OSError:
-                pass
+                thread.join()
+            if self._buffer is not None:
+                self._buffer.close()
 
         threading.Thread(target=cleanup, daemon=True).start()
 
@@ -379,35 +406,16 @@ class DemoStreamResolver(QThread):
     def run(self):
         buffer = None
         try:
-            import yt_dlp
-
-            options = {
-                "quiet": True,
-                "no_warnings": True,
-                "skip_download": True,
-                "noplaylist": True,
-                # Prefer progressive AAC/M4A because its headers are usually
-                # available at the beginning and start quickly on Windows.
-                "format": "bestaudio[ext=m4a][protocol^=http]/"
-                          "bestaudio[protocol^=http]/bestaudio/best",
-            }
-            if os.name == "nt":
-                options["windows_creation_flags"] = 0x08000000
-
-            with yt_dlp.YoutubeDL(options) as ydl:
-                info = ydl.extract_info(self.page_url, download=False) or {}
-
-            entries = info.get("entries") or []
-            if entries and isinstance(entries[0], dict):
-                info = entries[0]
-            details = _preview_stream_details(info)
-            if not details:
-                raise RuntimeError("No playable audio stream was returned")
+            cache = preview_cache()
+            details = None
+            if cache.complete_file(self.page_url) is None:
+                details = resolve_preview_stream(self.page_url)
 
             buffer = ChunkedDemoBuffer(
-                details["url"],
-                headers=details.get("headers"),
-                extension=details.get("extension") or "",
+                (details or {}).get("url") or "",
+                headers=(details or {}).get("headers"),
+                extension=(details or {}).get("extension") or "",
+                cache_key=self.page_url,
             )
             local_url = buffer.start()
             self.resolved.emit(self.page_url, local_url, buffer)
@@ -417,6 +425,58 @@ class DemoStreamResolver(QThread):
             self.failed.emit(self.page_url, str(exc)[:300])
 
 
+class PreviewPrefetcher:
+    """Resolve preview streams for the top search results ahead of a click.
+
+    Only stream URLs are resolved, not audio, and they land in the preview
+    cache. Each ``prefetch`` call supersedes the previous one: queued pages
+    are dropped, and pages already being resolved finish into the cache.
+    """
+
+    ROWS = 4
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="preview-prefetch"
+        )
+        self._futures = []
+        self._generation = 0
+        self._closed = False
+
+    def prefetch(self, page_urls):
+        self.cancel()
+        if self._closed:
+            return
+        generation = self._generation
+        for page_url in list(page_urls)[: self.ROWS]:
+            page_url = str(page_url or "").strip()
+            if page_url:
+                self._futures.append(
+                    self._executor.submit(self._resolve, generation, page_url)
+                )
+
+    def cancel(self):
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+
+    def close(self):
+        self._closed = True
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _resolve(self, generation, page_url):
+        if generation != self._generation or self._closed:
+            return
+        if preview_cache().complete_file(page_url) is not None:
+            return
+        try:
+            resolve_preview_stream(page_url)
+        except Exception as exc:
+            print(f"[Preview prefetch] {page_url}: {str(exc)[:200]}")
+
+
 def fetch_track_metadata(song_path, should_stop=None):
 
     song_path = Path(song_path)
@@ -515,6 +575,7 @@ def fetch_track_metadata(song_path, should_stop=None):
             json.dumps(sidecar, ensure_ascii=False, indent=2),
             encoding="utf-8",
         )
+        update_catalog_tracks(song_path.parent.parent.name, [song_path])
         cache_lyrics(
             result["artist"], result["title"], result["lyrics"]
         )
@@ -855,33 +916,22 @@ class RecommendationFetcher(QThread):
         super().__init__(parent)
         self.limit = limit
 
-    @staticmethod
-    def _artists():
-        artists = []
-        for sidecar in PLAYLISTS_PATH.glob("*/songs/*.json"):
-            try:
-                artist = json.loads(
-                    sidecar.read_text(encoding="utf-8")
-                ).get("artist")
-                if artist and artist.casefold() != "unknown artist":
-                    artists.append(artist.strip())
-            except Exception:
-                pass
-        return list(dict.fromkeys(artists))
-
-    @staticmethod
-    def _existing_tracks():
-        tracks = set()
-        for sidecar in PLAYLISTS_PATH.glob("*/songs/*.json"):
-            try:
-                data = json.loads(sidecar.read_text(encoding="utf-8"))
-                tracks.add((
-                    _normalize(data.get("artist")),
-                    _normalize(data.get("title")),
-                ))
-            except Exception:
-                pass
-        return tracks
+    CATALOG_TIMEOUT = 15.0
+
+    @classmethod
+    def _artists(cls):
+        catalog = library_catalog()
+        catalog.wait_ready(cls.CATALOG_TIMEOUT)
+        return [artist.strip() for artist in catalog.artists()]
+
+    @classmethod
+    def _existing_tracks(cls):
+        catalog = library_catalog()
+        catalog.wait_ready(cls.CATALOG_TIMEOUT)
+        return {
+            (_normalize(artist), _normalize(title))
+            for artist, title in catalog.identities()
+        }
 
     def run(self):
         if not genius_credentials_ready():
@@ -13,6 +13,7 @@ from PySide6.QtWidgets import (
 
 from config import PLAYLISTS_PATH
 from dropdown_ui import QFileDialog, QInputDialog, QMessageBox
+from library_catalog import remove_catalog_playlist, sync_catalog_playlist
 from playlist_index import flush_playlist_writes
 
 _INSTALLED = False
@@ -156,6 +157,8 @@ def _rename_playlist(window, item):
         new_metadata.write_text(
             json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
         )
+        remove_catalog_playlist(old_name)
+        sync_catalog_playlist(new_name)
         item.setData(Qt.UserRole, new_name)
         window._playlist_items.pop(old_name, None)
         window._playlist_items[new_name] = item
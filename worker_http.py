@@ -1,5 +1,9 @@
 
 
+import threading
+import urllib.parse
+from contextlib import contextmanager
+
 import requests
 from requests.adapters import HTTPAdapter
 
@@ -8,6 +12,7 @@ HTTP_POOL_SIZE = 8
 NETWORK_BUFFER_SIZE = 2 * 1024 * 1024
 PARALLEL_DOWNLOAD_CONNECTIONS = 8
 PARALLEL_RANGE_RETRIES = 3
+HOST_CONNECTION_LIMIT = HTTP_POOL_SIZE
 
 
 def _build_http_session():
@@ -29,6 +34,27 @@ def _build_http_session():
 
 
 HTTP_SESSION = _build_http_session()
+_HOST_SLOTS = {}
+_HOST_SLOTS_LOCK = threading.Lock()
+
+
+@contextmanager
+def host_connection(url):
+    """Hold one of the connections budgeted for ``url``'s host.
+
+    Every concurrent download shares the same per-host budget, so running
+    several tracks at once spreads the connections between them instead of
+    opening a full set per track against the same CDN.
+    """
+    host = urllib.parse.urlsplit(str(url)).netloc.casefold()
+    with _HOST_SLOTS_LOCK:
+        slots = _HOST_SLOTS.get(host)
+        if slots is None:
+            slots = _HOST_SLOTS[host] = threading.BoundedSemaphore(
+                HOST_CONNECTION_LIMIT
+            )
+    with slots:
+        yield
 
 
 class ParallelDownloadError(RuntimeError):